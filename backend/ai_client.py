@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries also expire `ttl` seconds after being
+    stored. With `max_bytes` set, put() takes each value's size and the least
+    recently used entries are dropped once the total goes over it.
+    """
+    def __init__(self, max_entries=512, ttl=24 * 3600, max_bytes=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # key -> (expires_at, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key, value, size=0):
+        if self.max_entries <= 0 or (self.max_bytes is not None and size > self.max_bytes):
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._drop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def _drop(self, key):
+        self._bytes -= self._entries.pop(key)[2]
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                **self.stats,
+            }
+
+
+def normalize_code(code):
+    """
+    Only line endings and newlines at the very end don't change the answer. Trailing
+    whitespace can be inside a string literal, and blank lines at the top move every
+    line number in a trace.
+    """
+    return code.replace("\r\n", "\n").replace("\r", "\n").rstrip("\n")
+
+
+def cache_key(kind, code, **details):
+    digest = hashlib.sha256()
+    digest.update(kind.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_code(code).encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(details, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class GeminiClient:
+    """
+    Gemini text generation with the model name and the responses cached.
+
+    The model is picked once (the first one that supports generateContent) and
+    re-discovered every `model_ttl` seconds; if discovery fails DEFAULT_MODEL is
+    used and discovery is retried after `retry_after` seconds. Responses are kept
+    in a TTLCache under a caller-supplied key (see cache_key).
+
+    `client` is anything with google.generativeai's configure / list_models /
+    GenerativeModel; pass a stub to run without the network.
+
+    generate_async() never blocks the event loop: it uses the model's
+    generate_content_async when there is one and a worker thread otherwise.
+    Concurrent calls with the same key share one upstream request, and each
+    caller gives up after its own timeout without cancelling the shared call,
+    whose answer still lands in the cache.
+    """
+    def __init__(self, api_key=None, client=None, model_ttl=3600, retry_after=60, cache=None):
+        if client is None:
+            import google.generativeai as client
+        self.client = client
+        self.api_key = api_key
+        self.model_ttl = model_ttl
+        self.retry_after = retry_after
+        self.cache = cache if cache is not None else TTLCache()
+        self._model_name = None
+        self._model_expires = 0.0
+        self._lock = threading.Lock()
+        self._inflight = {} # key -> asyncio.Task, for coalescing (event loop only)
+        self.stats = {"model_lookups": 0, "generations": 0, "coalesced": 0, "timeouts": 0}
+        if api_key:
+            self.client.configure(api_key=api_key)
+
+    @property
+    def available(self):
+        return bool(self.api_key)
+
+    def model_name(self):
+        with self._lock:
+            if self._model_name is not None and time.monotonic() < self._model_expires:
+                return self._model_name
+            self.stats["model_lookups"] += 1
+            ttl = self.model_ttl
+            name = DEFAULT_MODEL
+            try:
+                for m in self.client.list_models():
+                    if 'generateContent' in m.supported_generation_methods:
+                        name = m.name
+                        break
+            except Exception as e:
+                print(f"Gemini model discovery failed, using {DEFAULT_MODEL}: {e}")
+                ttl = self.retry_after
+            self._model_name = name
+            self._model_expires = time.monotonic() + ttl
+            return name
+
+    async def generate_async(self, prompt, key=None, timeout=None):
+        """
+        Returns the response text, from the cache when `key` was seen before, or
+        raises asyncio.TimeoutError after `timeout` seconds. Identical in-flight
+        requests (same key) wait for the first one's answer.
+        """
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            task = self._inflight.get(key)
+            if task is not None:
+                self._count("coalesced")
+            else:
+                task = asyncio.ensure_future(self._generate_async(prompt, key))
+                self._inflight[key] = task
+                task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            task = asyncio.ensure_future(self._generate_async(prompt, None))
+            task.add_done_callback(lambda done: self._finished(None, done))
+
+        try:
+            # shield: one caller timing out must not cancel the call the others wait on
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise
+
+    async def _generate_async(self, prompt, key):
+        model_name = self._model_name if time.monotonic() < self._model_expires else None
+        if model_name is None: # list_models() is blocking too
+            model_name = await asyncio.to_thread(self.model_name)
+        model = self.client.GenerativeModel(model_name)
+        if hasattr(model, "generate_content_async"):
+            response = await model.generate_content_async(prompt)
+        else:
+            response = await asyncio.to_thread(model.generate_content, prompt)
+        text = response.text
+        self._count("generations")
+        if key is not None:
+            self.cache.put(key, text)
+        return text
+
+    def _finished(self, key, task):
+        if key is not None:
+            self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            # Mark it retrieved even if every caller timed out before it failed
+            print(f"Gemini generation failed: {task.exception()}")
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+            model = self._model_name
+        return {"available": self.available, "model": model, **stats, "cache": self.cache.metrics()}
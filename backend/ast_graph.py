@@ -0,0 +1,122 @@
+"""
+AST node/edge graphs for /get-ast-visualization, with level-of-detail limits so
+the graph (and graphviz's layout of it) stays small however large the source is.
+
+The tree is walked breadth first without recursion, so deeply nested expressions
+can't hit the recursion limit and, when `max_nodes` runs out, the outer structure
+of the program is kept and the deepest parts are cut. A node whose children
+aren't all shown is marked collapsed:
+
+    {"id": 7, "label": "FunctionDef\\n(name='f')", "collapsed": true, "hidden": 120, "path": "0.3"}
+
+`path` is the node's position from the root (child indexes, dot separated);
+building again with root_path=path returns just that subtree, which is how the
+frontend expands collapsed nodes on demand. When the whole tree is over
+`max_nodes`, function and class bodies start out collapsed.
+"""
+import ast
+from collections import deque
+
+import graphviz
+
+SCOPE_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+MAX_LABEL_VALUE = 40 # Characters of a constant shown in its label
+
+
+def subtree_size(node):
+    return sum(1 for _ in ast.walk(node))
+
+
+def resolve_path(tree, path):
+    """The node at `path` ("" or None is the root). Raises ValueError for a bad path."""
+    node = tree
+    for part in path.split(".") if path else []:
+        children = list(ast.iter_child_nodes(node))
+        try:
+            node = children[int(part)]
+        except (ValueError, IndexError):
+            raise ValueError(f"No AST node at path '{path}'")
+    return node
+
+
+class ASTVisualizer:
+    """
+    Collects the AST as a node/edge list. to_dot() turns it into a graphviz graph for
+    the SVG; the "json" format sends the list as is and the frontend lays it out.
+    """
+    def __init__(self, max_nodes=400, max_depth=None):
+        self.max_nodes = max_nodes
+        self.max_depth = max_depth  # Levels below the root before subtrees are collapsed
+        self.nodes = []  # {"id", "label"} plus "collapsed", "hidden", "path" when cut
+        self.edges = []  # [parent_id, child_id]
+        self.total_nodes = 0
+
+    def _get_node_label(self, node: ast.AST) -> str:
+        label = type(node).__name__
+        if isinstance(node, SCOPE_TYPES): label += f"\n(name='{node.name}')"
+        elif isinstance(node, ast.Name): label += f"\n(id='{node.id}')"
+        elif isinstance(node, ast.Constant):
+            value = ast.unparse(node)
+            if len(value) > MAX_LABEL_VALUE:
+                value = value[:MAX_LABEL_VALUE - 3] + "..."
+            label += f"\n(value={value})"
+        elif isinstance(node, ast.BinOp): op_type = type(node.op).__name__; label += f"\n(op='{op_type}')"
+        return label
+
+    def build(self, tree, root_path=None):
+        root = resolve_path(tree, root_path)
+        self.total_nodes = subtree_size(root)
+        lazy_scopes = self.total_nodes > self.max_nodes
+        base_path = tuple(root_path.split(".")) if root_path else ()
+
+        # (node, parent id, depth below the root, path)
+        queue = deque([(root, None, 0, base_path)])
+        while queue:
+            node, parent_id, depth, path = queue.popleft()
+            if len(self.nodes) >= self.max_nodes:
+                self._collapse(self.nodes[parent_id], subtree_size(node), path[:-1])
+                continue
+
+            node_id = len(self.nodes)
+            entry = {"id": node_id, "label": self._get_node_label(node)}
+            self.nodes.append(entry)
+            if parent_id is not None:
+                self.edges.append([parent_id, node_id])
+
+            children = list(ast.iter_child_nodes(node))
+            if not children:
+                continue
+            if ((self.max_depth is not None and depth >= self.max_depth)
+                    or (lazy_scopes and depth > 0 and isinstance(node, SCOPE_TYPES))):
+                self._collapse(entry, subtree_size(node) - 1, path)
+                continue
+            for i, child in enumerate(children):
+                queue.append((child, node_id, depth + 1, path + (str(i),)))
+        return self
+
+    def _collapse(self, entry, hidden, path):
+        entry["collapsed"] = True
+        entry["hidden"] = entry.get("hidden", 0) + hidden
+        entry["path"] = ".".join(path)
+
+    @property
+    def truncated(self):
+        return len(self.nodes) < self.total_nodes
+
+    def to_json(self):
+        return {"nodes": self.nodes, "edges": self.edges, "total_nodes": self.total_nodes, "truncated": self.truncated}
+
+    def to_dot(self):
+        dot = graphviz.Digraph(comment="Abstract Syntax Tree")
+        dot.attr('node', shape='box', style='rounded,filled', fillcolor='lightblue')
+        dot.attr('edge', color='gray40')
+        for node in self.nodes:
+            label = node["label"]
+            if node.get("collapsed"):
+                label += f"\n(+{node['hidden']} nodes)"
+                dot.node(str(node["id"]), label=label.replace("\n", "\\n"), style='rounded,filled,dashed', fillcolor='lightgray')
+            else:
+                dot.node(str(node["id"]), label=label.replace("\n", "\\n"))
+        for parent, child in self.edges:
+            dot.edge(str(parent), str(child))
+        return dot
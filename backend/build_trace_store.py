@@ -0,0 +1,93 @@
+"""
+Builds the precomputed trace store (trace_store.py) from the curated examples.
+
+    python build_trace_store.py [--examples examples] [--output traces.bin]
+
+Every .cpp example is traced with CTracer and every .py example with tracer.py,
+in each variant the endpoints serve. Examples whose trace fails (no compiler or
+GDB here, or an error in the example) are reported and left out, so those
+requests simply go through the real tracers.
+"""
+import argparse
+import glob
+import json
+import os
+
+from c_tracer import CTracer
+from python_pool import find_tracer, import_tracer
+from trace_format import encode_compact
+from trace_store import DEFAULT_STORE_PATH, store_key, write_store
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples")
+PYTHON_MODES = ("full", "delta")
+FORMATS = ("json", "compact")
+
+
+def failed(steps):
+    return next((step for step in steps if step.get("event") in ("error", "truncated")), None)
+
+
+def trace_cpp(code):
+    steps = CTracer().run(code)
+    problem = failed(steps)
+    if problem is not None:
+        raise RuntimeError(problem.get("error_message") or problem.get("reason"))
+    return {
+        store_key("trace-c", code, format="json"): json.dumps(steps, separators=(",", ":")).encode("utf-8"),
+        store_key("trace-c", code, format="compact"): encode_compact(steps),
+    }
+
+
+def load_tracer():
+    path = find_tracer()
+    if path is None:
+        return None
+    return import_tracer(path)
+
+
+def trace_python(tracer, code):
+    entries = {}
+    for mode in PYTHON_MODES:
+        for output in FORMATS:
+            body = tracer.run_user_code(code, mode=mode, output=output)
+            if output == "json":
+                problem = failed(json.loads(body))
+                if problem is not None:
+                    raise RuntimeError(problem.get("error_message") or problem.get("reason"))
+                body = body.encode("utf-8")
+            entries[store_key("trace-python", code, mode=mode, format=output)] = body
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--examples", default=EXAMPLES_DIR)
+    parser.add_argument("--output", default=os.getenv("TRACE_STORE_PATH", DEFAULT_STORE_PATH))
+    args = parser.parse_args()
+
+    tracer = None
+    entries = {}
+    for path in sorted(glob.glob(os.path.join(args.examples, "*"))):
+        name = os.path.basename(path)
+        with open(path, encoding="utf-8") as f:
+            code = f.read()
+        try:
+            if path.endswith(".cpp"):
+                entries.update(trace_cpp(code))
+            elif path.endswith(".py"):
+                tracer = tracer or load_tracer()
+                if tracer is None:
+                    raise RuntimeError("tracer.py not found, set TRACER_PATH")
+                entries.update(trace_python(tracer, code))
+            else:
+                continue
+            print(f"traced {name}")
+        except Exception as e:
+            print(f"skipped {name}: {e}")
+
+    write_store(args.output, entries)
+    print(f"wrote {len(entries)} traces to {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,140 +1,143 @@
 import subprocess
 import os
-import re
 import uuid
 import json
+import tempfile
+import time
+from contextlib import contextmanager
+
+from gdb_pool import GDBSession, GDBSessionError, GDBTimeout
+from metrics import count, record_span, span
+from toolchain import Toolchain
+
+# Steps written to GDB per round trip by the pipelined MI engine
+PIPELINE_DEPTH = 16
+STEPPER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gdb_stepper.py")
+ENGINES = ("mi", "python")
+SKIP_FILES = ("/usr/include/*", "/usr/lib/*", "/usr/local/include/*")
 
 class CTracer:
-    def __init__(self):
-        self.trace_data = []
+    max_steps = 1000
 
-    def run(self, code):
-        """
-        Compiles and traces the provided C++ code.
-        Returns a JSON-serializable list of trace steps.
-        """
-        import tempfile
+    def __init__(self, pool=None, compile_cache=None, toolchain=None, engine="mi", limits=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown tracer engine '{engine}', expected one of {ENGINES}")
         self.trace_data = []
-        
+        self.frame_cache = [] # (func_name, locals) per frame depth, see build_step
+        # "mi" pipelines MI commands, "python" runs the step loop inside GDB (gdb_stepper.py)
+        self.engine = engine
+        # Optional GDBSessionPool; without one every run starts its own GDB
+        self.pool = pool
+        # Optional CompileCache; without one every run compiles into a temp file
+        self.compile_cache = compile_cache
+        # Compile flags and precompiled header (see toolchain.py)
+        self.toolchain = toolchain or Toolchain(use_pch=False)
+        # Optional scheduler.JobLimits: wall-clock limit for the whole run, CPU and
+        # memory limits for the compiler and the traced program
+        self.limits = limits
+
+    @contextmanager
+    def gdb_session(self):
+        started = time.perf_counter()
+        if self.pool is not None:
+            with self.pool.session() as session:
+                record_span("gdb_start", time.perf_counter() - started)
+                yield session
+            return
+
+        session = GDBSession()
+        record_span("gdb_start", time.perf_counter() - started)
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def compile(self, code, temp_files):
+        """Returns (executable_path, None) or (None, compiler_stderr)."""
+        exe_file, compile_error = self.compile_with(code, self.toolchain.compile_flags(code), temp_files)
+        if compile_error is not None and self.toolchain.wants_pch(code):
+            # The PCH's extra headers can clash with the program's own names
+            exe_file, compile_error = self.compile_with(code, self.toolchain.compile_flags(code, pch=False), temp_files)
+        return exe_file, compile_error
+
+    def compile_with(self, code, flags, temp_files):
+        compiler = self.toolchain.compiler
+        if self.compile_cache is not None:
+            return self.compile_cache.compile(code, compiler, flags, toolchain_id=self.toolchain.version, limits=self.limits)
+
         # Cross-platform temp file handling
         temp_dir = tempfile.gettempdir()
         filename_base = f"trace_c_{uuid.uuid4().hex}"
         source_file = os.path.join(temp_dir, f"{filename_base}.cpp")
         exe_file = os.path.join(temp_dir, f"{filename_base}.exe") if os.name == 'nt' else os.path.join(temp_dir, f"{filename_base}.out")
+        temp_files.extend([source_file, exe_file])
 
-        try:
-            # 1. Write Code to File
-            with open(source_file, "w") as f:
-                f.write(code)
+        with open(source_file, "w") as f:
+            f.write(code)
 
-            # 2. Compile
-            compile_cmd = ["g++", "-g", "-O0", source_file, "-o", exe_file]
+        compile_cmd = [compiler, *flags, source_file, "-o", exe_file]
+        count("subprocesses_started_total", kind="compiler")
+        if self.limits is not None:
+            result = self.limits.run(compile_cmd)
+        else:
             result = subprocess.run(compile_cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
+        if result.returncode != 0:
+            return None, result.stderr
+        return exe_file, None
+
+    def run(self, code):
+        """
+        Compiles and traces the provided C++ code.
+        Returns a JSON-serializable list of trace steps.
+        """
+        self.trace_data = []
+        temp_files = []
+        started = time.monotonic()
+
+        try:
+            # 1. Compile (or reuse a cached build)
+            try:
+                with span("compile"):
+                    exe_file, compile_error = self.compile(code, temp_files)
+            except subprocess.TimeoutExpired:
+                compile_error = f"Compilation took longer than {self.limits.time_limit:g}s"
+            if compile_error is not None:
                 return [{
                     "event": "error",
                     "error_type": "CompilationError",
-                    "error_message": result.stderr
+                    "error_message": compile_error
                 }]
 
-            # 3. Run GDB
+            # 2. Run GDB
             # We use GDB's Machine Interface (MI) for easier parsing
-            gdb_cmd = ["gdb", "--interpreter=mi", "--args", exe_file]
-            
-            process = subprocess.Popen(
-                gdb_cmd,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1 # Line buffered
-            )
-
-            # Commands to send to GDB
-            commands = [
-                "-break-insert main",
-                "-exec-run",
-                # We will loop stepping in the interaction loop
-            ]
-            
-            # Helper to write to GDB
-            def send_gdb(cmd):
-                process.stdin.write(cmd + "\n")
-                process.stdin.flush()
-
-            # Initial setup
-            send_gdb("-break-insert main")
-            send_gdb("-exec-run")
-
-            # Interaction Loop
-            current_line = 0
-            step_count = 0
-            max_steps = 1000
-            
-            while step_count < max_steps:
-                # Read output until we get a prompt (gdb) or stopping point
-                # This is a bit simplified; a real MI parser is complex.
-                # We will read line by line and react to *stopped
-                
-                output_buffer = ""
-                while True:
-                    line = process.stdout.readline()
-                    if not line: break
-                    output_buffer += line
-                    if line.strip() == "(gdb)":
-                        break
-                
-                # Check for program exit
-                if "*stopped,reason=\"exited" in output_buffer or "Program exited" in output_buffer:
-                    break
-                    
-                # Check if we are stopped at a breakpoint or after a step
-                if "*stopped" in output_buffer:
-                    # Parse current location
-                    # match: *stopped,reason="...",frame={...,line="12",...}
-                    match = re.search(r'line="(\d+)"', output_buffer)
-                    if match:
-                        current_line = int(match.group(1))
-                        
-                        # Get Locals
-                        send_gdb("-stack-list-variables --simple-values")
-                        # Read response for variables
-                        var_output = ""
-                        while True:
-                             l = process.stdout.readline()
-                             var_output += l
-                             if l.strip() == "(gdb)": break
-                             
-                        locals_data = self.parse_vars(var_output)
-                        
-                        # Get Stack (simplified, just top frame func name)
-                        func_match = re.search(r'func="([^"]+)"', output_buffer)
-                        func_name = func_match.group(1) if func_match else "?"
-                        
-                        self.trace_data.append({
-                            "line_number": current_line,
-                            "stack": [{
-                                "func_name": func_name,
-                                "lineno": current_line,
-                                "locals": locals_data
-                            }],
-                            "heap": {} # Accessing heap in C++ via GDB is hard, skipping for now
-                        })
-                    
-                    if step_count > 0: # Don't step immediately after run, we are already at main break
-                         pass
-
-                    # Next step
-                    send_gdb("-exec-next")
-                    step_count += 1
-                else:
-                    # If not stopped, maybe we are still setting up or it's running
-                    # But since we look for (gdb) prompt, we should be ready for next command
-                    pass
-
-            process.terminate()
+            with self.gdb_session() as session:
+                if self.limits is not None:
+                    session.deadline = started + self.limits.time_limit
+                    # The wrapper limits the program before it execs; without one they're
+                    # set once GDB reports its pid
+                    wrapper = self.limits.exec_wrapper()
+                    if wrapper is None or session.console(f"set exec-wrapper {wrapper}").cls != "done":
+                        session.on_inferior_started = self.limits.apply
+                try:
+                    session.load_executable(exe_file)
+                    with span("step_loop"):
+                        if self.engine == "python":
+                            self.step_through_script(session)
+                        else:
+                            self.step_through(session)
+                except GDBTimeout:
+                    # The program is stuck inside a step; GDB won't answer until it stops
+                    session.kill_inferior()
+                    raise
+                session.deadline = None
 
+        except GDBTimeout:
+            self.trace_data.append({
+                "event": "truncated",
+                "reason": "time_limit",
+                "limit": f"{self.limits.time_limit:g}s",
+                "line_number": self.trace_data[-1].get("line_number") if self.trace_data else None
+            })
         except Exception as e:
             self.trace_data.append({
                  "event": "error",
@@ -143,38 +146,147 @@ class CTracer:
             })
         finally:
             # Cleanup
-            if os.path.exists(source_file): os.remove(source_file)
-            if os.path.exists(exe_file): os.remove(exe_file)
-            # win specific cleanup if needed
-            if os.path.exists(f"{filename}.out"): os.remove(f"{filename}.out")
+            for path in temp_files:
+                if os.path.exists(path): os.remove(path)
 
         return self.trace_data
 
-    def parse_vars(self, gdb_output):
+    def prepare_session(self, session):
+        # Don't step into the standard library; its headers are compiled into every program
+        for pattern in SKIP_FILES:
+            session.console_once(f"skip -gfi {pattern}")
+        if "no-python" in session.configured:
+            return False
+        try:
+            session.source_script(STEPPER_SCRIPT)
+            return True
+        except GDBSessionError as e:
+            print(f"GDB Python unavailable, tracing without heap capture: {e}")
+            session.configured.add("no-python") # Don't retry on every run
+            return False
+
+    def step_through(self, session):
+        """
+        Pipelined MI engine. Each step is an -exec-step followed by its queries, and
+        PIPELINE_DEPTH steps are written to GDB at once. GDB holds the queries until
+        the program stops (mi-async is off), so the results come back in order and
+        are matched to their step by token. Steps written after the program exits
+        just come back as ^error.
+
+        The query is gdb_stepper.py's trace-snapshot (full stack and heap). If GDB
+        has no Python, -stack-list-frames and -stack-list-variables are used instead
+        and the heap stays empty.
+        """
+        has_python = self.prepare_session(session)
+        if has_python:
+            queries = ['-interpreter-exec console "trace-snapshot"']
+            session.console("trace-snapshot reset")
+        else:
+            queries = ["-stack-list-frames", "-stack-list-variables --simple-values"]
+        self.frame_cache = []
+
+        # Initial setup
+        session.command("-break-insert main")
+        # The program shares stdin with GDB; don't let it read our commands
+        session.command(f"-exec-arguments < {os.devnull}")
+
+        # Interaction Loop
+        step_count = 0
+        exec_cmd = "-exec-run"
+        running = True
+        stride = 1 + len(queries)
+        
+        while running and step_count < self.max_steps:
+            cmds = []
+            for _ in range(min(PIPELINE_DEPTH, self.max_steps - step_count)):
+                cmds += [exec_cmd, *queries]
+                exec_cmd = "-exec-step"
+            tokens = session.send_batch(cmds)
+
+            for i in range(0, len(tokens), stride):
+                exec_record = session.read_result(tokens[i])
+                stopped = session.wait_for_stop() if running and exec_record.cls == "running" else None
+                console = []
+                results = [session.read_result(token, console) for token in tokens[i + 1:i + stride]]
+                step_count += 1
+
+                if stopped is None:
+                    if step_count == 1: # -exec-run itself failed
+                        raise GDBSessionError(exec_record.results.get("msg", "Could not start the program"))
+                    running = False
+                    continue
+
+                # Check for program exit
+                if stopped.results.get("reason", "").startswith("exited"):
+                    running = False
+                    continue
+
+                # *stopped,reason="...",frame={...,func="main",line="12",...}
+                frame = stopped.results.get("frame", {})
+                if "line" not in frame:
+                    continue
+                if has_python:
+                    output = "".join(console).strip()
+                    step = json.loads(output.splitlines()[-1]) if output else None
+                    if step is not None:
+                        self.trace_data.append(step)
+                else:
+                    frames = results[0].results.get("stack") or [frame]
+                    self.trace_data.append(self.build_step(frames, self.parse_vars(results[1])))
+
+    def step_through_script(self, session):
+        """
+        GDB Python engine: gdb_stepper.py runs the whole step loop inside GDB and
+        writes the trace to a file, so there is a single MI round trip per run.
+        """
+        if not self.prepare_session(session):
+            raise GDBSessionError("The python engine needs a GDB built with Python")
+        out_file = os.path.join(tempfile.gettempdir(), f"trace_c_{uuid.uuid4().hex}.json")
+        try:
+            mi_path = out_file.replace("\\", "/")
+            record = session.console(f'trace-steps "{mi_path}" {self.max_steps} "{os.devnull}"')
+            if record.cls != "done":
+                raise GDBSessionError(record.results.get("msg", "trace-steps failed"))
+            with open(out_file) as f:
+                self.trace_data.extend(json.load(f))
+        finally:
+            if os.path.exists(out_file): os.remove(out_file)
+
+    def build_step(self, frames, locals_data):
+        """
+        Step from MI frame and variable lists. GDB lists frames innermost first; the
+        trace (like tracer.py's) starts with the outermost. Frames without line info
+        (libc startup code) are left out.
+
+        Only the innermost frame's locals are queried. Outer frames show the locals
+        they had when they were last innermost, which is when they last ran.
+        """
+        frames = [frame for frame in reversed(frames) if "line" in frame]
+        depth = len(frames) - 1
+        del self.frame_cache[depth:]
+        for i, frame in enumerate(frames[:depth]):
+            if i < len(self.frame_cache) and self.frame_cache[i][0] == frame.get("func"):
+                continue
+            del self.frame_cache[i:]
+            self.frame_cache.append((frame.get("func"), {})) # Never seen as innermost
+        self.frame_cache.append((frames[-1].get("func"), locals_data))
+
+        stack = [{
+            "func_name": func_name or "?",
+            "lineno": int(frame["line"]),
+            "locals": frame_locals
+        } for (func_name, frame_locals), frame in zip(self.frame_cache, frames)]
+        return {
+            "line_number": stack[-1]["lineno"],
+            "stack": stack,
+            "heap": {} # Needs GDB Python (gdb_stepper.py)
+        }
+
+    def parse_vars(self, record):
         # ^done,variables=[{name="a",type="int",value="1"},{name="b",type="int",value="2"}]
         variables = {}
-        try:
-            # Find the variables list content
-            match = re.search(r'variables=\[(.*?)\]', gdb_output)
-            if match:
-                content = match.group(1)
-                # Split by objects {}
-                # This regex is a bit naive for nested objects but works for primitives
-                # var_matches = re.findall(r'{name="([^"]+)",type="[^"]+",value="([^"]+)"}', content)
-                # Better regex to capture name and value
-                
-                # Split by }, { 
-                items = content.split('},{')
-                for item in items:
-                    name_match = re.search(r'name="([^"]+)"', item)
-                    val_match = re.search(r'value="([^"]+)"', item)
-                    
-                    if name_match and val_match:
-                        name = name_match.group(1)
-                        val = val_match.group(1)
-                        # Clean up value (remove \n etc)
-                        val = val.replace(r'\\n', '')
-                        variables[name] = {"value": val}
-        except:
-            pass
+        for var in record.results.get("variables", []):
+            # --simple-values leaves out the value of structs, arrays and classes
+            if "name" in var and "value" in var:
+                variables[var["name"]] = {"value": var["value"]}
         return variables
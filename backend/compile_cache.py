@@ -0,0 +1,142 @@
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+import uuid
+
+from metrics import count
+
+
+class CompileCache:
+    """
+    On-disk cache of compiled /trace-c programs, keyed by a hash of the source,
+    the compiler and its flags. Successful builds are kept as `<key>.out`, failed
+    ones as `<key>.err` holding the compiler's stderr, so a repeated snippet skips
+    g++ either way. Entries are evicted least-recently-used (by mtime) once the
+    directory grows past `max_bytes`.
+
+    The directory can be shared by several server workers: files are written
+    under a temporary name and moved into place with os.replace.
+    """
+    def __init__(self, cache_dir=None, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "trace_view_compile_cache")
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "error_hits": 0, "evictions": 0}
+
+    def key(self, source, compiler, flags, toolchain_id=""):
+        digest = hashlib.sha256()
+        for part in [compiler, toolchain_id, *flags, source]:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError: # Evicted by another worker in the meantime
+            return False
+
+    def compile(self, source, compiler="g++", flags=("-g", "-O0"), toolchain_id="", limits=None):
+        """
+        Returns (executable_path, None) on success or (None, compiler_stderr) on a
+        compile error. The executable belongs to the cache; don't delete it.
+        `toolchain_id` (e.g. the compiler version) keeps builds from different
+        compilers apart. `limits` (scheduler.JobLimits) bounds the compiler's time
+        and memory; a timeout raises subprocess.TimeoutExpired and caches nothing.
+        """
+        key = self.key(source, compiler, flags, toolchain_id)
+        exe_file = os.path.join(self.cache_dir, f"{key}.out")
+        err_file = os.path.join(self.cache_dir, f"{key}.err")
+
+        if self._touch(exe_file):
+            self._count("hits")
+            return exe_file, None
+        if os.path.exists(err_file):
+            try:
+                with open(err_file) as f:
+                    stderr = f.read()
+                self._touch(err_file)
+                self._count("hits")
+                self._count("error_hits")
+                return None, stderr
+            except FileNotFoundError:
+                pass
+
+        self._count("misses")
+        tmp_base = os.path.join(self.cache_dir, f"tmp_{uuid.uuid4().hex}")
+        source_file = f"{tmp_base}.cpp"
+        tmp_exe = f"{tmp_base}.out"
+        try:
+            with open(source_file, "w") as f:
+                f.write(source)
+            compile_cmd = [compiler, *flags, source_file, "-o", tmp_exe]
+            count("subprocesses_started_total", kind="compiler")
+            if limits is not None:
+                result = limits.run(compile_cmd)
+            else:
+                result = subprocess.run(compile_cmd, capture_output=True, text=True)
+
+            if result.returncode != 0:
+                self._store_text(err_file, result.stderr)
+                self.evict(keep=err_file)
+                return None, result.stderr
+
+            os.replace(tmp_exe, exe_file)
+            self.evict(keep=exe_file)
+            return exe_file, None
+        finally:
+            for path in (source_file, tmp_exe):
+                if os.path.exists(path): os.remove(path)
+
+    def _store_text(self, path, text):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def evict(self, keep=None):
+        """Removes the least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith((".out", ".err")) or entry.name.startswith("tmp_"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep: # Just built or hit, and about to be used
+                continue
+            try:
+                os.remove(path)
+                self._count("evictions")
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "cache_dir": self.cache_dir,
+            "max_bytes": self.max_bytes,
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+            **stats,
+        }
@@ -0,0 +1,454 @@
+"""
+Static Big-O estimates for Python code (the "Local Analysis" of /analyze-complexity).
+
+Each function is scanned once, on its own, into a summary: the cost of its own
+loops and the calls it makes, each with the loop cost around it. Summaries only
+depend on the function's source, so they are cached by a hash of it and an edit
+re-scans just the functions that changed. Line numbers in a summary are relative
+to the function, so moving it doesn't invalidate it either.
+
+The summaries are then linked through the call graph. Its strongly connected
+components (Tarjan) are the recursive groups, and they are solved callees
+first, so a function's cost includes what it calls wherever in the file that
+is defined. Costs are (exponential base, power of N, power of log N) tuples,
+compared lexicographically.
+"""
+import ast
+import hashlib
+import math
+
+ONE = (0, 0, 0)
+LOG = (0, 0, 1)
+LINEAR = (0, 1, 0)
+N_LOG_N = (0, 1, 1)
+
+DIVIDING_OPS = (ast.FloorDiv, ast.Div, ast.RShift)
+HALVING_OPS = DIVIDING_OPS + (ast.Mult, ast.LShift) # Either way a loop over it takes log N steps
+TERMINATORS = (ast.Return, ast.Raise)
+SCOPE_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+# Builtins and methods whose cost grows with their input
+BUILTIN_COSTS = {
+    "sorted": N_LOG_N, "sort": N_LOG_N,
+    "sum": LINEAR, "min": LINEAR, "max": LINEAR, "any": LINEAR, "all": LINEAR,
+    "list": LINEAR, "set": LINEAR, "dict": LINEAR, "tuple": LINEAR,
+    "index": LINEAR, "count": LINEAR, "reverse": LINEAR, "copy": LINEAR, "join": LINEAR,
+}
+ALLOCATING = {"sorted", "list", "set", "dict", "tuple", "copy"}
+
+
+def mul(a, b):
+    return (max(a[0], b[0]), a[1] + b[1], a[2] + b[2])
+
+
+def format_cost(cost):
+    base, power, logs = cost
+    if base:
+        return f"O({base:g}^N)"
+    parts = []
+    if power:
+        parts.append("N" if power == 1 else f"N^{power:g}")
+    if logs:
+        parts.append("log N" if logs == 1 else f"log^{logs} N")
+    return f"O({' '.join(parts)})" if parts else "O(1)"
+
+
+def function_key(node, class_name, lines=None):
+    """Hash of the function's source lines (of its AST when there is no source)."""
+    if lines is not None:
+        text = "\n".join(lines[node.lineno - 1:node.end_lineno])
+    else:
+        text = ast.dump(node)
+    digest = hashlib.sha256(text.encode("utf-8"))
+    digest.update(b"\0" + (class_name or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def is_constant_iterable(node):
+    if isinstance(node, (ast.List, ast.Tuple, ast.Set, ast.Constant)):
+        return True
+    return (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "range"
+            and all(isinstance(arg, ast.Constant) for arg in node.args))
+
+
+class FunctionScanner:
+    """
+    One pass over a function body (not into nested functions or classes, which
+    get summaries of their own). Returns the summary:
+
+        {"cost", "calls": [(kind, name, cost around the call, divides input, branch)], "allocates",
+         "reasons": [(text, line relative to `origin`)]}
+
+    `branch` is the call's ((if id, arm), ...) path, so calls in different arms of
+    an if (or on either side of an early return) aren't counted as both happening.
+    """
+    def __init__(self, origin=0):
+        self.origin = origin
+        self.halving = set() # Names assigned something like (lo + hi) // 2 or arr[:mid]
+        self.allocates = False
+        self.reasons = []
+        self.branch = ()
+
+    def scan(self, body):
+        cost, calls = self.block(body)
+        return {"cost": cost, "calls": calls, "allocates": self.allocates, "reasons": self.reasons}
+
+    def block(self, stmts):
+        cost, calls = ONE, []
+        for i, stmt in enumerate(stmts):
+            if isinstance(stmt, ast.If) and not stmt.orelse and stmt.body and isinstance(stmt.body[-1], TERMINATORS):
+                # `if ...: return` - the rest of the block is the else arm
+                stmt_cost, stmt_calls = self.branches(stmt, stmt.body, stmts[i + 1:])
+                return max(cost, stmt_cost), calls + stmt_calls
+            stmt_cost, stmt_calls = self.stmt(stmt)
+            cost = max(cost, stmt_cost)
+            calls.extend(stmt_calls)
+        return cost, calls
+
+    def branches(self, node, body, orelse):
+        cost, calls = self.expr(node.test)
+        outer = self.branch
+        for arm, stmts in enumerate((body, orelse)):
+            self.branch = outer + ((id(node), arm),)
+            arm_cost, arm_calls = self.block(stmts)
+            cost = max(cost, arm_cost)
+            calls.extend(arm_calls)
+        self.branch = outer
+        return cost, calls
+
+    def stmt(self, node):
+        if isinstance(node, SCOPE_TYPES):
+            return ONE, []
+        if isinstance(node, (ast.For, ast.AsyncFor)):
+            head_cost, head_calls = self.expr(node.iter)
+            body_cost, body_calls = self.block(node.body)
+            factor = ONE if is_constant_iterable(node.iter) else LINEAR
+            if factor != ONE:
+                self.reasons.append((f"loop over `{ast.unparse(node.iter)[:30]}`", node.lineno - self.origin))
+            else_cost, else_calls = self.block(node.orelse)
+            return self.loop(factor, head_cost, head_calls, body_cost, body_calls, else_cost, else_calls)
+        if isinstance(node, ast.While):
+            head_cost, head_calls = self.expr(node.test)
+            body_cost, body_calls = self.block(node.body)
+            factor = self.while_factor(node)
+            self.reasons.append((f"{'halving ' if factor == LOG else ''}while loop", node.lineno - self.origin))
+            else_cost, else_calls = self.block(node.orelse)
+            return self.loop(factor, mul(factor, head_cost), [scaled(call, factor) for call in head_calls],
+                             body_cost, body_calls, else_cost, else_calls)
+        if isinstance(node, ast.If):
+            return self.branches(node, node.body, node.orelse)
+
+        if isinstance(node, ast.Assign) and self.divided(node.value):
+            self.halving.update(t.id for t in node.targets if isinstance(t, ast.Name))
+        cost, calls = ONE, []
+        for _, value in ast.iter_fields(node):
+            items = value if isinstance(value, list) else [value]
+            if items and isinstance(items[0], ast.stmt):
+                part_cost, part_calls = self.block(items)
+            else:
+                part_cost, part_calls = ONE, []
+                for item in items:
+                    if isinstance(item, ast.AST):
+                        item_cost, item_calls = self.expr(item)
+                        part_cost = max(part_cost, item_cost)
+                        part_calls.extend(item_calls)
+            cost = max(cost, part_cost)
+            calls.extend(part_calls)
+        return cost, calls
+
+    def loop(self, factor, head_cost, head_calls, body_cost, body_calls, else_cost, else_calls):
+        cost = max(head_cost, mul(factor, body_cost), else_cost, factor)
+        calls = head_calls + [scaled(call, factor) for call in body_calls] + else_calls
+        return cost, calls
+
+    def expr(self, node):
+        """Cost of an expression (comprehensions, builtins, slices) and the calls in it."""
+        cost, calls = ONE, []
+        stack = [(node, ONE)]
+        while stack:
+            node, around = stack.pop()
+            if isinstance(node, SCOPE_TYPES):
+                continue
+            inner = around
+            if isinstance(node, COMPREHENSIONS):
+                for gen in node.generators:
+                    if not is_constant_iterable(gen.iter):
+                        inner = mul(inner, LINEAR)
+                self.allocates = self.allocates or not isinstance(node, ast.GeneratorExp)
+                cost = max(cost, inner)
+            elif isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice):
+                self.allocates = True
+                cost = max(cost, mul(around, LINEAR))
+            elif isinstance(node, ast.Call):
+                kind, name = self.callee(node.func)
+                if name in BUILTIN_COSTS and kind != "method":
+                    cost = max(cost, mul(around, BUILTIN_COSTS[name]))
+                    self.allocates = self.allocates or name in ALLOCATING
+                if name is not None:
+                    calls.append((kind, name, around, self.divides(node), self.branch))
+            for child in ast.iter_child_nodes(node):
+                stack.append((child, inner))
+        return cost, calls
+
+    def callee(self, func):
+        if isinstance(func, ast.Name):
+            return "name", func.id
+        if isinstance(func, ast.Attribute):
+            if isinstance(func.value, ast.Name) and func.value.id in ("self", "cls"):
+                return "method", func.attr
+            return "attr", func.attr
+        return None, None
+
+    def halves(self, node, ops=HALVING_OPS):
+        return isinstance(node, ast.BinOp) and isinstance(node.op, ops) and not (
+            isinstance(node.right, ast.Constant) and node.right.value in (0, 1))
+
+    def divided(self, node):
+        """Whether an expression looks like a fraction of the input: n // 2, mid - 1, arr[:mid]..."""
+        for child in ast.walk(node):
+            if self.halves(child, DIVIDING_OPS) or (isinstance(child, ast.Name) and child.id in self.halving):
+                return True
+        return False
+
+    def divides(self, call):
+        return any(self.divided(arg) for arg in call.args + [kw.value for kw in call.keywords])
+
+    def while_factor(self, node):
+        """log N when a variable of the condition is multiplied/divided (or moved to a midpoint) in the body."""
+        names = {n.id for n in ast.walk(node.test) if isinstance(n, ast.Name)}
+        for child in ast.walk(ast.Module(body=node.body, type_ignores=[])):
+            if isinstance(child, ast.AugAssign) and isinstance(child.target, ast.Name):
+                if child.target.id in names and isinstance(child.op, HALVING_OPS):
+                    return LOG
+            elif isinstance(child, ast.Assign):
+                targets = {t.id for t in child.targets if isinstance(t, ast.Name)}
+                if not targets & names:
+                    continue
+                used = {n.id for n in ast.walk(child.value) if isinstance(n, ast.Name)}
+                if self.halves(child.value) and used & names:
+                    return LOG
+                if used & self.halving: # lo = mid + 1
+                    return LOG
+        return LINEAR
+
+
+class ComplexityAnalyzer:
+    """
+    Builds per-function time/space estimates and a summary report for the whole
+    file. Pass a TTLCache (ai_client.py) as `cache` to reuse function summaries
+    across requests.
+    """
+    def __init__(self, cache=None):
+        self.cache = cache
+        self.stats = {"functions_scanned": 0, "functions_reused": 0}
+
+    def summarize(self, node, class_name, lines=None):
+        key = function_key(node, class_name, lines) if self.cache is not None else None
+        if key is not None:
+            summary = self.cache.get(key)
+            if summary is not None:
+                self.stats["functions_reused"] += 1
+                return summary
+        summary = FunctionScanner(node.lineno).scan(node.body)
+        self.stats["functions_scanned"] += 1
+        if key is not None:
+            self.cache.put(key, summary)
+        return summary
+
+    def collect(self, tree):
+        """(qualified name, enclosing class, node) for every function, without recursion."""
+        found = []
+        stack = [(tree, "", None)]
+        while stack:
+            node, prefix, class_name = stack.pop()
+            for child in ast.iter_child_nodes(node):
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    found.append((prefix + child.name, class_name, child))
+                    stack.append((child, prefix + child.name + ".", None))
+                elif isinstance(child, ast.ClassDef):
+                    stack.append((child, prefix + child.name + ".", child.name))
+                elif isinstance(child, (ast.stmt, ast.excepthandler, ast.match_case)):
+                    # Definitions are statements, so expressions needn't be searched
+                    stack.append((child, prefix, class_name))
+        found.sort(key=lambda item: item[2].lineno)
+        return found
+
+    def analyze(self, code):
+        lines = code.splitlines() if isinstance(code, str) else None
+        tree = ast.parse(code) if isinstance(code, str) else code
+        functions = self.collect(tree)
+        summaries = {"<module>": FunctionScanner().scan(tree.body)}
+        classes = {"<module>": None}
+        origins = {"<module>": 0}
+        by_name, methods = {}, {}
+        for qualname, class_name, node in functions:
+            summaries[qualname] = self.summarize(node, class_name, lines)
+            classes[qualname] = class_name
+            origins[qualname] = node.lineno
+            if class_name is None:
+                by_name[node.name] = qualname
+            else:
+                methods.setdefault(node.name, []).append((class_name, qualname))
+
+        def resolve(caller, kind, name):
+            if kind == "name":
+                return by_name.get(name)
+            candidates = methods.get(name, [])
+            own = [q for c, q in candidates if c == classes[caller]]
+            return (own or [q for _, q in candidates] or [None])[0]
+
+        graph = {}
+        for caller, summary in summaries.items():
+            graph[caller] = [(resolve(caller, k, n), cost, divides, branch) for k, n, cost, divides, branch in summary["calls"]]
+            graph[caller] = [site for site in graph[caller] if site[0] is not None]
+
+        results = {}
+        for component in strongly_connected(graph):
+            self.solve(component, summaries, origins, graph, results)
+        return self.report(results)
+
+    def solve(self, component, summaries, origins, graph, results):
+        members = set(component)
+        work, space, reasons = ONE, ONE, []
+        recursive_sites = {}
+        for name in component:
+            summary = summaries[name]
+            work = max(work, summary["cost"])
+            reasons.extend(f"{text} (line {origins[name] + line})" for text, line in summary["reasons"])
+            if summary["allocates"]:
+                space = max(space, LINEAR)
+            for callee, around, divides, branch in graph[name]:
+                if callee in members:
+                    recursive_sites.setdefault(name, []).append((around, divides, branch))
+                else:
+                    work = max(work, mul(around, results[callee]["time"]))
+                    space = max(space, results[callee]["space"])
+                    if results[callee]["time"] != ONE:
+                        reasons.append(f"calls `{callee}` ({format_cost(results[callee]['time'])})")
+
+        time = work
+        if recursive_sites:
+            sites = max((on_one_path(sites) for sites in recursive_sites.values()), key=len)
+            calls = len(sites)
+            divides = all(d for _, d, _ in sites)
+            in_loop = any(around != ONE for around, _, _ in sites)
+            if in_loop and not divides:
+                time = (2, 0, 0)
+                space = max(space, LINEAR)
+                reasons.append("recursive call inside a loop (backtracking)")
+            elif divides:
+                # Master theorem with the input split in two: T(N) = calls * T(N/2) + work
+                critical = math.log2(calls)
+                if calls == 1:
+                    time = LOG if work == ONE else work
+                elif work[0] == 0 and work[1] > critical:
+                    time = work
+                elif work[0] == 0 and math.isclose(work[1], critical):
+                    time = mul(work, LOG)
+                else:
+                    time = (0, int(critical) if critical.is_integer() else round(critical, 2), 0)
+                space = max(space, LOG if calls == 1 and work == ONE else LINEAR)
+                reasons.append(f"recursion: {calls} call{'s' if calls > 1 else ''} on a divided input, "
+                               f"{format_cost(work)} work per call")
+            elif calls == 1:
+                time = mul(LINEAR, work)
+                space = max(space, LINEAR)
+                reasons.append(f"recursion: 1 call on a smaller input, {format_cost(work)} work per call")
+            else:
+                time = (calls, 0, 0)
+                space = max(space, LINEAR)
+                reasons.append(f"recursion: {calls} calls per call on a smaller input")
+
+        for name in component:
+            results[name] = {"time": time, "space": space, "recursive": bool(recursive_sites), "reasons": reasons}
+
+    def report(self, results):
+        functions = {name: result for name, result in results.items() if name != "<module>"}
+        ranked = functions or results
+        main = max(ranked, key=lambda name: (ranked[name]["time"], ranked[name]["space"]))
+        time, space = results[main]["time"], results[main]["space"]
+        if "<module>" in results:
+            time = max(time, results["<module>"]["time"])
+            space = max(space, results["<module>"]["space"])
+
+        lines = []
+        for name, result in ranked.items():
+            why = "; ".join(dict.fromkeys(result["reasons"])) or "no loops or calls that grow with the input"
+            lines.append(f"- `{name}`: {format_cost(result['time'])} time, {format_cost(result['space'])} space ({why})")
+        return {
+            "time": format_cost(time),
+            "space": format_cost(space),
+            "derivation": "\n".join(lines) + "\n\n(Local Analysis)",
+            "functions": {
+                name: {"time": format_cost(r["time"]), "space": format_cost(r["space"]), "recursive": r["recursive"]}
+                for name, r in functions.items()
+            },
+        }
+
+    def metrics(self):
+        return {**self.stats, "cache": self.cache.metrics() if self.cache is not None else None}
+
+
+def scaled(call, factor):
+    kind, name, around, divides, branch = call
+    return kind, name, mul(factor, around), divides, branch
+
+
+def exclusive(a, b):
+    arms = dict(a)
+    return any(if_id in arms and arms[if_id] != arm for if_id, arm in b)
+
+
+def on_one_path(sites):
+    """The largest set of call sites that can all run in one invocation."""
+    best = []
+    for start in range(len(sites)):
+        chosen = [sites[start]]
+        for site in sites[start + 1:] + sites[:start]:
+            if not any(exclusive(site[2], other[2]) for other in chosen):
+                chosen.append(site)
+        if len(chosen) > len(best):
+            best = chosen
+    return best
+
+
+def strongly_connected(graph):
+    """Tarjan's algorithm without recursion. Components come out callees first."""
+    index, low, on_stack = {}, {}, set()
+    stack, components = [], []
+    counter = 0
+    for root in graph:
+        if root in index:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, i = work.pop()
+            if i == 0:
+                index[node] = low[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack.add(node)
+            edges = graph[node]
+            while i < len(edges):
+                callee = edges[i][0]
+                i += 1
+                if callee not in index:
+                    work.append((node, i))
+                    work.append((callee, 0))
+                    break
+                if callee in on_stack:
+                    low[node] = min(low[node], index[callee])
+            else:
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+    return components
@@ -0,0 +1,240 @@
+"""
+Empirical time complexity: runs one function of the user's code on generated inputs
+of growing size, counts the line events it executes (deterministic, unlike wall
+time) and fits the counts against the usual growth models.
+
+measure() runs user code, so it is only called inside a PythonTracePool worker
+(python_pool.py), which holds the memory limits and kills runs that hang.
+"""
+import ast
+import math
+import random
+import sys
+import time
+
+FILENAME = "<complexity>"
+# Simplest first: of the fits that are about as good, the simplest one wins
+MODELS = {
+    "O(1)": lambda n: 1.0,
+    "O(log N)": lambda n: math.log2(n),
+    "O(N)": lambda n: float(n),
+    "O(N log N)": lambda n: n * math.log2(n),
+    "O(N^2)": lambda n: float(n * n),
+    "O(N^3)": lambda n: float(n ** 3),
+}
+EXPONENTIAL = "O(2^N)" # Fitted as c * b^n for any base b, so fib's 1.6^n counts too
+TIE_MARGIN = 0.02 # Relative error within which a simpler model is preferred
+INPUT_KINDS = ("auto", "list", "sorted_list", "int", "string")
+LOW_NAMES = {"lo", "low", "left", "l", "start", "begin", "first"}
+HIGH_NAMES = {"hi", "high", "right", "r", "end", "stop", "last"}
+SEARCH_HINTS = ("search", "bisect", "sorted", "find")
+
+
+class OperationLimit(BaseException):
+    """Stops a run that went over max_ops. BaseException so user code can't catch it."""
+
+
+class LineCounter:
+    """Counts line events in the user's code, raising OperationLimit past `limit` or `deadline`."""
+    def __init__(self, limit, deadline):
+        self.limit = limit
+        self.deadline = deadline
+        self.count = 0
+
+    def trace(self, frame, event, arg):
+        if frame.f_code.co_filename != FILENAME:
+            return None
+        if event == "line":
+            self.count += 1
+            if self.count > self.limit or (self.count & 0xfff == 0 and time.monotonic() > self.deadline):
+                raise OperationLimit()
+        return self.trace
+
+
+def pick_function(tree, name=None):
+    functions = [node for node in tree.body if isinstance(node, ast.FunctionDef)]
+    if name is not None:
+        functions = [node for node in functions if node.name == name]
+    if not functions:
+        raise ValueError(f"No top-level function named '{name}'" if name else "No top-level function to measure")
+    return functions[0]
+
+
+def input_kinds(func, kind):
+    if kind != "auto":
+        return [kind]
+    hints = func.name.lower() + " " + " ".join(arg.arg.lower() for arg in func.args.args)
+    if any(hint in hints for hint in SEARCH_HINTS):
+        return ["sorted_list", "int"]
+    return ["list", "int", "string"]
+
+
+def make_args(func, kind, n, rng):
+    """Arguments for a call at size n: the first parameter carries the size."""
+    if kind == "int":
+        sized = n
+    elif kind == "string":
+        sized = "".join(rng.choice("abcdefghij") for _ in range(n))
+    else:
+        sized = [rng.randrange(n * 4 + 1) for _ in range(n)]
+        if kind == "sorted_list":
+            sized.sort()
+
+    args = [sized]
+    params = func.args.args[1:]
+    required = len(params) - len(func.args.defaults)
+    for param in params[:required]:
+        name = param.arg.lower()
+        if name in LOW_NAMES:
+            args.append(0)
+        elif name in HIGH_NAMES:
+            args.append(n - 1)
+        elif name in ("n", "size", "length"):
+            args.append(n)
+        elif isinstance(sized, list) and sized:
+            args.append(rng.choice(sized)) # target, key, value, ...
+        else:
+            args.append(n)
+    return args
+
+
+def count_ops(fn, args, max_ops, deadline):
+    counter = LineCounter(max_ops, deadline)
+    sys.settrace(counter.trace)
+    try:
+        fn(*args)
+    finally:
+        sys.settrace(None)
+    return counter.count
+
+
+def fit(points):
+    """
+    Least-squares fit of ops ~ a * f(n) + b (a > 0) for every model, weighted so the
+    error is relative to each measurement. Returns [(model, relative_rms_error)],
+    best first.
+    """
+    ns = [n for n, _ in points]
+    ys = [float(ops) for _, ops in points]
+    ws = [1.0 / (y * y) for y in ys]
+    sw = sum(ws)
+    spread = max(ys) - min(ys)
+    results = []
+    for name, f in MODELS.items():
+        if name == "O(log N)" and min(ns) < 2:
+            continue
+        xs = [f(n) for n in ns]
+        if name == "O(1)":
+            a, b = 0.0, sum(w * y for w, y in zip(ws, ys)) / sw
+        else:
+            sx = sum(w * x for w, x in zip(ws, xs))
+            sy = sum(w * y for w, y in zip(ws, ys))
+            sxx = sum(w * x * x for w, x in zip(ws, xs))
+            sxy = sum(w * x * y for w, x, y in zip(ws, xs, ys))
+            det = sw * sxx - sx * sx
+            if det <= 0:
+                continue
+            a = (sw * sxy - sx * sy) / det
+            # A model that only fits by (almost) not growing is O(1) in disguise
+            if a * (max(xs) - min(xs)) <= 0.05 * max(spread, 1.0):
+                continue
+            b = (sy - a * sx) / sw
+        results.append((name, relative_error(ys, [a * x + b for x in xs])))
+
+    # ln(ops) = ln(c) + n * ln(base), fitted only where the counts really explode
+    if spread > 0 and max(ns) <= 64:
+        count = len(ns)
+        mean_n = sum(ns) / count
+        logs = [math.log(y) for y in ys]
+        mean_log = sum(logs) / count
+        var = sum((n - mean_n) ** 2 for n in ns)
+        slope = sum((n - mean_n) * (l - mean_log) for n, l in zip(ns, logs)) / var if var else 0.0
+        if slope > math.log(1.2):
+            intercept = mean_log - slope * mean_n
+            results.append((EXPONENTIAL, relative_error(ys, [math.exp(intercept + slope * n) for n in ns])))
+
+    order = list(MODELS) + [EXPONENTIAL]
+    results.sort(key=lambda item: item[1])
+    best_error = results[0][1]
+    # Among the fits within TIE_MARGIN of the best, the simplest goes first
+    close = sorted((r for r in results if r[1] <= best_error + TIE_MARGIN), key=lambda item: order.index(item[0]))
+    return close + [r for r in results if r[1] > best_error + TIE_MARGIN]
+
+
+def relative_error(ys, predicted):
+    return math.sqrt(sum(((p - y) / y) ** 2 for y, p in zip(ys, predicted)) / len(ys))
+
+
+def measure(code, function=None, input_kind="auto", max_size=4096, max_ops=1_000_000, time_budget=5.0, repeats=3, seed=0):
+    """
+    Measures the growth of `function` (default: the first top-level function).
+    Sizes double from 4 up to max_size; a size whose run goes over max_ops, or the
+    time budget running out, ends the series. Fast-growing functions that hit the
+    cap early are re-measured at sizes 1, 2, 3, ... so exponential growth still
+    gets enough points. Each size is run `repeats` times on different random inputs
+    and the largest count (the worst case seen) is kept.
+    """
+    if input_kind not in INPUT_KINDS:
+        raise ValueError(f"input_kind must be one of {INPUT_KINDS}")
+    tree = ast.parse(code)
+    func = pick_function(tree, function)
+    namespace = {"__name__": "__complexity__"}
+    exec(compile(tree, FILENAME, "exec"), namespace)
+    fn = namespace[func.name]
+
+    deadline = time.monotonic() + time_budget
+    failures = []
+    for kind in input_kinds(func, input_kind):
+        points = []
+        try:
+            for sizes in (doubling(max_size), range(1, 64)):
+                points = run_series(fn, func, kind, sizes, max_ops, deadline, repeats, seed)
+                if len(points) >= 5:
+                    break
+        except OperationLimit:
+            pass
+        except Exception as e: # This kind of input doesn't suit the function
+            failures.append(f"{kind}: {type(e).__name__}: {e}")
+            continue
+        if len(points) >= 4:
+            return report(func.name, kind, points)
+        failures.append(f"{kind}: too few measurements ({len(points)})")
+    raise ValueError("Could not measure: " + "; ".join(failures))
+
+
+def doubling(max_size):
+    n = 4
+    while n <= max_size:
+        yield n
+        n *= 2
+
+
+def run_series(fn, func, kind, sizes, max_ops, deadline, repeats, seed):
+    rng = random.Random(seed)
+    if kind == "int":
+        repeats = 1 # Nothing random to vary
+    points = []
+    for n in sizes:
+        try:
+            ops = max(count_ops(fn, make_args(func, kind, n, rng), max_ops, deadline) for _ in range(repeats))
+        except (OperationLimit, RecursionError):
+            break
+        points.append((n, max(ops, 1)))
+    return points
+
+
+def report(name, kind, points):
+    fits = fit(points)
+    best, best_error = fits[0]
+    runner_up_error = min((error for _, error in fits[1:]), default=1.0)
+    # High when the best model fits well and clearly beats the others
+    separation = min(1.0, max(0.0, runner_up_error - best_error) / 0.1)
+    confidence = (1.0 - min(best_error, 1.0)) * separation
+    return {
+        "function": name,
+        "input": kind,
+        "time": best,
+        "confidence": round(confidence, 2),
+        "points": [{"n": n, "ops": ops} for n, ops in points],
+        "fits": [{"model": model, "error": round(error, 4)} for model, error in fits],
+    }
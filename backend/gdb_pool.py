@@ -0,0 +1,328 @@
+import codecs
+import os
+import select
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from metrics import count
+from mi_parser import MIParser, dump_c_string
+
+
+class GDBSessionError(Exception):
+    pass
+
+
+class GDBTimeout(GDBSessionError):
+    """GDB produced no output before the session's deadline."""
+
+
+class GDBSession:
+    """
+    A long-lived `gdb --interpreter=mi` process. Executables are swapped in with
+    -file-exec-and-symbols, so GDB itself only starts once per session.
+
+    Output is read in bulk and parsed into MIRecords (see mi_parser.py). Every
+    command gets a token so its result can be matched up, which lets callers write
+    several commands at once with send_batch() and read the results in order. Exec
+    async records (*running, *stopped) that arrive while waiting for a result are
+    queued in `events` for wait_for_stop().
+
+    If `deadline` (a time.monotonic() value) is set, reads that would wait past it
+    raise GDBTimeout. The traced program's pid is picked up from GDB's
+    =thread-group-started notification; `on_inferior_started` is called with it.
+    """
+    READ_SIZE = 65536
+
+    def __init__(self, gdb_path="gdb"):
+        self.uses = 0
+        self.created_at = time.monotonic()
+        count("subprocesses_started_total", kind="gdb")
+        self.process = subprocess.Popen(
+            [gdb_path, "--interpreter=mi", "--nx", "--quiet"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0
+        )
+        self.parser = MIParser()
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.records = deque()
+        self.events = deque()
+        self.last_token = 0
+        self.configured = set() # console_once commands already run
+        self.deadline = None
+        self.inferior_pid = None
+        self.on_inferior_started = None
+        self.command("-gdb-set confirm off")
+        self.command("-gdb-set pagination off")
+        # Commands written while the program runs wait until it stops (pipelining relies on this)
+        self.command("-gdb-set mi-async off")
+
+    def send(self, cmd):
+        return self.send_batch([cmd])[0]
+
+    def send_batch(self, cmds):
+        """Writes all commands in one go and returns their tokens."""
+        tokens = list(range(self.last_token + 1, self.last_token + 1 + len(cmds)))
+        self.last_token += len(cmds)
+        data = "".join(f"{token}{cmd}\n" for token, cmd in zip(tokens, cmds))
+        self.process.stdin.write(data.encode("utf-8"))
+        self.process.stdin.flush()
+        return tokens
+
+    def read_record(self):
+        """Returns the next record, skipping prompts."""
+        while True:
+            while self.records:
+                record = self.records.popleft()
+                if record.kind == "notify" and record.cls == "thread-group-started":
+                    self._inferior_started(record)
+                if record.kind != "prompt":
+                    return record
+            self._wait_readable()
+            data = os.read(self.process.stdout.fileno(), self.READ_SIZE)
+            if not data:
+                raise GDBSessionError("GDB exited unexpectedly")
+            self.records.extend(self.parser.feed(self.decoder.decode(data)))
+
+    def _wait_readable(self):
+        if self.deadline is None or os.name == "nt": # select() doesn't take pipes on Windows
+            return
+        remaining = self.deadline - time.monotonic()
+        readable, _, _ = select.select([self.process.stdout], [], [], max(remaining, 0))
+        if not readable:
+            raise GDBTimeout("Timed out waiting for GDB")
+
+    def _inferior_started(self, record):
+        # =thread-group-started,id="i1",pid="12345"
+        try:
+            self.inferior_pid = int(record.results["pid"])
+        except (KeyError, ValueError):
+            return
+        if self.on_inferior_started is not None:
+            self.on_inferior_started(self.inferior_pid)
+
+    def kill_inferior(self):
+        """Kills the traced program directly, for when GDB is stuck waiting on it."""
+        if self.inferior_pid is None or os.name == "nt":
+            return
+        try:
+            os.kill(self.inferior_pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.inferior_pid = None
+
+    def read_result(self, token=None, console=None):
+        """
+        Reads up to the next result record, queueing exec records on the way. Console
+        output on the way is appended to `console` if a list is given.
+        """
+        while True:
+            record = self.read_record()
+            if record.kind == "result":
+                if token is not None and record.token != token:
+                    raise GDBSessionError(f"Expected the result of command {token}, got {record!r}")
+                return record
+            if record.kind == "exec":
+                self.events.append(record)
+            elif record.kind == "console" and console is not None:
+                console.append(record.text)
+
+    def command(self, cmd):
+        """Sends one MI command and returns its result record."""
+        return self.read_result(self.send(cmd))
+
+    def console(self, cmd):
+        """Runs a CLI command through MI."""
+        return self.command(f"-interpreter-exec console {dump_c_string(cmd)}")
+
+    def console_once(self, cmd):
+        """Runs a CLI command the first time it is asked for in this session."""
+        if cmd in self.configured:
+            return
+        record = self.console(cmd)
+        if record.cls != "done":
+            raise GDBSessionError(f"{cmd} failed: {record.results.get('msg', record.cls)}")
+        self.configured.add(cmd)
+
+    def source_script(self, path):
+        """Loads a GDB Python script, once per session."""
+        self.console_once(f"source {path}")
+
+    def wait_for_stop(self):
+        """Returns the next *stopped record."""
+        while True:
+            record = self.events.popleft() if self.events else self.read_record()
+            if record.kind == "exec" and record.cls == "stopped":
+                return record
+
+    def load_executable(self, path):
+        # MI c-strings treat backslashes as escapes, GDB accepts forward slashes everywhere
+        mi_path = path.replace("\\", "/")
+        record = self.command(f'-file-exec-and-symbols "{mi_path}"')
+        if record.cls != "done":
+            raise GDBSessionError(f"Could not load {path}: {record.results.get('msg', record.cls)}")
+
+    def reset(self):
+        """Kills any inferior left over from the last trace and drops its breakpoints."""
+        self.deadline = None
+        self.console("kill") # ^error when nothing is running, that's fine
+        self.console("unset exec-wrapper")
+        if self.command("-break-delete").cls != "done":
+            raise GDBSessionError("Could not clear breakpoints")
+        self.events.clear()
+        self.inferior_pid = None
+        self.on_inferior_started = None
+
+    def is_healthy(self):
+        if self.process.poll() is not None:
+            return False
+        try:
+            return self.command("-list-features").cls == "done"
+        except (GDBSessionError, OSError):
+            return False
+
+    def close(self):
+        if self.process.poll() is None:
+            try:
+                self.send("-gdb-exit")
+                self.process.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                self.process.kill()
+
+
+class GDBSessionPool:
+    """
+    A pool of pre-warmed GDB sessions. A session goes back into the pool after each
+    trace unless it errored, failed its health check or reached `max_uses`, in which
+    case it is closed and replaced by a fresh one.
+    """
+    def __init__(self, size=2, max_uses=50, gdb_path="gdb"):
+        self.size = size
+        self.max_uses = max_uses
+        self.gdb_path = gdb_path
+        self._idle = []
+        self._total = 0
+        self._closed = False
+        self._lock = threading.Condition()
+        self.stats = {
+            "sessions_started": 0,
+            "sessions_recycled": 0,
+            "health_check_failures": 0,
+            "acquired": 0,
+            "waited": 0,
+        }
+
+    def start(self):
+        """Starts `size` sessions up front so the first requests don't pay for GDB startup."""
+        for _ in range(self.size):
+            session = self._spawn()
+            with self._lock:
+                self._idle.append(session)
+
+    def _spawn(self):
+        session = GDBSession(self.gdb_path)
+        with self._lock:
+            self._total += 1
+            self.stats["sessions_started"] += 1
+        return session
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            if self._closed:
+                raise GDBSessionError("GDB pool is closed")
+            if not self._idle and self._total >= self.size:
+                self.stats["waited"] += 1
+            while not self._idle and self._total >= self.size:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise GDBSessionError("Timed out waiting for a GDB session")
+                self._lock.wait(remaining)
+            self.stats["acquired"] += 1
+            if self._idle:
+                return self._idle.pop()
+            self._total += 1 # Reserve the slot before spawning outside the lock
+            self.stats["sessions_started"] += 1
+
+        try:
+            return GDBSession(self.gdb_path)
+        except Exception:
+            with self._lock:
+                self._total -= 1
+                self._lock.notify()
+            raise
+
+    def release(self, session, healthy=True):
+        session.uses += 1
+        if healthy:
+            try:
+                session.reset()
+            except (GDBSessionError, OSError):
+                healthy = False
+        if healthy and not session.is_healthy():
+            healthy = False
+            with self._lock:
+                self.stats["health_check_failures"] += 1
+
+        if healthy and session.uses < self.max_uses and not self._closed:
+            with self._lock:
+                self._idle.append(session)
+                self._lock.notify()
+            return
+
+        session.close()
+        with self._lock:
+            self.stats["sessions_recycled"] += 1
+            if self._closed:
+                self._total -= 1
+                self._lock.notify()
+                return
+
+        # Keep the slot and refill it, so the next request doesn't have to start GDB
+        try:
+            replacement = GDBSession(self.gdb_path)
+        except Exception as e:
+            print(f"Could not start a replacement GDB session: {e}")
+            with self._lock:
+                self._total -= 1
+                self._lock.notify()
+            return
+        with self._lock:
+            self.stats["sessions_started"] += 1
+            self._idle.append(replacement)
+            self._lock.notify()
+
+    @contextmanager
+    def session(self, timeout=None):
+        session = self.acquire(timeout)
+        healthy = False
+        try:
+            yield session
+            healthy = True
+        finally:
+            self.release(session, healthy)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "max_uses": self.max_uses,
+                "total": self._total,
+                "idle": len(self._idle),
+                "in_use": self._total - len(self._idle),
+                **self.stats,
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            sessions, self._idle = self._idle, []
+            self._total -= len(sessions)
+            self._lock.notify_all()
+        for session in sessions:
+            session.close()
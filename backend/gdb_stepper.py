@@ -0,0 +1,272 @@
+"""
+GDB Python script used by CTracer. It is loaded into GDB with
+`source gdb_stepper.py` and is not importable outside of GDB. It defines:
+
+    trace-snapshot
+        Prints the current step (stack + heap) as one line of JSON. The MI
+        engine runs it after every -exec-step.
+    trace-steps OUT_FILE MAX_STEPS [STDIN_FILE]
+        The "python" engine: runs the loaded program from main, steps up to
+        MAX_STEPS times and writes all steps to OUT_FILE as JSON.
+
+Steps have the same shape as tracer.py's: every frame with line info, outermost
+first, and a heap of the objects the locals reach. Heap entries are keyed by
+address, so a vector seen through a reference in one frame and by value in
+another is one entry.
+
+Only the innermost frame is read on each step. An outer frame's locals are the
+ones captured when it was last innermost (it can't run in between), kept in a
+per-frame cache; deep recursion therefore costs one frame per step, not the
+whole stack. Heap objects reachable from the innermost frame are re-read every
+step, so changes made through pointers and references show up in outer frames
+too. Outer-frame scalars written through a pointer stay stale until that frame
+is innermost again.
+"""
+import itertools
+import json
+
+import gdb
+
+MAX_HEAP_DEPTH = 3      # Pointer/container levels followed from a local
+MAX_ITEMS = 50          # Elements shown per container
+MAX_HEAP_OBJECTS = 200  # Heap entries read per step
+
+SCALAR_TYPE_CODES = (
+    gdb.TYPE_CODE_INT, gdb.TYPE_CODE_FLT, gdb.TYPE_CODE_BOOL, gdb.TYPE_CODE_CHAR,
+    gdb.TYPE_CODE_ENUM, gdb.TYPE_CODE_FUNC,
+)
+REFERENCE_TYPE_CODES = (gdb.TYPE_CODE_REF, gdb.TYPE_CODE_RVALUE_REF)
+COMPOSITE_TYPE_CODES = (gdb.TYPE_CODE_STRUCT, gdb.TYPE_CODE_UNION, gdb.TYPE_CODE_ARRAY)
+
+
+def is_running():
+    return gdb.selected_inferior().pid != 0 and gdb.selected_thread() is not None
+
+
+def frame_line(frame):
+    sal = frame.find_sal()
+    return sal.line if sal.symtab is not None and sal.line else None
+
+
+class HeapReader:
+    """Encodes gdb.Values into tracer.py's {"value": ...} / {"ref": id} shapes."""
+    def __init__(self, heap):
+        self.heap = heap
+        self.budget = MAX_HEAP_OBJECTS
+
+    def encode(self, value, depth=0):
+        try:
+            value_type = value.type.strip_typedefs()
+            code = value_type.code
+            if code in REFERENCE_TYPE_CODES:
+                return self.encode(value.referenced_value(), depth)
+            if code in SCALAR_TYPE_CODES:
+                return {"value": str(value)}
+            if code == gdb.TYPE_CODE_PTR:
+                return self.encode_pointer(value, value_type, depth)
+            if code in COMPOSITE_TYPE_CODES:
+                return self.encode_object(value, value_type, depth)
+            return {"value": str(value)}
+        except (gdb.error, gdb.MemoryError, RuntimeError) as e:
+            return {"value": f"<{e}>"}
+
+    def encode_pointer(self, value, value_type, depth):
+        address = int(value)
+        if address == 0:
+            return {"value": "nullptr"}
+        target = value_type.target().strip_typedefs()
+        # Pointers to scalars (and char* strings) stay values; only objects go on the heap
+        if target.code not in COMPOSITE_TYPE_CODES or depth >= MAX_HEAP_DEPTH:
+            return {"value": str(value)}
+        try:
+            return self.encode_object(value.dereference(), target, depth + 1, address)
+        except gdb.MemoryError: # Dangling or uninitialized
+            return {"value": hex(address)}
+
+    def encode_object(self, value, value_type, depth, address=None):
+        printer = gdb.default_visualizer(value)
+        hint = printer.display_hint() if hasattr(printer, "display_hint") else None
+        if printer is not None and (hint == "string" or not hasattr(printer, "children")):
+            return {"value": str(value)} # std::string and friends read as values
+
+        if address is None and value.address is not None:
+            address = int(value.address)
+        if address is None or self.budget <= 0 or depth > MAX_HEAP_DEPTH:
+            return {"value": str(value)}
+        if address in self.heap:
+            return {"ref": address}
+
+        self.budget -= 1
+        self.heap[address] = None # Placeholder so cycles terminate
+        try:
+            type_name = str(value.type.strip_typedefs().unqualified())
+            if printer is not None:
+                encoded = {"type": type_name, "value": self.encode_children(printer, hint, depth)}
+            elif value_type.code == gdb.TYPE_CODE_ARRAY:
+                low, high = value_type.range()
+                length = high - low + 1
+                items = [self.encode(value[i], depth + 1) for i in range(low, low + min(length, MAX_ITEMS))]
+                if length > MAX_ITEMS:
+                    items.append({"value": f"... {length - MAX_ITEMS} more"})
+                encoded = {"type": type_name, "value": items}
+            else:
+                encoded = {"type": type_name, "value": self.encode_fields(value, value_type, depth)}
+        except (gdb.error, gdb.MemoryError, RuntimeError) as e:
+            del self.heap[address]
+            return {"value": f"<{e}>"}
+        self.heap[address] = encoded
+        return {"ref": address}
+
+    def encode_fields(self, value, value_type, depth):
+        """
+        A struct's data members by name. Members of base classes and of anonymous
+        structs/unions are listed as the object's own; static members (not part of
+        the object, no bitpos) and the vtable pointer are left out. A member that
+        can't be read is shown as an error value without losing the others.
+        """
+        fields = {}
+        for field in value_type.fields():
+            if not hasattr(field, "bitpos") or field.artificial:
+                continue
+            try:
+                if field.is_base_class or not field.name:
+                    member_type = field.type.strip_typedefs()
+                    if member_type.code in (gdb.TYPE_CODE_STRUCT, gdb.TYPE_CODE_UNION):
+                        fields.update(self.encode_fields(value[field], member_type, depth))
+                else:
+                    fields[field.name] = self.encode(value[field], depth + 1)
+            except (gdb.error, gdb.MemoryError, RuntimeError) as e:
+                if field.name:
+                    fields[field.name] = {"value": f"<{e}>"}
+        return fields
+
+    def encode_children(self, printer, hint, depth):
+        # children() can be endless for an uninitialized container, so never exhaust it
+        children = list(itertools.islice(printer.children(), 2 * MAX_ITEMS + 1))
+        if hint == "map": # Alternating key and value children
+            pairs = zip(children[0::2], children[1::2])
+            return {str(key): self.encode_child(item, depth) for (_, key), (_, item) in itertools.islice(pairs, MAX_ITEMS)}
+        items = [self.encode_child(item, depth) for _, item in children[:MAX_ITEMS]]
+        if len(children) > MAX_ITEMS:
+            items.append({"value": "..."})
+        return items
+
+    def encode_child(self, item, depth):
+        if isinstance(item, gdb.Value):
+            return self.encode(item, depth + 1)
+        return {"value": str(item)}
+
+
+def frame_locals(frame, reader):
+    variables = {}
+    try:
+        block = frame.block()
+    except RuntimeError: # No debug info for this frame
+        return variables
+    while block is not None:
+        for symbol in block:
+            if (symbol.is_variable or symbol.is_argument) and symbol.name not in variables:
+                try:
+                    variables[symbol.name] = reader.encode(symbol.value(frame))
+                except (gdb.error, RuntimeError): # Optimized out
+                    continue
+        if block.function is not None:
+            break
+        block = block.superblock
+    return variables
+
+
+class Snapshotter:
+    def __init__(self):
+        # One (func_name, locals, heap) per frame depth, outermost first
+        self.frames = []
+
+    def reset(self):
+        self.frames = []
+
+    def snapshot(self):
+        frames = []
+        frame = gdb.newest_frame()
+        while frame is not None:
+            line = frame_line(frame)
+            if line is not None:
+                frames.append((frame, line))
+            frame = frame.older()
+        frames.reverse()
+        if not frames or frames[-1][0] != gdb.newest_frame():
+            return None # Stopped outside the program's own code
+
+        # Outer frames whose function still matches keep their cached locals
+        depth = len(frames) - 1
+        del self.frames[depth:]
+        for i, (frame, _) in enumerate(frames[:depth]):
+            if i < len(self.frames) and self.frames[i][0] == frame.name():
+                continue
+            del self.frames[i:]
+            heap = {}
+            self.frames.append((frame.name(), frame_locals(frame, HeapReader(heap)), heap))
+
+        heap = {}
+        for _, _, frame_heap in self.frames:
+            heap.update(frame_heap)
+        top_heap = {}
+        top_locals = frame_locals(frames[-1][0], HeapReader(top_heap))
+        heap.update(top_heap)
+        self.frames.append((frames[-1][0].name(), top_locals, top_heap))
+
+        stack = [{
+            "func_name": func_name or "?",
+            "lineno": line,
+            "locals": frame_vars
+        } for (func_name, frame_vars, _), (_, line) in zip(self.frames, frames)]
+        return {"line_number": stack[-1]["lineno"], "stack": stack, "heap": heap}
+
+
+snapshotter = Snapshotter()
+
+
+def start_program(stdin_file=None):
+    snapshotter.reset()
+    gdb.execute("break main", to_string=True)
+    gdb.execute(f"run < {stdin_file}" if stdin_file else "run", to_string=True)
+
+
+class TraceSnapshot(gdb.Command):
+    def __init__(self):
+        super().__init__("trace-snapshot", gdb.COMMAND_USER)
+
+    def invoke(self, argument, from_tty):
+        if argument == "reset":
+            snapshotter.reset()
+            return
+        step = snapshotter.snapshot() if is_running() else None
+        gdb.write(json.dumps(step) + "\n")
+
+
+class TraceSteps(gdb.Command):
+    def __init__(self):
+        super().__init__("trace-steps", gdb.COMMAND_USER)
+
+    def invoke(self, argument, from_tty):
+        args = gdb.string_to_argv(argument)
+        out_file, max_steps = args[0], int(args[1])
+
+        steps = []
+        start_program(args[2] if len(args) > 2 else None)
+        for _ in range(max_steps):
+            if not is_running():
+                break
+            step = snapshotter.snapshot()
+            if step is not None:
+                steps.append(step)
+            try:
+                gdb.execute("step", to_string=True)
+            except gdb.error: # The program exited or was killed
+                break
+
+        with open(out_file, "w") as f:
+            json.dump(steps, f)
+
+
+TraceSnapshot()
+TraceSteps()
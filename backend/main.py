@@ -1,13 +1,27 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import google.generativeai as genai
 import os
+import time
+import asyncio
 from dotenv import load_dotenv
 import ast
-import graphviz
 import json
 from c_tracer import CTracer
+from gdb_pool import GDBSessionPool
+from compile_cache import CompileCache
+from toolchain import Toolchain
+from ast_graph import ASTVisualizer
+from complexity import ComplexityAnalyzer
+from ai_client import GeminiClient, TTLCache, cache_key
+from scheduler import JobLimits, SchedulerBusy, TraceScheduler
+from python_pool import PythonTracePool, PythonTraceError, PythonTraceTimeout
+from trace_format import encode_compact, COMPACT_MEDIA_TYPE
+from trace_store import TraceStore, DEFAULT_STORE_PATH
+import metrics
+from metrics import span
 
 load_dotenv()
 
@@ -22,13 +36,57 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# Gemini API setup (Only used for Error Explanations)
+# Request latency histograms for /metrics, and a Server-Timing breakdown of the
+# request's spans (see metrics.py) when it is sent with an "X-Profile" header
+PROFILE_HEADER_ENABLED = os.getenv("PROFILE_HEADER", "1") == "1"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    profile = metrics.start_profile() if PROFILE_HEADER_ENABLED and "x-profile" in request.headers else None
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    route = request.url.path if request.url.path in known_routes() else "other"
+    metrics.observe("request_seconds", elapsed, endpoint=route, method=request.method)
+    metrics.count("requests_total", endpoint=route, method=request.method, status=response.status_code)
+    if profile is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(profile, elapsed)
+    return response
+
+def known_routes():
+    # Only real routes become labels, so random 404 paths can't blow up the series count
+    return {route.path for route in app.routes}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Gemini API setup. The model name is discovered once (refreshed every GEMINI_MODEL_TTL
+# seconds) and answers are cached by normalized code + request details (see ai_client.py)
+ai_cache = TTLCache(
+    max_entries=int(os.getenv("AI_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("AI_CACHE_TTL", str(24 * 3600))),
+)
 try:
-    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    gemini = GeminiClient(
+        api_key=os.getenv("GEMINI_API_KEY"),
+        client=genai,
+        model_ttl=float(os.getenv("GEMINI_MODEL_TTL", "3600")),
+        cache=ai_cache,
+    )
 except Exception as e:
     print(f"Error configuring Gemini API: {e}")
+    gemini = GeminiClient(client=genai, cache=ai_cache)
+
+# Seconds an endpoint waits for Gemini before answering without it
+AI_TIMEOUT = float(os.getenv("AI_TIMEOUT", "8"))
+
+@app.get("/ai-metrics")
+async def ai_metrics():
+    return gemini.metrics()
 
 class ErrorRequest(BaseModel):
     code: str
@@ -37,108 +95,45 @@ class ErrorRequest(BaseModel):
 class ComplexityRequest(BaseModel):
     code: str
     language: str
+    empirical: bool = False # Python only: measure the function instead of reading it
+    function: str | None = None # Function to measure; the first top-level one by default
+    input_kind: str = "auto" # "auto", "list", "sorted_list", "int" or "string"
 
-# --- NEW: Advanced Local Complexity Analysis Logic ---
-class ComplexityAnalyzer(ast.NodeVisitor):
-    def __init__(self):
-        self.complexity_score = 0 # abstract score
-        self.complexities = [] # list of 'N', 'log N', etc.
-        self.max_depth = 0
-        self.current_depth = 0
-        self.defined_functions = set()
-        self.recursive_calls = 0
-        self.recursion_type = None # 'linear', 'binary', 'log'
-        self.loop_vars = set()
-    
-    def visit_FunctionDef(self, node):
-        self.defined_functions.add(node.name)
-        # Reset per function for simplicity in this basic version, 
-        # but in a real static analyzer we'd need a call graph.
-        # For now, we assume the code snippet is the target algorithm.
-        self.generic_visit(node)
-
-    def visit_For(self, node):
-        self.current_depth += 1
-        self.max_depth = max(self.max_depth, self.current_depth)
-        
-        # Check range step for log complexity
-        is_log = False
-        if isinstance(node.iter, ast.Call) and isinstance(node.iter.func, ast.Name) and node.iter.func.id == 'range':
-            # range(start, stop, step)
-            if len(node.iter.args) == 3:
-                step = node.iter.args[2]
-                # If step is not a Constant 1 or -1, it might be multiplicative
-                # But python range() step must be integer.
-                # True log complexity usually comes from while loops or recursive calls in Python 
-                # unless using custom iterators.
-                pass 
-                
-        self.complexities.append("log N" if is_log else "N")
-        self.generic_visit(node)
-        self.current_depth -= 1
-
-    def visit_While(self, node):
-        self.current_depth += 1
-        self.max_depth = max(self.max_depth, self.current_depth)
-        
-        # Check for multiplicative/divisive updates to infer Log N
-        # Heuristic: verify if loop condition variable is modified by * or /
-        self.complexities.append("N") # Default, might refine later
-        self.generic_visit(node)
-        self.current_depth -= 1
-
-    def visit_Call(self, node):
-        if isinstance(node.func, ast.Name) and node.func.id in self.defined_functions:
-            self.recursive_calls += 1
-            
-            # Heuristic for Merge Sort / Binary Search type recursion
-            # Checking arguments: if they are Slices, it's likely O(log N) split factor
-            for arg in node.args:
-                if isinstance(arg, ast.Subscript) and isinstance(arg.slice, ast.Slice):
-                    # We have a slice like arr[:mid] -> Divide and Conquer
-                    self.recursion_type = "divide"
-        
-        self.generic_visit(node)
-
-    def get_report(self):
-        # 1. Iterative Analysis
-        time_c = "O(1)"
-        space_c = "O(1)"
-        reason = []
-
-        if self.max_depth > 0:
-            power = self.max_depth
-            time_c = f"O(N^{power})"
-            reason.append(f"{power} nested loops detected.")
-
-        # 2. Recursive Analysis (Overrides iterative if stronger)
-        if self.recursive_calls > 0:
-            if self.recursion_type == "divide":
-                if self.recursive_calls >= 2: 
-                    # Merge Sort pattern: 2 calls + slicing
-                    time_c = "O(N log N)"
-                    reason.append("Recursive divide-and-conquer (2 calls) detected.")
-                else: 
-                     # Binary Search pattern: 1 call + slicing
-                     time_c = "O(log N)"
-                     reason.append("Recursive divide-and-conquer (1 call) detected.")
-            elif self.recursive_calls >= 2:
-                # Fibonacci pattern
-                time_c = "O(2^N)"
-                reason.append("Multiple recursive calls detected (Exponential).")
-            else:
-                # Simple recursion
-                time_c = "O(N)"
-                reason.append("Single recursive call detected (Linear).")
-            
-            # Recursion often implies stack space
-            space_c = "O(N)"
-        
-        return {
-            "time": time_c,
-            "space": space_c,
-            "derivation": " ".join(reason) + " (Local Analysis)"
-        }
+# Local complexity analysis (see complexity.py). Per-function results are cached by a
+# hash of the function's source text, so re-analyzing after an edit only rescans what changed
+complexity_analyzer = ComplexityAnalyzer(cache=TTLCache(
+    max_entries=int(os.getenv("COMPLEXITY_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("COMPLEXITY_CACHE_TTL", str(24 * 3600))),
+))
+
+@app.get("/complexity-metrics")
+async def complexity_metrics():
+    return complexity_analyzer.metrics()
+
+EMPIRICAL_MAX_SIZE = int(os.getenv("EMPIRICAL_MAX_SIZE", "4096"))
+EMPIRICAL_MAX_OPS = int(os.getenv("EMPIRICAL_MAX_OPS", "1000000"))
+
+async def measure_complexity(request, local_report):
+    """Runs the function on growing inputs in a Python worker (see empirical.py) and reports the best fit."""
+    measured = await python_scheduler.run(
+        python_pool.measure, request.code, request.function, request.input_kind,
+        EMPIRICAL_MAX_SIZE, EMPIRICAL_MAX_OPS,
+    )
+    runner_up = measured["fits"][1] if len(measured["fits"]) > 1 else None
+    derivation = (
+        f"Ran `{measured['function']}` on {measured['input'].replace('_', ' ')} inputs of size "
+        f"{measured['points'][0]['n']} to {measured['points'][-1]['n']} and counted executed lines; "
+        f"they grow as {measured['time']} (relative error {measured['fits'][0]['error']:.0%}"
+    )
+    if runner_up:
+        derivation += f", next best {runner_up['model']} at {runner_up['error']:.0%}"
+    derivation += f", confidence {measured['confidence']:.0%}). (Empirical)"
+    return {
+        "time": measured["time"],
+        "space": local_report["space"],
+        "derivation": derivation,
+        "empirical": measured,
+    }
 
 @app.post("/analyze-complexity")
 async def analyze_complexity(request: ComplexityRequest):
@@ -147,10 +142,8 @@ async def analyze_complexity(request: ComplexityRequest):
     # 1. Perform Local Analysis first (Fallback & Hint)
     if request.language.lower() == 'python':
         try:
-            tree = ast.parse(request.code)
-            analyzer = ComplexityAnalyzer()
-            analyzer.visit(tree)
-            local_report = analyzer.get_report()
+            with span("local_analysis"):
+                local_report = complexity_analyzer.analyze(request.code)
         except Exception as e:
             local_report = {"time": "?", "space": "?", "derivation": f"Local analysis error: {e}"}
             
@@ -181,23 +174,24 @@ async def analyze_complexity(request: ComplexityRequest):
                  "derivation": f"Detected {loops} loops with approx nesting {est_depth}."
              }
 
+    # Opt-in: measure instead of guessing
+    if request.empirical:
+        if request.language.lower() != 'python':
+            local_report["derivation"] += " (Empirical mode is only available for Python)"
+        elif python_pool is None:
+            local_report["derivation"] += " (Empirical mode unavailable: no Python workers)"
+        else:
+            try:
+                with span("empirical"):
+                    return await measure_complexity(request, local_report)
+            except SchedulerBusy as e:
+                return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "5"})
+            except PythonTraceError as e:
+                local_report["derivation"] += f" (Empirical measurement failed: {str(e)[:120]})"
+
     # 2. Try Gemini API for High-Quality Explanation
-    api_key = os.getenv("GEMINI_API_KEY")
-    if api_key:
+    if gemini.available:
         try:
-            genai.configure(api_key=api_key)
-            # Dynamically find a supported model to avoid 404s
-            model_name = 'gemini-1.5-flash' # Default fallback
-            try:
-                 for m in genai.list_models():
-                    if 'generateContent' in m.supported_generation_methods:
-                        model_name = m.name
-                        break
-            except:
-                 pass
-            
-            model = genai.GenerativeModel(model_name)
-            
             prompt = f"""
             Analyze the Time and Space complexity of this {request.language} code.
             Return ONLY a JSON object in this format:
@@ -211,15 +205,20 @@ async def analyze_complexity(request: ComplexityRequest):
             {request.code}
             """
             
-            result = model.generate_content(prompt)
+            key = cache_key("complexity", request.code, language=request.language.lower())
+            with span("llm"):
+                result = await gemini.generate_async(prompt, key, timeout=AI_TIMEOUT)
             # Cleanup JSON (sometimes MD blocks are included)
-            text = result.text.replace("```json", "").replace("```", "").strip()
+            text = result.replace("```json", "").replace("```", "").strip()
             ai_report = json.loads(text)
             
             # Combine or Just Return AI report
             if "time" in ai_report:
                 ai_report["derivation"] += " (AI-Verified)"
                 return ai_report
+        except asyncio.TimeoutError:
+            # The call keeps running and caches its answer for the next request
+            local_report["derivation"] += f" (AI took longer than {AI_TIMEOUT:g}s)"
         except Exception as e:
             print(f"Gemini Analysis failed: {e}")
             # Fallthrough to local report
@@ -229,135 +228,387 @@ async def analyze_complexity(request: ComplexityRequest):
 
 class TraceRequest(BaseModel):
     code: str
+    format: str = "json" # "json" or "compact" (see trace_format.py)
+
+def trace_response(trace_data, format):
+    with span("serialize"):
+        if format == "compact":
+            return Response(content=encode_compact(trace_data), media_type=COMPACT_MEDIA_TYPE)
+        return Response(content=json.dumps(trace_data), media_type="application/json")
+
+# Precomputed traces of the curated examples (build_trace_store.py), mapped on first use
+trace_store = TraceStore(os.getenv("TRACE_STORE_PATH", DEFAULT_STORE_PATH))
+
+def stored_trace(kind, code, format, **variant):
+    body = trace_store.get(kind, code, format=format, **variant)
+    if body is None:
+        return None
+    return Response(content=body, media_type=COMPACT_MEDIA_TYPE if format == "compact" else "application/json")
+
+@app.get("/trace-store-metrics")
+async def trace_store_metrics():
+    return trace_store.metrics()
+
+# GDB session pool for /trace-c. Started per worker process, after the server forks.
+GDB_POOL_SIZE = int(os.getenv("GDB_POOL_SIZE", "2"))
+GDB_POOL_MAX_USES = int(os.getenv("GDB_POOL_MAX_USES", "50"))
+gdb_pool = None
+
+@app.on_event("startup")
+def start_gdb_pool():
+    global gdb_pool
+    if GDB_POOL_SIZE <= 0:
+        return
+    pool = GDBSessionPool(size=GDB_POOL_SIZE, max_uses=GDB_POOL_MAX_USES)
+    try:
+        pool.start()
+    except Exception as e:
+        # No GDB on this host (or it failed to start): trace without a pool
+        print(f"Could not start GDB session pool: {e}")
+        pool.close()
+        return
+    gdb_pool = pool
+
+@app.on_event("shutdown")
+def stop_gdb_pool():
+    if gdb_pool is not None:
+        gdb_pool.close()
+
+@app.get("/gdb-pool-metrics")
+async def gdb_pool_metrics():
+    if gdb_pool is None:
+        return {"enabled": False}
+    return {"enabled": True, **gdb_pool.metrics()}
+
+# Compiled /trace-c programs, shared by all workers through the cache directory
+compile_cache = CompileCache(
+    cache_dir=os.getenv("COMPILE_CACHE_DIR") or None,
+    max_bytes=int(os.getenv("COMPILE_CACHE_MAX_MB", "256")) * 1024 * 1024,
+)
+
+# Compiler profile ("default" or "fast") and precompiled standard headers for /trace-c
+toolchain = Toolchain(
+    profile=os.getenv("CTRACE_COMPILE_PROFILE", "fast"),
+    use_pch=os.getenv("CTRACE_PCH", "1") == "1",
+)
+
+# "mi" (pipelined GDB/MI commands) or "python" (step loop inside GDB, see gdb_stepper.py)
+CTRACE_ENGINE = os.getenv("CTRACE_ENGINE", "mi")
+
+@app.on_event("startup")
+def prepare_toolchain():
+    # Checks the compiler version and (re)builds the PCH if it is missing or stale
+    try:
+        toolchain.prepare()
+    except Exception as e:
+        print(f"Could not prepare C++ toolchain: {e}")
+
+@app.get("/compile-cache-metrics")
+async def compile_cache_metrics():
+    return {**compile_cache.metrics(), "toolchain": toolchain.metrics()}
+
+# /trace-c jobs run on a bounded thread pool, off the event loop. Extra requests wait
+# in a queue; when it is full (or a request waited too long) they get a 429.
+trace_scheduler = TraceScheduler(
+    max_workers=int(os.getenv("CTRACE_CONCURRENCY", str(max(GDB_POOL_SIZE, 1)))),
+    max_queue=int(os.getenv("CTRACE_MAX_QUEUE", "16")),
+    queue_timeout=float(os.getenv("CTRACE_QUEUE_TIMEOUT", "10")),
+)
+# Wall-clock, CPU and memory limits per trace
+trace_limits = JobLimits.from_env()
+
+@app.on_event("shutdown")
+def stop_trace_scheduler():
+    trace_scheduler.shutdown()
+
+@app.get("/trace-c-metrics")
+async def trace_c_metrics():
+    return {
+        **trace_scheduler.metrics(),
+        "limits": {
+            "time_limit": trace_limits.time_limit,
+            "cpu_seconds": trace_limits.cpu_seconds,
+            "memory_bytes": trace_limits.memory_bytes,
+        },
+    }
 
 @app.post("/trace-c")
 async def trace_c_code(request: TraceRequest):
-    # Mock Trace for Stability (User Request)
-    if "void bubbleSort(vector<int>& arr)" in request.code and "64, 34, 25" in request.code:
-        return generate_mock_cpp_trace()
-
-    tracer = CTracer()
-    trace_data = tracer.run(request.code)
-    return trace_data
-
-def generate_mock_cpp_trace():
-    trace = []
-    data = [64, 34, 25, 12, 22, 11, 90]
-    n = len(data)
-    
-    # 1. Main Start
-    trace.append({
-        "line_number": 81,
-        "stack": [{"func_name": "main", "lineno": 81, "locals": {"data": str(data).replace('[', '{').replace(']', '}')}}],
-        "heap": {}
-    })
-    
-    # 2. Call Bubble Sort
-    trace.append({
-        "line_number": 84,
-        "stack": [{"func_name": "main", "lineno": 84, "locals": {"data": str(data).replace('[', '{').replace(']', '}')}}],
-        "heap": {}
-    })
-    
-    # 3. Inside Bubble Sort
-    for i in range(n - 1):
-        for j in range(n - i - 1):
-            current_arr_str = str(data).replace('[', '{').replace(']', '}')
-            trace.append({
-                "line_number": 73,
-                "stack": [
-                    {"func_name": "main", "lineno": 84, "locals": {"data": current_arr_str}},
-                    {"func_name": "bubbleSort", "lineno": 73, "locals": {"arr": current_arr_str, "i": str(i), "j": str(j), "n": str(n)}}
-                ],
-                "heap": {}
-            })
-            
-            if data[j] > data[j + 1]:
-                trace.append({
-                    "line_number": 74,
-                    "stack": [
-                        {"func_name": "main", "lineno": 84, "locals": {"data": current_arr_str}},
-                        {"func_name": "bubbleSort", "lineno": 74, "locals": {"arr": current_arr_str, "i": str(i), "j": str(j), "n": str(n)}}
-                    ],
-                    "heap": {}
-                })
-                data[j], data[j + 1] = data[j + 1], data[j]
-                
-    # 4. End Main
-    trace.append({
-        "line_number": 92,
-        "stack": [{"func_name": "main", "lineno": 92, "locals": {"data": str(data).replace('[', '{').replace(']', '}')}}],
-        "heap": {}
-    })
-    
-    return trace
+    stored = stored_trace("trace-c", request.code, "compact" if request.format == "compact" else "json")
+    if stored is not None:
+        return stored
+
+    tracer = CTracer(pool=gdb_pool, compile_cache=compile_cache, toolchain=toolchain, engine=CTRACE_ENGINE, limits=trace_limits)
+    try:
+        trace_data = await trace_scheduler.run(tracer.run, request.code)
+    except SchedulerBusy as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "5"})
+    return trace_response(trace_data, request.format)
+
+# Server-side Python tracing: tracer.py (the same file Pyodide runs) in pre-forked,
+# resource-limited worker processes. The frontend uses it while Pyodide is loading.
+PYTRACE_POOL_SIZE = int(os.getenv("PYTRACE_POOL_SIZE", "2"))
+python_pool = None
+# Same admission limits as /trace-c
+python_scheduler = TraceScheduler(
+    max_workers=max(PYTRACE_POOL_SIZE, 1),
+    max_queue=trace_scheduler.max_queue,
+    queue_timeout=trace_scheduler.queue_timeout,
+)
+
+@app.on_event("startup")
+def start_python_pool():
+    global python_pool
+    if PYTRACE_POOL_SIZE <= 0:
+        return
+    try:
+        pool = PythonTracePool(
+            size=PYTRACE_POOL_SIZE,
+            max_uses=int(os.getenv("PYTRACE_MAX_USES", "100")),
+            time_limit=float(os.getenv("PYTRACE_TIME_LIMIT", "10")),
+            memory_bytes=int(os.getenv("PYTRACE_MEMORY_LIMIT_MB", "512")) * 1024 * 1024,
+            uid=int(os.getenv("PYTRACE_UID", "65534")),
+        )
+        pool.start()
+    except Exception as e:
+        print(f"Could not start Python trace pool: {e}")
+        return
+    python_pool = pool
 
+@app.on_event("shutdown")
+def stop_python_pool():
+    python_scheduler.shutdown()
+    if python_pool is not None:
+        python_pool.close()
+
+@app.get("/trace-python-metrics")
+async def trace_python_metrics():
+    if python_pool is None:
+        return {"enabled": False}
+    return {"enabled": True, **python_pool.metrics(), "scheduler": python_scheduler.metrics()}
+
+class PythonTraceRequest(BaseModel):
+    code: str
+    mode: str = "delta" # "full" or "delta", as in tracer.run_user_code
+    format: str = "json" # "json" or "compact"
+
+@app.post("/trace-python")
+async def trace_python_code(request: PythonTraceRequest):
+    output = "compact" if request.format == "compact" else "json"
+    stored = stored_trace("trace-python", request.code, output, mode=request.mode)
+    if stored is not None:
+        return stored
+    if python_pool is None:
+        return JSONResponse(status_code=503, content={"detail": "Server-side Python tracing is not available"})
+
+    try:
+        # tracer.py returns the trace already encoded, so it is passed through as is
+        with span("python_worker"):
+            trace = await python_scheduler.run(python_pool.run, request.code, request.mode, output)
+    except SchedulerBusy as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "5"})
+    except PythonTraceTimeout:
+        steps = [{"event": "truncated", "reason": "time_limit", "limit": f"{python_pool.time_limit:g}s", "line_number": None}]
+        return trace_response(steps, request.format)
+    except PythonTraceError as e:
+        return trace_response([{"event": "error", "error_type": "TracerError", "error_message": str(e)}], request.format)
+
+    media_type = COMPACT_MEDIA_TYPE if output == "compact" else "application/json"
+    return Response(content=trace, media_type=media_type)
+
+# Traces show the first elements of each container and collapse deep nesting (tracer.py's
+# max_items / max_depth); the frontend asks for the rest of an object here, re-running the
+# program up to that step, at most PYTRACE_EXPAND_MAX_ITEMS elements per request
+PYTRACE_EXPAND_MAX_ITEMS = int(os.getenv("PYTRACE_EXPAND_MAX_ITEMS", "1000"))
+
+class ExpandObjectRequest(BaseModel):
+    code: str
+    step: int # Index of the step in the trace
+    ref: int # Heap id of the object
+    offset: int = 0
+    limit: int | None = None # At most PYTRACE_EXPAND_MAX_ITEMS
+
+@app.post("/expand-python-object")
+async def expand_python_object(request: ExpandObjectRequest):
+    if python_pool is None:
+        return JSONResponse(status_code=503, content={"detail": "Server-side Python tracing is not available"})
+    limit = min(request.limit or PYTRACE_EXPAND_MAX_ITEMS, PYTRACE_EXPAND_MAX_ITEMS)
+    try:
+        with span("python_worker"):
+            expanded = await python_scheduler.run(
+                python_pool.expand, request.code, request.step, request.ref, request.offset, limit,
+            )
+    except SchedulerBusy as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "5"})
+    except PythonTraceTimeout as e:
+        return JSONResponse(status_code=504, content={"detail": str(e)})
+    except PythonTraceError as e: # Includes the tracer's ValueError for a step or object that isn't there
+        return JSONResponse(status_code=404, content={"detail": str(e)})
+    return Response(content=expanded, media_type="application/json")
+
+# Replay mode, for programs too long to send every step: /record-python runs the program
+# once and returns a small recording (tracer.record_replay); /replay-python sends it back
+# with a window of steps to rebuild, at most PYTRACE_REPLAY_MAX_STEPS at a time
+PYTRACE_REPLAY_MAX_STEPS = int(os.getenv("PYTRACE_REPLAY_MAX_STEPS", "1000"))
+
+class PythonRecordRequest(BaseModel):
+    code: str
+
+class PythonReplayRequest(BaseModel):
+    code: str
+    recording: dict # As returned by /record-python
+    start: int = 0
+    count: int = 200 # At most PYTRACE_REPLAY_MAX_STEPS
+    mode: str = "delta"
+    format: str = "json" # "json" or "compact"
+
+@app.post("/record-python")
+async def record_python(request: PythonRecordRequest):
+    if python_pool is None:
+        return JSONResponse(status_code=503, content={"detail": "Server-side Python tracing is not available"})
+    try:
+        with span("python_worker"):
+            recording = await python_scheduler.run(python_pool.record, request.code)
+    except SchedulerBusy as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "5"})
+    except PythonTraceTimeout as e:
+        return JSONResponse(status_code=504, content={"detail": str(e)})
+    except PythonTraceError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    return Response(content=recording, media_type="application/json")
+
+@app.post("/replay-python")
+async def replay_python(request: PythonReplayRequest):
+    if python_pool is None:
+        return JSONResponse(status_code=503, content={"detail": "Server-side Python tracing is not available"})
+    output = "compact" if request.format == "compact" else "json"
+    count = max(1, min(request.count, PYTRACE_REPLAY_MAX_STEPS))
+    try:
+        with span("python_worker"):
+            steps = await python_scheduler.run(
+                python_pool.replay, request.code, request.recording, request.start, count, request.mode, output,
+            )
+    except SchedulerBusy as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "5"})
+    except PythonTraceTimeout as e:
+        return JSONResponse(status_code=504, content={"detail": str(e)})
+    except PythonTraceError as e: # Out of range, or the program didn't run as recorded
+        return JSONResponse(status_code=409, content={"detail": str(e)})
+    media_type = COMPACT_MEDIA_TYPE if output == "compact" else "application/json"
+    return Response(content=steps, media_type=media_type)
 
 @app.post("/get-error-explanation")
 async def get_error_explanation(request: ErrorRequest):
     try:
-        # Dynamically find a supported model to avoid 404s
-        model_name = 'gemini-1.5-flash' # Default fallback
-        try:
-             for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    model_name = m.name
-                    break
-        except:
-             pass
-        
-        print(f"Using Gemini Model: {model_name}")
-        model = genai.GenerativeModel(model_name)
         prompt = f"""
         You are an expert Python programming tutor. 
         Explain this error in simple terms:
         Code: {request.code}
         Error: {request.error_details.get('error_message')} on line {request.error_details.get('line_number')}
         """
-        response = model.generate_content(prompt)
-        return {"explanation": response.text}
+        key = cache_key(
+            "error", request.code,
+            error_type=request.error_details.get('error_type'),
+            error_message=request.error_details.get('error_message'),
+            line_number=request.error_details.get('line_number'),
+        )
+        return {"explanation": await gemini.generate_async(prompt, key, timeout=AI_TIMEOUT)}
+    except asyncio.TimeoutError:
+        return {"explanation": "The AI assistant is taking too long to answer. Try again in a moment."}
     except Exception as e:
         print(f"AI Generation Error: {e}")
         return {"explanation": f"AI Error: {str(e)}"}
 
 
-# --- AST Visualization Logic (No changes) ---
-class ASTVisualizer(ast.NodeVisitor):
-    def __init__(self):
-        self.dot = graphviz.Digraph(comment="Abstract Syntax Tree")
-        self.dot.attr('node', shape='box', style='rounded,filled', fillcolor='lightblue')
-        self.dot.attr('edge', color='gray40')
-        self.node_counter = 0
-
-    def _get_node_label(self, node: ast.AST) -> str:
-        label = type(node).__name__
-        if isinstance(node, ast.FunctionDef): label += f"\\n(name='{node.name}')"
-        elif isinstance(node, ast.Name): label += f"\\n(id='{node.id}')"
-        elif isinstance(node, ast.Constant): label += f"\\n(value={ast.unparse(node)})"
-        elif isinstance(node, ast.BinOp): op_type = type(node.op).__name__; label += f"\\n(op='{op_type}')"
-        return label
-
-    def visit(self, node: ast.AST) -> str:
-        current_id = str(self.node_counter)
-        self.node_counter += 1
-        self.dot.node(current_id, label=self._get_node_label(node))
-        for child in ast.iter_child_nodes(node):
-            child_id = self.visit(child)
-            self.dot.edge(current_id, child_id)
-        return current_id
-
+# --- AST Visualization Logic (see ast_graph.py) ---
 class CodeRequest(BaseModel):
     code: str
+    format: str = "svg" # "svg" (rendered by graphviz) or "json" (nodes + edges)
+    root: str | None = None # Path of a collapsed node to expand, e.g. "0.3"
+    max_nodes: int | None = None # At most AST_MAX_NODES
+    max_depth: int | None = None # Collapse subtrees this many levels below the root
+
+# Largest graph rendered per request; keeps graphviz layout time bounded
+AST_MAX_NODES = int(os.getenv("AST_MAX_NODES", "400"))
+
+# Rendered ASTs by source hash, so repeated code skips parsing and the `dot` subprocess
+ast_cache = TTLCache(
+    max_entries=int(os.getenv("AST_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("AST_CACHE_TTL", str(24 * 3600))),
+    max_bytes=int(os.getenv("AST_CACHE_MAX_MB", "32")) * 1024 * 1024,
+)
+
+@app.get("/ast-cache-metrics")
+async def ast_cache_metrics():
+    return ast_cache.metrics()
 
 @app.post("/get-ast-visualization")
 async def get_ast_visualization(request: CodeRequest):
+    output = "json" if request.format == "json" else "svg"
+    max_nodes = min(request.max_nodes or AST_MAX_NODES, AST_MAX_NODES)
+    key = cache_key(f"ast-{output}", request.code, root=request.root, max_nodes=max_nodes, max_depth=request.max_depth)
+    cached = ast_cache.get(key)
+    if cached is not None:
+        return cached
     try:
-        tree = ast.parse(request.code)
-        visualizer = ASTVisualizer()
-        visualizer.visit(tree)
-        svg_data = visualizer.dot.pipe(format='svg')
-        return {"svg_data": svg_data.decode('utf-8')}
+        with span("parse"):
+            tree = ast.parse(request.code)
+        with span("ast_build"):
+            visualizer = ASTVisualizer(max_nodes=max_nodes, max_depth=request.max_depth).build(tree, request.root)
+        if output == "json":
+            result = {**visualizer.to_json(), "root": request.root or ""}
+            size = sum(len(node["label"]) + 32 for node in visualizer.nodes) + 16 * len(visualizer.edges)
+        else:
+            # dot is a subprocess; keep the event loop free while it runs
+            metrics.count("subprocesses_started_total", kind="graphviz")
+            with span("graphviz_render"):
+                svg_data = await asyncio.to_thread(visualizer.to_dot().pipe, format='svg')
+            result = {"svg_data": svg_data.decode('utf-8')}
+            size = len(svg_data)
+        ast_cache.put(key, result, size)
+        return result
     except SyntaxError as e:
         return {"error": f"Invalid Python Code: {e}"}
+    except (RecursionError, MemoryError):
+        # ast.parse itself recurses; absurdly nested expressions can still exhaust it
+        return {"error": "The code is nested too deeply to build its AST."}
+    except ValueError as e: # Bad root path
+        return {"error": str(e)}
     except Exception as e:
-        return {"error": f"An unexpected error occurred: {e}"}
\ No newline at end of file
+        return {"error": f"An unexpected error occurred: {e}"}
+
+# The pools, schedulers and caches keep their own stats; /metrics reads them on each scrape
+@metrics.collector
+def collect_component_metrics():
+    caches = {
+        "ai": ai_cache.metrics(),
+        "ast": ast_cache.metrics(),
+        "complexity": complexity_analyzer.cache.metrics(),
+        "compile": compile_cache.metrics(),
+        "trace_store": trace_store.metrics(),
+    }
+    for name, stats in caches.items():
+        yield "cache_hits_total", "counter", {"cache": name}, stats.get("hits")
+        yield "cache_misses_total", "counter", {"cache": name}, stats.get("misses")
+        yield "cache_entries", "gauge", {"cache": name}, stats.get("entries")
+
+    for name, scheduler in (("c", trace_scheduler), ("python", python_scheduler)):
+        stats = scheduler.metrics()
+        yield "scheduler_running", "gauge", {"scheduler": name}, stats["running"]
+        yield "scheduler_queued", "gauge", {"scheduler": name}, stats["queued"]
+        yield "scheduler_max_workers", "gauge", {"scheduler": name}, stats["max_workers"]
+        yield "scheduler_rejected_total", "counter", {"scheduler": name}, stats["rejected"] + stats["queue_timeouts"]
+        yield "scheduler_queue_wait_seconds_total", "counter", {"scheduler": name}, stats["queue_wait_seconds"]
+
+    for name, pool in (("gdb", gdb_pool), ("python", python_pool)):
+        if pool is None:
+            continue
+        stats = pool.metrics()
+        yield "pool_size", "gauge", {"pool": name}, stats["total"]
+        yield "pool_idle", "gauge", {"pool": name}, stats["idle"]
+        yield "pool_recycled_total", "counter", {"pool": name}, stats.get("sessions_recycled", stats.get("workers_recycled"))
+        yield "pool_timeouts_total", "counter", {"pool": name}, stats.get("timeouts")
+
+    stats = gemini.metrics()
+    for name in ("generations", "coalesced", "timeouts"):
+        yield f"ai_{name}_total", "counter", {}, stats[name]
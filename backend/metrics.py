@@ -0,0 +1,152 @@
+"""
+Prometheus-style metrics and per-request timing spans, served by /metrics.
+
+    with span("compile"):
+        ...
+
+records the block's duration in the traceview_span_seconds{span="compile"}
+histogram and, when the request asked for a profile (see start_profile), in that
+request's breakdown, which main.py returns as a Server-Timing header. Spans work
+from scheduler worker threads too, since TraceScheduler runs jobs in a copy of the
+request's context.
+
+Counters and histograms are kept here; the pools and caches keep their own stats
+and are exported through collectors registered in main.py.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "traceview_"
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_profile = contextvars.ContextVar("profile", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {} # (name, sorted label items) -> value
+        self._histograms = {} # (name, sorted label items) -> Histogram
+        self._collectors = []
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def collector(self, fn):
+        """
+        Registers fn() -> iterable of (name, "counter" | "gauge", labels dict, value),
+        called on every scrape. Usable as a decorator.
+        """
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        samples = {} # name -> (type, [lines])
+
+        def add(name, kind, line):
+            samples.setdefault(PREFIX + name, (kind, []))[1].append(line)
+
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                add(name, "counter", f"{PREFIX}{name}{_labels(dict(labels))} {value}")
+            for (name, labels), histogram in self._histograms.items():
+                labels = dict(labels)
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    add(name, "histogram", f"{PREFIX}{name}_bucket{_labels({**labels, 'le': f'{bound:g}'})} {count}")
+                add(name, "histogram", f"{PREFIX}{name}_bucket{_labels({**labels, 'le': '+Inf'})} {histogram.count}")
+                add(name, "histogram", f"{PREFIX}{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+                add(name, "histogram", f"{PREFIX}{name}_count{_labels(labels)} {histogram.count}")
+            collectors = list(self._collectors)
+
+        for fn in collectors:
+            try:
+                for name, kind, labels, value in fn():
+                    if value is not None:
+                        add(name, kind, f"{PREFIX}{name}{_labels(labels)} {float(value):g}")
+            except Exception as e: # One broken collector shouldn't take down the scrape
+                print(f"Metrics collector {getattr(fn, '__name__', fn)} failed: {e}")
+
+        out = []
+        for name, (kind, lines) in samples.items():
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+count = REGISTRY.count
+observe = REGISTRY.observe
+collector = REGISTRY.collector
+render = REGISTRY.render
+
+
+def record_span(name, seconds):
+    observe("span_seconds", seconds, span=name)
+    profile = _profile.get()
+    if profile is not None:
+        profile.append((name, seconds))
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def start_profile():
+    """Starts collecting this request's spans; returns the list they are appended to."""
+    profile = []
+    _profile.set(profile)
+    return profile
+
+
+def server_timing(profile, total=None):
+    """A Server-Timing header value: one entry per span name, repeated spans summed."""
+    totals = {}
+    for name, seconds in profile:
+        spent, times = totals.get(name, (0.0, 0))
+        totals[name] = (spent + seconds, times + 1)
+    entries = [
+        f'{name};dur={spent * 1000:.2f}' + (f';desc="x{times}"' if times > 1 else "")
+        for name, (spent, times) in totals.items()
+    ]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
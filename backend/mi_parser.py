@@ -0,0 +1,305 @@
+"""
+Streaming parser for GDB/MI output.
+
+GDB writes one record per line (c-strings escape their newlines), so MIParser
+buffers partial lines from bulk reads and parses each complete line into an
+MIRecord:
+
+    123^done,value="42"             -> result record, token 123
+    *stopped,reason="...",frame={}  -> exec async record
+    =thread-created,id="1"          -> notify async record
+    ~"console text\\n"              -> console stream record
+    (gdb)                           -> prompt
+
+Values are str (MI constants are always c-strings), dict (tuples) or ResultList.
+A ResultList is a plain list of the values; for lists of results like
+`stack=[frame={...},frame={...}]` it also remembers the names in `.names` so
+mi_dumps can write it back.
+
+Lines that aren't MI at all (the traced program shares GDB's stdout) come back as
+records of kind "output".
+"""
+
+import codecs
+import re
+
+CLASS_RE = re.compile(r"[a-z][a-z-]*")
+RECORD_KINDS = {
+    "^": "result",
+    "*": "exec",
+    "+": "status",
+    "=": "notify",
+    "~": "console",
+    "@": "target",
+    "&": "log",
+}
+RECORD_PREFIXES = {kind: prefix for prefix, kind in RECORD_KINDS.items()}
+STREAM_KINDS = ("console", "target", "log")
+
+C_STRING_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+ESC_RE = re.compile(r"\\.")
+UNESCAPES = {"\n": "\\n", "\t": "\\t", "\r": "\\r", "\\": "\\\\", '"': '\\"'}
+
+
+class MIParseError(ValueError):
+    pass
+
+
+class RepeatedResult(list):
+    """All values of a name that appeared more than once in the same tuple."""
+
+
+class ResultList(list):
+    """An MI list. For a list of results (name=value pairs) `names` holds the names."""
+    def __init__(self, values=(), names=()):
+        super().__init__(values)
+        self.names = list(names)
+
+
+class MIRecord:
+    __slots__ = ("kind", "token", "cls", "results", "text")
+
+    def __init__(self, kind, token=None, cls=None, results=None, text=None):
+        self.kind = kind        # "result", "exec", "status", "notify", stream kinds, "prompt" or "output"
+        self.token = token      # int or None
+        self.cls = cls          # "done", "running", "stopped", ... for result and async records
+        self.results = results if results is not None else {}
+        self.text = text        # Payload of stream and "output" records
+
+    def __eq__(self, other):
+        return isinstance(other, MIRecord) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        if self.text is not None:
+            return f"MIRecord({self.kind}, {self.text!r})"
+        token = "" if self.token is None else f"{self.token}"
+        return f"MIRecord({self.kind}, {token}{self.cls}, {self.results!r})"
+
+
+def unescape(body):
+    """Decodes the body of a c-string (without its quotes) that has escapes in it."""
+    if "\\e" in body: # GDB's escape for ESC, which escape_decode doesn't know
+        body = ESC_RE.sub(lambda m: "\\033" if m.group() == "\\e" else m.group(), body)
+    # GDB escapes non-ASCII bytes as octal, so decode to bytes first, then UTF-8
+    return codecs.escape_decode(body.encode("utf-8"))[0].decode("utf-8", errors="replace")
+
+
+def parse_c_string(line, pos):
+    """Parses the c-string starting at line[pos] (a quote). Returns (text, end)."""
+    end = line.find('"', pos + 1)
+    if end != -1 and line.find("\\", pos + 1, end) == -1:
+        return line[pos + 1:end], end + 1 # Fast path, nothing escaped
+
+    match = C_STRING_RE.match(line, pos)
+    if match is None:
+        raise MIParseError(f"Unterminated c-string at column {pos}")
+    return unescape(match.group()[1:-1]), match.end()
+
+
+# Everything between two c-strings: name= or a bracket. Commas are only
+# separators; findall skips them.
+SEGMENT_RE = re.compile(r"([\w.-]+)=|([{}\[\]])")
+# The same few segments (",value=", "},{name=") make up most of GDB's output,
+# so each one is only tokenized once
+SEGMENTS = {}
+MAX_SEGMENTS = 4096
+# Stand-ins for \\ and \" while the results are split at the quotes
+BACKSLASH, QUOTE = "\x02", "\x03"
+
+
+def segment_tokens(segment):
+    """
+    Names and brackets in the text before a c-string, as a tuple of str ending in
+    None for the c-string itself.
+    """
+    tokens = tuple(name or bracket for name, bracket in SEGMENT_RE.findall(segment)) + (None,)
+    if len(SEGMENTS) >= MAX_SEGMENTS:
+        SEGMENTS.clear()
+    SEGMENTS[segment] = tokens
+    return tokens
+
+
+def parse_results(line, pos=0):
+    """Parses the name=value pairs in line[pos:] into a dict."""
+    text = line[pos:]
+    # Split at the quotes, so the odd parts are c-string bodies. Escaped quotes
+    # (and backslashes, which could escape a closing quote) are swapped out first;
+    # GDB escapes control characters, so the stand-ins can't be in its output.
+    escaped = '\\"' in text
+    if escaped:
+        if BACKSLASH in text or QUOTE in text:
+            raise MIParseError("Unescaped control character")
+        text = text.replace("\\\\", BACKSLASH).replace('\\"', QUOTE)
+    parts = text.split('"')
+    last = len(parts) - 1
+    if last % 2:
+        raise MIParseError("Unterminated c-string")
+
+    results = container = {}
+    in_tuple = True
+    name = last_name = None # A tuple can repeat a value without its name (bkpt={..},{..})
+    stack = []
+    for index in range(0, last + 1, 2):
+        segment = parts[index]
+        tokens = SEGMENTS.get(segment) or segment_tokens(segment)
+        if index == last:
+            tokens = tokens[:-1] # No c-string after the last segment
+        for token in tokens:
+            if token is None:
+                value = parts[index + 1]
+                if escaped and (BACKSLASH in value or QUOTE in value):
+                    value = unescape(value.replace(QUOTE, '\\"').replace(BACKSLASH, "\\\\"))
+                elif "\\" in value:
+                    value = unescape(value)
+            elif token == "{":
+                value = {}
+            elif token == "[":
+                value = ResultList()
+            elif token == "}" or token == "]":
+                if not stack or (token == "}") != in_tuple:
+                    raise MIParseError(f"Unbalanced {token!r}")
+                container, in_tuple, last_name = stack.pop()
+                name = None
+                continue
+            else:
+                name = token
+                continue
+
+            if in_tuple:
+                if name is None:
+                    if last_name is None:
+                        raise MIParseError("Value without a name")
+                    name = last_name
+                if name in container:
+                    add_result(container, name, value)
+                else:
+                    container[name] = value
+                last_name = name
+            else:
+                container.append(value)
+                if name is not None:
+                    container.names.append(name)
+            name = None
+
+            if token is not None:
+                stack.append((container, in_tuple, last_name))
+                container = value
+                in_tuple = token == "{"
+                last_name = None
+    if stack:
+        raise MIParseError("Missing closing bracket")
+    return results
+
+
+def add_result(results, name, value):
+    if name not in results:
+        results[name] = value
+    elif isinstance(results[name], RepeatedResult):
+        results[name].append(value)
+    else:
+        # Duplicate names turn into a list of all their values
+        results[name] = RepeatedResult([results[name], value])
+
+
+def parse_line(line):
+    """Parses one line of MI output (without the newline) into an MIRecord."""
+    if line.rstrip() == "(gdb)":
+        return MIRecord("prompt")
+
+    pos = 0
+    length = len(line)
+    while pos < length and line[pos].isdigit():
+        pos += 1
+    prefix = line[pos] if pos < length else ""
+    kind = RECORD_KINDS.get(prefix)
+    if kind is None:
+        return MIRecord("output", text=line)
+    token = int(line[:pos]) if pos else None
+
+    try:
+        if kind in STREAM_KINDS:
+            if token is not None or not line.startswith('"', 1):
+                return MIRecord("output", text=line)
+            text, end = parse_c_string(line, 1)
+            return MIRecord(kind, text=text)
+
+        comma = line.find(",", pos + 1)
+        cls = line[pos + 1:comma] if comma != -1 else line[pos + 1:].rstrip()
+        if not CLASS_RE.fullmatch(cls):
+            return MIRecord("output", text=line)
+        if comma == -1:
+            return MIRecord(kind, token, cls)
+        results = parse_results(line, comma + 1)
+        return MIRecord(kind, token, cls, results)
+    except MIParseError:
+        # Without a token it may just be program output that looks like MI
+        if token is None:
+            return MIRecord("output", text=line)
+        raise
+
+
+class MIParser:
+    """
+    Incremental parser: feed() it whatever a read returned, complete lines come back
+    as records and a trailing partial line waits for the next feed().
+    """
+    def __init__(self):
+        self._pending = [] # Reads since the last newline
+
+    def feed(self, data):
+        self._pending.append(data)
+        if "\n" not in data: # Only scan what's new, a long line can take many reads
+            return []
+        *lines, rest = "".join(self._pending).split("\n")
+        self._pending = [rest] if rest else []
+        return [parse_line(line.rstrip("\r")) for line in lines if line.strip()]
+
+
+def dump_c_string(text):
+    out = ['"']
+    for char in text:
+        escaped = UNESCAPES.get(char)
+        if escaped is not None:
+            out.append(escaped)
+        elif char < " " or char == "\x7f":
+            out.append(f"\\{ord(char):03o}")
+        else:
+            out.append(char)
+    out.append('"')
+    return "".join(out)
+
+
+def dump_value(value):
+    if isinstance(value, str):
+        return dump_c_string(value)
+    if isinstance(value, dict):
+        return "{" + dump_results(value) + "}"
+    if isinstance(value, ResultList) and value.names:
+        return "[" + ",".join(f"{name}={dump_value(item)}" for name, item in zip(value.names, value)) + "]"
+    return "[" + ",".join(dump_value(item) for item in value) + "]"
+
+
+def dump_results(results):
+    parts = []
+    for name, value in results.items():
+        if isinstance(value, RepeatedResult):
+            parts.extend(f"{name}={dump_value(item)}" for item in value)
+        else:
+            parts.append(f"{name}={dump_value(value)}")
+    return ",".join(parts)
+
+
+def mi_dumps(record):
+    """Writes a record back out as a line of MI, the inverse of parse_line."""
+    if record.kind == "prompt":
+        return "(gdb)"
+    if record.kind == "output":
+        return record.text
+    prefix = RECORD_PREFIXES[record.kind]
+    if record.kind in STREAM_KINDS:
+        return prefix + dump_c_string(record.text)
+    token = "" if record.token is None else str(record.token)
+    line = f"{token}{prefix}{record.cls}"
+    if record.results:
+        line += "," + dump_results(record.results)
+    return line
@@ -0,0 +1,388 @@
+import importlib.util
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import empirical
+from metrics import count
+
+try:
+    import resource
+except ImportError: # Windows: only the wall-clock timeout applies
+    resource = None
+
+DEFAULT_TRACER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend", "public", "tracer.py")
+
+
+def find_tracer():
+    """tracer.py from TRACER_PATH, next to this file, or in the frontend's public folder."""
+    candidates = [
+        os.getenv("TRACER_PATH"),
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "tracer.py"),
+        DEFAULT_TRACER_PATH,
+    ]
+    for path in candidates:
+        if path and os.path.isfile(path):
+            return os.path.abspath(path)
+    return None
+
+
+def import_tracer(path):
+    """Imports the tracer.py at `path` as a module named "tracer"."""
+    spec = importlib.util.spec_from_file_location("tracer", path)
+    tracer = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tracer)
+    return tracer
+
+
+# Job kind -> the tracer.py function that runs it ("measure" runs empirical.measure)
+TRACER_JOBS = {"trace": "run_user_code", "expand": "expand_object", "record": "record_replay", "replay": "replay_steps"}
+JOB_STATS = {"trace": "traces", "expand": "expansions", "record": "recordings", "replay": "replays", "measure": "measurements"}
+
+
+# The only environment variables the user's code sees; the server's own (API keys
+# included) are dropped before tracer.py loads
+WORKER_ENV = ("PATH", "LANG", "LC_ALL", "LC_CTYPE", "TZ", "PYTHONHASHSEED")
+# Imported while the worker can still open files, so the user's code can import them
+PRELOAD_MODULES = (
+    "abc", "array", "bisect", "collections", "copy", "dataclasses", "datetime", "decimal",
+    "enum", "fractions", "functools", "heapq", "itertools", "json", "math", "numbers",
+    "operator", "pprint", "random", "re", "statistics", "string", "textwrap", "threading",
+    "typing",
+)
+
+
+class PythonTraceError(Exception):
+    pass
+
+
+class PythonTraceTimeout(PythonTraceError):
+    """The worker didn't answer in time and was killed."""
+
+
+def _worker_main(conn, tracer_path, memory_bytes, uid=None):
+    """
+    A template process: loads tracer.py and PRELOAD_MODULES once, then forks a fresh
+    child for every job (see _run_job), so nothing one user's code changes (builtins,
+    the tracer module, imported modules) is seen by the next. Only the template talks
+    to the pool, in bytes: b"ready", b"P<pid>" when a job's child starts, then the
+    child's encoded result (see _encode_result).
+    """
+    for name in set(os.environ) - set(WORKER_ENV):
+        del os.environ[name]
+    os.environ["HOME"] = "/tmp"
+
+    # Limits are set before any user code runs, and the hard limits can't be raised again
+    if resource is not None:
+        if memory_bytes:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0)) # No writing files
+
+    tracer = import_tracer(tracer_path)
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    conn.send_bytes(b"ready")
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        result_r, result_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(result_r)
+            conn.close() # The user's code can't talk to the pool
+            _run_job(tracer, job, result_w, uid)
+        os.close(result_w)
+        conn.send_bytes(b"P%d" % pid)
+        with os.fdopen(result_r, "rb") as f:
+            result = f.read()
+        os.waitpid(pid, 0)
+        # Forwarded as is: the child runs the user's code, so the template never decodes it
+        conn.send_bytes(result)
+
+
+def _run_job(tracer, job, result_w, uid):
+    """Runs one job in a child of the template, sandboxed first, and never returns."""
+    try:
+        if resource is not None:
+            # No new file descriptors: no opening files or sockets. The result pipe
+            # is already open and keeps working.
+            resource.setrlimit(resource.RLIMIT_NOFILE, (0, 0))
+            if hasattr(resource, "RLIMIT_NPROC"):
+                resource.setrlimit(resource.RLIMIT_NPROC, (0, 0)) # No forking (ignored for root)
+        if uid is not None and hasattr(os, "getuid") and os.getuid() == 0:
+            # As root the user's code could raise the hard limits again and signal the
+            # server's other processes
+            os.setgroups([])
+            os.setgid(uid)
+            os.setuid(uid)
+
+        job_pid = os.getpid()
+        kind, code, options = job
+        try:
+            if kind == "measure":
+                result = (True, empirical.measure(code, **options))
+            else:
+                result = (True, getattr(tracer, TRACER_JOBS[kind])(code, **options))
+        except BaseException as e: # sys.exit() and friends from the user's code
+            result = (False, f"{type(e).__name__}: {e}")
+        if os.getpid() == job_pid: # Not a child the user's code forked
+            data = _encode_result(*result)
+            while data:
+                data = data[os.write(result_w, data):]
+    finally:
+        os._exit(0)
+
+
+def _encode_result(ok, result):
+    # JSON rather than pickle: the pool must never unpickle what the user's code wrote
+    if ok and isinstance(result, bytes): # output="compact"
+        return b"B" + result
+    return b"J" + json.dumps([ok, result]).encode("utf-8")
+
+
+def _decode_result(data):
+    if data[:1] == b"B":
+        return True, data[1:]
+    if data[:1] == b"J":
+        try:
+            ok, result = json.loads(data[1:])
+            return ok, result
+        except ValueError:
+            pass
+    # Killed by a limit, or the user's code exited the process before answering
+    raise PythonTraceError("The Python process exited unexpectedly")
+
+
+class PythonWorker:
+    """
+    A pre-forked template process with tracer.py loaded. It runs one job at a time,
+    each in its own fork: a trace, a heap object expansion, a replay recording or a
+    replayed window of steps (see TRACER_JOBS), or an empirical complexity
+    measurement (empirical.py).
+    """
+    def __init__(self, context, tracer_path, memory_bytes, uid=None, start_timeout=10):
+        self.uses = 0
+        self.job_pid = None
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, tracer_path, memory_bytes, uid), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        if not self.conn.poll(start_timeout) or self.conn.recv_bytes() != b"ready":
+            self.kill()
+            raise PythonTraceError("Python trace worker did not start")
+
+    def run(self, code, options, timeout, kind="trace"):
+        self.uses += 1
+        deadline = time.monotonic() + timeout
+        self.conn.send((kind, code, options))
+        try:
+            for _ in range(2): # The job's pid, then its result
+                if not self.conn.poll(max(0, deadline - time.monotonic())):
+                    action = {"measure": "Measuring", "expand": "Expanding", "replay": "Replaying"}.get(kind, "Tracing")
+                    raise PythonTraceTimeout(f"{action} took longer than {timeout:g}s")
+                message = self.conn.recv_bytes()
+                if self.job_pid is None:
+                    self.job_pid = int(message[1:])
+        except EOFError:
+            raise PythonTraceError("The Python trace worker exited unexpectedly")
+        self.job_pid = None
+        ok, result = _decode_result(message)
+        if not ok:
+            raise PythonTraceError(result)
+        return result
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+    def kill(self):
+        if self.job_pid is not None: # The job's own process; it outlives the template
+            try:
+                os.kill(self.job_pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                pass
+            self.job_pid = None
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1)
+        self.kill()
+
+
+class PythonTracePool:
+    """
+    A pool of pre-forked worker processes that run tracer.py's run_user_code for
+    /trace-python. Each worker is a template with tracer.py loaded that forks a
+    fresh process per job, so one job can't change what a later one sees. Jobs have
+    an address-space limit and may not write files or fork; a trace that runs past
+    `time_limit` ends with a "truncated" step from the tracer itself, and a job that
+    still hasn't answered `kill_grace` seconds later (stuck inside a C call, which
+    the tracer can't interrupt) is killed along with its worker. Workers are
+    replaced after an error, a kill or `max_uses` jobs.
+
+    Jobs are also sandboxed before the user's code runs: the environment is cut
+    down to WORKER_ENV, no new file descriptors can be opened (so no files, sockets
+    or imports beyond PRELOAD_MODULES), and a server running as root drops the job
+    to `uid` (default: nobody).
+    """
+    def __init__(self, size=2, max_uses=100, time_limit=10.0, memory_bytes=512 * 1024 * 1024,
+                 tracer_path=None, kill_grace=2.0, uid=65534):
+        self.size = size
+        self.max_uses = max_uses
+        self.time_limit = time_limit
+        self.memory_bytes = memory_bytes
+        self.kill_grace = kill_grace
+        self.uid = uid
+        self.tracer_path = tracer_path or find_tracer()
+        if self.tracer_path is None:
+            raise PythonTraceError("tracer.py not found, set TRACER_PATH")
+        # Workers fork from a small single-threaded server process rather than from
+        # this (threaded) one, which is cheaper than starting a fresh interpreter each time
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._idle = []
+        self._total = 0
+        self._closed = False
+        self._lock = threading.Condition()
+        self.stats = {"workers_started": 0, "workers_recycled": 0, "timeouts": 0, "traces": 0, "expansions": 0,
+                      "recordings": 0, "replays": 0, "measurements": 0}
+
+    def _spawn(self):
+        count("subprocesses_started_total", kind="python_worker")
+        worker = PythonWorker(self._context, self.tracer_path, self.memory_bytes, self.uid)
+        with self._lock:
+            self.stats["workers_started"] += 1
+        return worker
+
+    def start(self):
+        for _ in range(self.size):
+            worker = self._spawn()
+            with self._lock:
+                self._total += 1
+                self._idle.append(worker)
+
+    def acquire(self):
+        with self._lock:
+            if self._closed:
+                raise PythonTraceError("Python trace pool is closed")
+            while not self._idle and self._total >= self.size:
+                self._lock.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._total += 1 # Reserve the slot before spawning outside the lock
+        try:
+            return self._spawn()
+        except Exception:
+            with self._lock:
+                self._total -= 1
+                self._lock.notify()
+            raise
+
+    def release(self, worker, healthy=True):
+        if healthy and worker.is_alive() and worker.uses < self.max_uses and not self._closed:
+            with self._lock:
+                self._idle.append(worker)
+                self._lock.notify()
+            return
+
+        worker.kill()
+        with self._lock:
+            self.stats["workers_recycled"] += 1
+            if self._closed:
+                self._total -= 1
+                self._lock.notify()
+                return
+        # Refill the slot now so the next request gets a warm worker
+        try:
+            replacement = self._spawn()
+        except Exception as e:
+            print(f"Could not start a replacement Python trace worker: {e}")
+            with self._lock:
+                self._total -= 1
+                self._lock.notify()
+            return
+        with self._lock:
+            self._idle.append(replacement)
+            self._lock.notify()
+
+    def run(self, code, mode="delta", output="json"):
+        """Returns the trace as tracer.py encodes it: a JSON string, or bytes for output='compact'."""
+        options = {"mode": mode, "output": output, "time_limit": self.time_limit}
+        return self._run("trace", code, options)
+
+    def expand(self, code, step, ref, offset=0, limit=None):
+        """
+        Runs tracer.expand_object in a worker and returns its JSON string. The traces
+        from run() use the tracer's default bounds, which expand_object assumes too.
+        """
+        options = {"step": step, "ref": ref, "offset": offset, "limit": limit, "time_limit": self.time_limit}
+        return self._run("expand", code, options)
+
+    def record(self, code):
+        """Runs tracer.record_replay in a worker and returns the recording as a JSON string."""
+        return self._run("record", code, {"time_limit": self.time_limit})
+
+    def replay(self, code, recording, start, count, mode="delta", output="json"):
+        """Rebuilds steps [start, start + count) of a recording with tracer.replay_steps."""
+        options = {"recording": recording, "start": start, "count": count, "mode": mode,
+                   "output": output, "time_limit": self.time_limit}
+        return self._run("replay", code, options)
+
+    def measure(self, code, function=None, input_kind="auto", max_size=4096, max_ops=1_000_000):
+        """Runs empirical.measure in a worker, within the pool's time limit, and returns its report."""
+        options = {"function": function, "input_kind": input_kind, "max_size": max_size,
+                   "max_ops": max_ops, "time_budget": self.time_limit}
+        return self._run("measure", code, options)
+
+    def _run(self, kind, code, options):
+        worker = self.acquire()
+        healthy = False
+        try:
+            result = worker.run(code, options, self.time_limit + self.kill_grace, kind)
+            healthy = True
+            return result
+        except PythonTraceTimeout:
+            with self._lock:
+                self.stats["timeouts"] += 1
+            raise
+        finally:
+            with self._lock:
+                self.stats[JOB_STATS[kind]] += 1
+            self.release(worker, healthy)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "max_uses": self.max_uses,
+                "time_limit": self.time_limit,
+                "memory_bytes": self.memory_bytes,
+                "total": self._total,
+                "idle": len(self._idle),
+                **self.stats,
+            }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            workers, self._idle = self._idle, []
+            self._total -= len(workers)
+            self._lock.notify_all()
+        for worker in workers:
+            worker.close()
@@ -0,0 +1,160 @@
+import asyncio
+import contextvars
+import errno
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError: # Windows: no rlimits, only the wall-clock timeouts apply
+    resource = None
+
+
+class SchedulerBusy(Exception):
+    """The admission queue is full, or a job waited in it for too long."""
+
+
+class JobLimits:
+    """
+    Per-job resource limits for /trace-c. `time_limit` is wall-clock seconds for the
+    whole trace (compile + run); `cpu_seconds` and `memory_bytes` become RLIMIT_CPU
+    and RLIMIT_AS on the compiler and on the traced program.
+    """
+    def __init__(self, time_limit=20.0, cpu_seconds=10, memory_bytes=512 * 1024 * 1024):
+        self.time_limit = time_limit
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            time_limit=float(os.getenv("CTRACE_TIME_LIMIT", "20")),
+            cpu_seconds=int(os.getenv("CTRACE_CPU_LIMIT", "10")),
+            memory_bytes=int(os.getenv("CTRACE_MEMORY_LIMIT_MB", "512")) * 1024 * 1024,
+        )
+
+    def prlimit_args(self):
+        """
+        Command prefix that runs a program with the limits already set, using
+        util-linux's prlimit. None where it isn't installed.
+        """
+        if resource is None or not shutil.which("prlimit"):
+            return None
+        options = []
+        if self.cpu_seconds:
+            options.append(f"--cpu={self.cpu_seconds}:{self.cpu_seconds + 1}")
+        if self.memory_bytes:
+            options.append(f"--as={self.memory_bytes}:{self.memory_bytes}")
+        return ["prlimit", *options, "--"]
+
+    def exec_wrapper(self):
+        """A GDB exec-wrapper that starts the traced program with the limits set, or None."""
+        args = self.prlimit_args()
+        return " ".join(args) if args is not None else None
+
+    def apply(self, pid):
+        """
+        Sets the CPU and memory rlimits on a running process (Linux only). Only a
+        fallback for when there's no prlimit: the process has already run
+        unlimited for a moment.
+        """
+        if resource is None or not hasattr(resource, "prlimit"):
+            return
+        try:
+            if self.cpu_seconds:
+                resource.prlimit(pid, resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 1))
+            if self.memory_bytes:
+                resource.prlimit(pid, resource.RLIMIT_AS, (self.memory_bytes, self.memory_bytes))
+        except (ProcessLookupError, PermissionError, ValueError):
+            pass # Already gone, or the limit can't be lowered further
+
+    def run(self, cmd, timeout=None):
+        """
+        subprocess.run(cmd, capture_output=True, text=True) with the limits set on
+        the child, so whatever it starts (cc1plus, as, ld) inherits them. No
+        preexec_fn: it isn't safe in a process with threads, and the jobs run on
+        the scheduler's.
+        """
+        prefix = self.prlimit_args()
+        if prefix is not None:
+            if shutil.which(cmd[0]) is None: # Fail like Popen does, not with prlimit's exit status
+                raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), cmd[0])
+            process = subprocess.Popen(prefix + list(cmd), stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        else:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            self.apply(process.pid)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout if timeout is not None else self.time_limit)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+class TraceScheduler:
+    """
+    Runs blocking trace jobs on a bounded thread pool so they never block the event
+    loop. At most `max_workers` jobs run at once; up to `max_queue` more wait for a
+    slot, each for at most `queue_timeout` seconds. Anything beyond that is
+    rejected with SchedulerBusy, which the endpoint turns into a 429.
+    """
+    def __init__(self, max_workers=2, max_queue=16, queue_timeout=10.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="trace")
+        self._slots = None # asyncio.Semaphore, created on the running loop
+        self.running = 0
+        self.queued = 0
+        self.stats = {"completed": 0, "failed": 0, "rejected": 0, "queue_timeouts": 0, "queue_wait_seconds": 0.0}
+
+    async def run(self, fn, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        if not self._slots.locked():
+            await self._slots.acquire() # Free slot, doesn't wait
+        else:
+            if self.queued >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise SchedulerBusy(f"Too many traces queued ({self.queued}), try again shortly")
+            self.queued += 1
+            start = time.monotonic()
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.stats["queue_timeouts"] += 1
+                raise SchedulerBusy(f"No trace slot free after {self.queue_timeout:g}s, try again shortly")
+            finally:
+                self.queued -= 1
+            self.stats["queue_wait_seconds"] += time.monotonic() - start
+
+        self.running += 1
+        try:
+            # In the request's context, so metrics spans inside the job reach its profile
+            context = contextvars.copy_context()
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, context.run, fn, *args)
+            self.stats["completed"] += 1
+            return result
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    def metrics(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "running": self.running,
+            "queued": self.queued,
+            **self.stats,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,80 @@
+"""
+Tests for ai_client: cache keys, shared by the Gemini cache, the AST cache and the
+precomputed trace store (programs that can behave differently must not share one),
+and GeminiClient against a stub of google.generativeai.
+"""
+import asyncio
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_client import GeminiClient, cache_key
+
+
+class CacheKeyTest(unittest.TestCase):
+    def test_line_endings(self):
+        self.assertEqual(cache_key("trace-python", "x = 1\r\nprint(x)\r\n"), cache_key("trace-python", "x = 1\nprint(x)\n"))
+        # The editor's starting program has no final newline, the example files do
+        self.assertEqual(cache_key("trace-python", "print(1)\n\n"), cache_key("trace-python", "print(1)"))
+
+    def test_trailing_whitespace_in_strings(self):
+        self.assertNotEqual(
+            cache_key("trace-python", 's = """a   \nb"""\nprint(len(s))\n'),
+            cache_key("trace-python", 's = """a\nb"""\nprint(len(s))\n'),
+        )
+        self.assertNotEqual(
+            cache_key("trace-c", 'const char* s = R"(a  \n)";\n'),
+            cache_key("trace-c", 'const char* s = R"(a\n)";\n'),
+        )
+
+    def test_leading_blank_lines(self):
+        # They move every line number in the trace
+        self.assertNotEqual(cache_key("trace-python", "\n\nx = 1\n"), cache_key("trace-python", "x = 1\n"))
+
+    def test_details(self):
+        self.assertNotEqual(cache_key("ast-json", "x", max_nodes=1), cache_key("ast-json", "x", max_nodes=2))
+
+
+class StubGemini:
+    """google.generativeai's surface GeminiClient uses, answering after a short wait."""
+    def __init__(self):
+        self.prompts = []
+
+    def configure(self, api_key):
+        pass
+
+    def list_models(self):
+        return [SimpleNamespace(name="models/stub", supported_generation_methods=["generateContent"])]
+
+    def GenerativeModel(self, name):
+        stub = self
+
+        class Model:
+            async def generate_content_async(self, prompt):
+                stub.prompts.append(prompt)
+                await asyncio.sleep(0.05)
+                return SimpleNamespace(text=f"{name}: {prompt}")
+        return Model()
+
+
+class GeminiClientTest(unittest.TestCase):
+    def test_generate_async(self):
+        stub = StubGemini()
+        client = GeminiClient(api_key="key", client=stub)
+
+        async def main():
+            first = await asyncio.gather(*(client.generate_async("p", key="k") for _ in range(3)))
+            return first, await client.generate_async("p", key="k")
+
+        first, cached = asyncio.run(main())
+        self.assertEqual(first, ["models/stub: p"] * 3)
+        self.assertEqual(cached, "models/stub: p")
+        self.assertEqual(stub.prompts, ["p"]) # One upstream call, shared and then cached
+        self.assertEqual((client.stats["coalesced"], client.cache.stats["hits"]), (2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
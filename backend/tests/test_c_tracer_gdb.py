@@ -0,0 +1,148 @@
+"""
+Integration test for /trace-c: traces real programs with g++ and gdb through
+CTracer, with both engines. Skipped where either is missing; the Docker image has
+both:
+
+    docker build -t trace-view -f backend/Dockerfile .
+    docker run --rm trace-view python -m unittest discover -s tests -v
+"""
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from c_tracer import ENGINES, CTracer
+from gdb_pool import GDBSessionPool
+from scheduler import JobLimits
+from toolchain import COMPILER
+
+PROGRAM = """\
+#include <map>
+#include <string>
+#include <vector>
+
+struct Counter {
+    static int created;
+    int value;
+};
+int Counter::created = 0;
+
+struct Base { int id; };
+struct Node : Base {
+    int data;
+    Node* next;
+};
+
+int sum(std::vector<int>& v, int i) {
+    if (i == (int)v.size()) return 0;
+    return v[i] + sum(v, i + 1);
+}
+
+int main() {
+    std::vector<int> nums = {3, 1, 2};
+    std::string name = "trace";
+    std::map<std::string, int> ages = {{"ada", 36}};
+    Counter counter{5};
+    Node second{{2}, 20, nullptr};
+    Node first{{1}, 10, &second};
+    int grid[3] = {7, 8, 9};
+    int total = sum(nums, 0);
+    return total == 6 ? 0 : 1;
+}
+"""
+RETURN_LINE = PROGRAM.splitlines().index("    return total == 6 ? 0 : 1;") + 1
+
+LIMITS_PROGRAM = """\
+#include <sys/resource.h>
+
+int main() {
+    struct rlimit cpu, memory;
+    getrlimit(RLIMIT_CPU, &cpu);
+    getrlimit(RLIMIT_AS, &memory);
+    long cpu_seconds = cpu.rlim_cur;
+    long memory_bytes = memory.rlim_cur;
+    return 0;
+}
+"""
+
+
+@unittest.skipUnless(shutil.which(COMPILER) and shutil.which("gdb"), "needs g++ and gdb")
+class CTracerGDBTest(unittest.TestCase):
+    def trace(self, engine, pool=None):
+        steps = CTracer(pool=pool, engine=engine).run(PROGRAM)
+        self.assertTrue(steps, "no steps")
+        errors = [step for step in steps if step.get("event") in ("error", "truncated")]
+        self.assertEqual(errors, [])
+        return steps
+
+    def last_main_step(self, steps):
+        step = next(step for step in reversed(steps) if step["line_number"] == RETURN_LINE)
+        self.assertEqual([frame["func_name"] for frame in step["stack"]], ["main"])
+        return step
+
+    def deref(self, step, value):
+        self.assertIn("ref", value, value)
+        return step["heap"][str(value["ref"])]["value"]
+
+    def check_trace(self, steps):
+        # Recursion shows up as one frame per call, outermost first
+        depths = [[frame["func_name"] for frame in step["stack"]] for step in steps]
+        self.assertIn(["main", "sum", "sum", "sum", "sum"], depths)
+
+        step = self.last_main_step(steps)
+        local = step["stack"][-1]["locals"]
+        self.assertEqual(local["total"], {"value": "6"})
+
+        # Static members aren't part of the object and must not break it
+        self.assertEqual(self.deref(step, local["counter"]), {"value": {"value": "5"}})
+
+        # Base class members are listed as the object's own
+        first = self.deref(step, local["first"])
+        self.assertEqual(sorted(first), ["data", "id", "next"])
+        self.assertEqual(first["id"], {"value": "1"})
+        second = self.deref(step, first["next"])
+        self.assertEqual(second["next"], {"value": "nullptr"})
+        self.assertEqual(first["next"], local["second"]) # Same object, one heap entry
+
+        # Containers come from libstdc++'s pretty printers
+        self.assertEqual(self.deref(step, local["nums"]), [{"value": "3"}, {"value": "1"}, {"value": "2"}])
+        self.assertEqual(self.deref(step, local["ages"]), {'"ada"': {"value": "36"}})
+        self.assertEqual(local["name"], {"value": '"trace"'})
+        self.assertEqual(self.deref(step, local["grid"]), [{"value": "7"}, {"value": "8"}, {"value": "9"}])
+
+        # Nothing that was in scope at the end failed to read
+        for value in list(local.values()) + list(step["heap"].values()):
+            self.assertFalse(str(value.get("value")).startswith("<"), value)
+
+    def test_engines(self):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.check_trace(self.trace(engine))
+
+    def test_pooled_sessions(self):
+        # A session reused for a second run must give the same trace
+        pool = GDBSessionPool(size=1)
+        pool.start()
+        try:
+            first = self.trace("mi", pool)
+            second = self.trace("mi", pool)
+        finally:
+            pool.close()
+        self.assertEqual(first, second)
+        self.check_trace(second)
+
+    def test_limits_set_before_exec(self):
+        # The program reads its own rlimits on its first lines
+        limits = JobLimits(time_limit=20, cpu_seconds=3, memory_bytes=256 * 1024 * 1024)
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                steps = CTracer(engine=engine, limits=limits).run(LIMITS_PROGRAM)
+                local = steps[-1]["stack"][-1]["locals"]
+                self.assertEqual(local["cpu_seconds"], {"value": "3"})
+                self.assertEqual(local["memory_bytes"], {"value": str(256 * 1024 * 1024)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tests for the GDB/MI parser: known GDB output, and random records that must
+survive mi_dumps -> parse_line and come back the same from a stream fed in
+random-sized chunks.
+"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mi_parser import MIParseError, MIParser, MIRecord, RepeatedResult, ResultList, mi_dumps, parse_line
+
+NAMES = ["name", "value", "type", "frame", "line", "func", "addr", "thread-id", "bkpt", "args", "level"]
+CHARS = 'abc xyz_019{}[],="\\\n\t\r\x01\x02\x03\x1b\x7fé✓'
+
+
+def random_string(rng):
+    return "".join(rng.choice(CHARS) for _ in range(rng.randint(0, 12)))
+
+
+def random_value(rng, depth):
+    kind = rng.random() if depth < 4 else 0
+    if kind < 0.5:
+        return random_string(rng)
+    if kind < 0.7:
+        return random_results(rng, depth + 1)
+    if kind < 0.85:
+        return ResultList([random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))])
+    names = [rng.choice(NAMES) for _ in range(rng.randint(1, 4))]
+    return ResultList([random_value(rng, depth + 1) for _ in names], names)
+
+
+def random_results(rng, depth):
+    names = rng.sample(NAMES, rng.randint(0, 5))
+    results = {name: random_value(rng, depth) for name in names}
+    if names and rng.random() < 0.1:
+        results[names[0]] = RepeatedResult([results[names[0]], random_value(rng, depth)])
+    return results
+
+
+def random_record(rng):
+    kind = rng.choice(["result", "exec", "notify", "status", "console", "target", "log", "prompt"])
+    if kind == "prompt":
+        return MIRecord("prompt")
+    if kind in ("console", "target", "log"):
+        return MIRecord(kind, text=random_string(rng))
+    token = rng.choice([None, rng.randint(0, 10 ** 6)])
+    cls = rng.choice(["done", "running", "stopped", "error", "thread-group-added"])
+    return MIRecord(kind, token, cls, random_results(rng, 0))
+
+
+class MIParserTest(unittest.TestCase):
+    def test_gdb_output(self):
+        record = parse_line(
+            '12^done,variables=[{name="label",type="std::string",value="\\"pass {2}, \\\\\\"x\\\\\\"\\""},'
+            '{name="s",value="caf\\303\\251\\e"}],stack=[frame={level="0"},frame={level="1"}]'
+        )
+        self.assertEqual((record.kind, record.token, record.cls), ("result", 12, "done"))
+        label, s = record.results["variables"]
+        self.assertEqual(label["value"], '"pass {2}, \\"x\\""')
+        self.assertEqual(s, {"name": "s", "value": "café\x1b"})
+        self.assertEqual(record.results["stack"].names, ["frame", "frame"])
+
+    def test_repeated_values(self):
+        # Multi-location breakpoints repeat bkpt's value without the name
+        record = parse_line('=breakpoint-modified,bkpt={number="1"},{number="1.1"},{number="1.2"}')
+        self.assertEqual(record.results["bkpt"], [{"number": "1"}, {"number": "1.1"}, {"number": "1.2"}])
+
+    def test_program_output(self):
+        for line in ["*** stack smashing detected ***", '~"unterminated', "=x,a={", "^done,a=b]", "hello"]:
+            with self.subTest(line=line):
+                self.assertEqual(parse_line(line), MIRecord("output", text=line))
+        with self.assertRaises(MIParseError):
+            parse_line('7^done,value="unterminated')
+
+    def test_round_trip(self):
+        rng = random.Random(0)
+        records = [random_record(rng) for _ in range(3000)]
+        for record in records:
+            line = mi_dumps(record)
+            self.assertEqual(parse_line(line), record, line)
+
+        stream = "".join(mi_dumps(record) + "\n" for record in records)
+        parser = MIParser()
+        streamed = []
+        pos = 0
+        while pos < len(stream):
+            size = rng.randint(1, 200)
+            streamed.extend(parser.feed(stream[pos:pos + size]))
+            pos += size
+        self.assertEqual(streamed, records)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Tests for the /trace-python worker pool: jobs from different users share worker
+processes, so each job must start from a clean tracer and be sandboxed.
+"""
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python_pool import PythonTraceError, PythonTracePool, PythonTraceTimeout, find_tracer
+
+ATTACKER = """\
+import builtins, gc
+def p(*args, **kwargs):
+    builtins.__dict__['_print']('[tampered]', *args, **kwargs)
+builtins._print = print
+builtins.print = p
+for namespace in gc.get_objects():
+    if isinstance(namespace, dict) and 'run_user_code' in namespace:
+        namespace['run_user_code'] = lambda *args, **kwargs: '"forged"'
+"""
+
+VICTIM = "print('hello')\n"
+
+
+def output(trace):
+    return "".join(step["data"] for step in trace if step.get("event") == "output")
+
+
+@unittest.skipUnless(find_tracer() and hasattr(os, "fork"), "needs tracer.py and fork()")
+class PythonTracePoolTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # One worker, so every job below goes through the same process
+        cls.pool = PythonTracePool(size=1, time_limit=2.0, kill_grace=1.0)
+        cls.pool.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def test_jobs_do_not_see_each_other(self):
+        started = self.pool.metrics()["workers_started"]
+        self.pool.run(ATTACKER, mode="full")
+        trace = json.loads(self.pool.run(VICTIM, mode="full"))
+        self.assertEqual(self.pool.metrics()["workers_started"], started) # Same worker
+        self.assertEqual(output(trace), "hello\n")
+        self.assertEqual({frame["func_name"] for step in trace for frame in step.get("stack", [])}, {"<module>"})
+
+    def test_sandbox(self):
+        os.environ["TRACE_VIEW_TEST_SECRET"] = "secret"
+        self.pool.close()
+        type(self).pool = PythonTracePool(size=1, time_limit=2.0, kill_grace=1.0)
+        self.pool.start()
+        try:
+            code = (
+                "import os\n"
+                "print(os.environ.get('TRACE_VIEW_TEST_SECRET'))\n"
+                "try:\n"
+                "    open('/etc/hostname')\n"
+                "except OSError as e:\n"
+                "    print(type(e).__name__)\n"
+            )
+            trace = json.loads(self.pool.run(code, mode="full"))
+        finally:
+            del os.environ["TRACE_VIEW_TEST_SECRET"]
+        self.assertEqual(output(trace), "None\nOSError\n")
+
+    def test_stuck_job_is_killed(self):
+        # A single C call the tracer can't interrupt
+        with self.assertRaises(PythonTraceTimeout):
+            self.pool.run("sum(range(10 ** 12))\n")
+        trace = json.loads(self.pool.run(VICTIM, mode="full"))
+        self.assertEqual(output(trace), "hello\n")
+
+    def test_process_exit(self):
+        with self.assertRaises(PythonTraceError):
+            self.pool.run("import os\nos._exit(0)\n")
+        self.assertEqual(output(json.loads(self.pool.run(VICTIM, mode="full"))), "hello\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+Tests for JobLimits.run, which starts the compiler for /trace-c: the child must
+get the CPU and memory rlimits, with or without prlimit installed.
+"""
+import os
+import shutil
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import JobLimits, resource
+
+# Waits a moment first, so the fallback has set the limits by the time it reads them
+READ_LIMITS = (
+    "import resource, time\n"
+    "time.sleep(0.5)\n"
+    "print(resource.getrlimit(resource.RLIMIT_CPU)[0], resource.getrlimit(resource.RLIMIT_AS)[0])\n"
+)
+MEMORY = 2 * 1024 ** 3
+
+
+@unittest.skipUnless(resource is not None and hasattr(resource, "prlimit"), "needs Linux rlimits")
+class JobLimitsTest(unittest.TestCase):
+    def setUp(self):
+        self.limits = JobLimits(time_limit=20, cpu_seconds=7, memory_bytes=MEMORY)
+
+    def read_limits(self):
+        result = self.limits.run([sys.executable, "-c", READ_LIMITS])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.split()
+
+    @unittest.skipUnless(shutil.which("prlimit"), "needs prlimit")
+    def test_prlimit(self):
+        self.assertEqual(self.read_limits(), ["7", str(MEMORY)])
+
+    def test_without_prlimit(self):
+        with mock.patch.object(JobLimits, "prlimit_args", return_value=None):
+            self.assertEqual(self.read_limits(), ["7", str(MEMORY)])
+
+    def test_missing_program(self):
+        with self.assertRaises(FileNotFoundError):
+            self.limits.run(["no-such-compiler", "--version"])
+
+
+if __name__ == "__main__":
+    unittest.main()
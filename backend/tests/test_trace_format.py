@@ -0,0 +1,32 @@
+"""
+Tests for the compact trace format on the backend, which encodes with tracer.py's
+encoder: a /trace-c style trace must decode back to the same steps.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python_pool import find_tracer, import_tracer
+from trace_format import encode_compact
+
+STEPS = [
+    {"line_number": 12, "stack": [{"func_name": "main", "lineno": 12, "locals": {"n": {"value": "7"}, "v": {"ref": 1}}}],
+     "heap": {"1": {"value": [{"value": "3"}, {"value": "1"}]}}},
+    {"event": "output", "data": "héllo\n"},
+    {"event": "truncated", "reason": "max_steps", "limit": 2 ** 60, "ratio": 0.5, "ok": False, "detail": None},
+]
+
+
+@unittest.skipUnless(find_tracer(), "needs tracer.py")
+class TraceFormatTest(unittest.TestCase):
+    def test_round_trip(self):
+        tracer = import_tracer(find_tracer())
+        data = encode_compact(STEPS)
+        self.assertEqual(data, tracer.encode_compact(STEPS))
+        self.assertEqual(tracer.decode_compact(data), STEPS)
+
+
+if __name__ == "__main__":
+    unittest.main()
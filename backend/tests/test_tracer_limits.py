@@ -0,0 +1,64 @@
+"""
+Tests for tracer.py's step and time limits. Each trace runs in its own interpreter
+with a timeout, so a limit that never fires fails the test instead of hanging it.
+"""
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from python_pool import find_tracer
+
+TRACER_PATH = find_tracer()
+
+RUNNER = """
+import importlib.util, json, sys
+spec = importlib.util.spec_from_file_location("tracer", sys.argv[1])
+tracer = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(tracer)
+options = json.loads(sys.argv[3])
+backends = ["settrace"] + (["monitoring"] if tracer.monitoring_available() else [])
+print(json.dumps({backend: json.loads(tracer.run_user_code(sys.argv[2], backend=backend, **options))
+                  for backend in backends}))
+"""
+
+
+@unittest.skipUnless(TRACER_PATH, "needs tracer.py")
+class TracerLimitsTest(unittest.TestCase):
+    def trace(self, code, timeout=20, **options):
+        result = subprocess.run(
+            [sys.executable, "-c", RUNNER, TRACER_PATH, code, json.dumps(options)],
+            capture_output=True, text=True, timeout=timeout,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout)
+
+    def test_one_line_loop_time_limit(self):
+        for backend, trace in self.trace("while True: pass", time_limit=1, max_steps=None).items():
+            with self.subTest(backend=backend):
+                self.assertEqual(trace[-1]["event"], "truncated")
+                self.assertEqual(trace[-1]["reason"], "time_limit")
+
+    def test_one_line_loop_max_steps(self):
+        for backend, trace in self.trace("while True: pass", time_limit=None, max_steps=50).items():
+            with self.subTest(backend=backend):
+                self.assertEqual(trace[-1]["reason"], "max_steps")
+                self.assertEqual(len(trace), 51)
+
+    def test_one_line_loop_steps(self):
+        # One step per pass, as for a loop over several lines, on every backend
+        code = "total = 0\nfor i in range(3): total += i\nprint(total)\n"
+        traces = self.trace(code, mode="full")
+        for backend, trace in traces.items():
+            with self.subTest(backend=backend):
+                totals = [step["stack"][0]["locals"].get("total", {}).get("value")
+                          for step in trace if step.get("line_number") == 2]
+                self.assertEqual(totals, ["0", "0", "1", "3"])
+        self.assertEqual(len({json.dumps(trace) for trace in traces.values()}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
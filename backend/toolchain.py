@@ -0,0 +1,104 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import uuid
+
+COMPILER = "g++"
+
+# "default" is what /trace-c always used. "fast" keeps full debug info (GDB needs
+# the locals) but pipes between compiler stages, drops column info and links with
+# gold when it is installed.
+COMPILE_PROFILES = {
+    "default": ("-g", "-O0"),
+    "fast": ("-g", "-O0", "-pipe", "-gno-column-info"),
+}
+
+# Headers almost every submitted program includes; parsing them dominates g++ time
+PCH_HEADERS = ("iostream", "vector", "algorithm", "string")
+INCLUDE_RE = re.compile(r'^\s*#\s*include\s*<([\w./]+)>', re.MULTILINE)
+
+
+def compiler_version(compiler=COMPILER):
+    result = subprocess.run([compiler, "--version"], capture_output=True, text=True)
+    return result.stdout.splitlines()[0].strip() if result.returncode == 0 and result.stdout else ""
+
+
+class Toolchain:
+    """
+    Compiler flags for one profile, plus an optional precompiled header for
+    PCH_HEADERS. The PCH is only used for programs that include at least one of
+    those headers, and a stamp file next to it records the compiler version and
+    flags it was built with so a compiler upgrade rebuilds it.
+    """
+    def __init__(self, profile="default", use_pch=True, pch_dir=None, compiler=COMPILER):
+        if profile not in COMPILE_PROFILES:
+            raise ValueError(f"Unknown compile profile '{profile}', expected one of {sorted(COMPILE_PROFILES)}")
+        self.profile = profile
+        self.compiler = compiler
+        self.flags = COMPILE_PROFILES[profile]
+        if profile == "fast" and shutil.which("ld.gold"):
+            self.link_flags = ("-fuse-ld=gold",)
+        else:
+            self.link_flags = ()
+        self.use_pch = use_pch
+        self.pch_dir = pch_dir or os.path.join(tempfile.gettempdir(), "trace_view_pch", profile)
+        self.header = os.path.join(self.pch_dir, "prelude.h")
+        self.pch_ready = False
+        self.version = ""
+
+    def stamp(self):
+        return "\n".join([self.version, " ".join(self.flags), " ".join(PCH_HEADERS)])
+
+    def prepare(self):
+        """Checks the compiler and builds the PCH unless an up-to-date one exists."""
+        self.version = compiler_version(self.compiler)
+        if not self.use_pch or not self.version:
+            return
+        stamp_file = os.path.join(self.pch_dir, "prelude.stamp")
+        try:
+            with open(stamp_file) as f:
+                if f.read() == self.stamp() and os.path.exists(f"{self.header}.gch"):
+                    self.pch_ready = True
+                    return
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(self.pch_dir, exist_ok=True)
+        with open(self.header, "w") as f:
+            f.write("".join(f"#include <{name}>\n" for name in PCH_HEADERS))
+        # Build under a temp name; other workers may be checking the same PCH
+        tmp_gch = f"{self.header}.{uuid.uuid4().hex}.tmp"
+        result = subprocess.run(
+            [self.compiler, "-x", "c++-header", *self.flags, self.header, "-o", tmp_gch],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"Could not build precompiled header: {result.stderr}")
+            if os.path.exists(tmp_gch): os.remove(tmp_gch)
+            return
+        os.replace(tmp_gch, f"{self.header}.gch")
+        with open(stamp_file, "w") as f:
+            f.write(self.stamp())
+        self.pch_ready = True
+
+    def wants_pch(self, code):
+        return self.pch_ready and any(name in PCH_HEADERS for name in INCLUDE_RE.findall(code))
+
+    def compile_flags(self, code, pch=True):
+        """Flags for compiling `code`. Pass pch=False to retry a build without the PCH."""
+        flags = (*self.flags, *self.link_flags)
+        if pch and self.wants_pch(code):
+            # -include makes every PCH header visible, not just the ones the program
+            # asked for. Callers retry without it if that breaks the build.
+            flags = (*flags, "-include", self.header)
+        return flags
+
+    def metrics(self):
+        return {
+            "profile": self.profile,
+            "compiler": self.version,
+            "flags": list(self.flags + self.link_flags),
+            "pch": self.pch_ready,
+        }
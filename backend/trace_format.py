@@ -0,0 +1,24 @@
+"""
+Compact binary encoding for trace steps, an optional alternative to JSON for /trace-c.
+
+The encoder is tracer.py's encode_compact (its layout is described there), loaded
+from the same file the Python workers run, so the backend and Pyodide write
+identical bytes from one implementation. frontend/src/utils/compactTrace.js reads
+the format; keep it in sync with tracer.py.
+"""
+from python_pool import find_tracer, import_tracer
+
+COMPACT_MEDIA_TYPE = "application/x-trace-view-compact"
+
+_tracer = None
+
+
+def encode_compact(steps):
+    """Encodes a list of trace steps into the compact binary format."""
+    global _tracer
+    if _tracer is None:
+        path = find_tracer()
+        if path is None:
+            raise RuntimeError("tracer.py not found, set TRACER_PATH")
+        _tracer = import_tracer(path)
+    return _tracer.encode_compact(steps)
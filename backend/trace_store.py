@@ -0,0 +1,108 @@
+"""
+Precomputed traces for the curated examples, so /trace-c and /trace-python answer
+them without compiling, starting GDB or running the tracer.
+
+The store is one file, written offline by build_trace_store.py from the real
+tracers' output and memory-mapped on first use:
+
+  b"TVS1", entry count (uint32 LE)
+  entries sorted by key: 32-byte sha256 key, offset (uint64 LE), length (uint32 LE)
+  the trace bodies, stored exactly as the endpoint sends them
+
+Keys are ai_client.cache_key(kind, code, **variant), so an example pasted with
+Windows line endings still hits and the variant (mode, format) is part of the key.
+"""
+import mmap
+import os
+import struct
+import threading
+
+from ai_client import cache_key
+
+STORE_MAGIC = b"TVS1"
+HEADER = struct.Struct("<4sI")
+ENTRY = struct.Struct("<32sQI")
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces.bin")
+
+
+def store_key(kind, code, **variant):
+    return bytes.fromhex(cache_key(kind, code, **variant))
+
+
+def write_store(path, entries):
+    """Writes {key: body bytes} to `path`, replacing any existing store atomically."""
+    keys = sorted(entries)
+    offset = HEADER.size + ENTRY.size * len(keys)
+    index = bytearray(HEADER.pack(STORE_MAGIC, len(keys)))
+    for key in keys:
+        index += ENTRY.pack(key, offset, len(entries[key]))
+        offset += len(entries[key])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(index)
+        for key in keys:
+            f.write(entries[key])
+    os.replace(tmp_path, path)
+
+
+class TraceStore:
+    """
+    Read side of the store. get() binary-searches the mapped index and returns the
+    body, or None when the code isn't a stored example or there is no store file.
+    """
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._map = None
+        self._count = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            try:
+                with open(self.path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError): # Missing or empty: everything is a miss
+                return
+            magic, count = HEADER.unpack_from(self._map, 0)
+            if magic != STORE_MAGIC:
+                print(f"Ignoring trace store {self.path}: not a trace store")
+                self._map.close()
+                self._map = None
+                return
+            self._count = count
+
+    def get(self, kind, code, **variant):
+        if not self._loaded:
+            self._load()
+        body = self._find(store_key(kind, code, **variant)) if self._map is not None else None
+        self.stats["hits" if body is not None else "misses"] += 1
+        return body
+
+    def _find(self, key):
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            entry_key, offset, length = ENTRY.unpack_from(self._map, HEADER.size + mid * ENTRY.size)
+            if entry_key == key:
+                return self._map[offset:offset + length]
+            if entry_key < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def metrics(self):
+        if not self._loaded:
+            self._load()
+        return {"path": self.path, "loaded": self._map is not None, "entries": self._count, **self.stats}
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
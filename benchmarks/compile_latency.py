@@ -0,0 +1,79 @@
+"""
+Compares /trace-c compile latency with and without the fast profile and the
+precompiled header.
+
+    python benchmarks/compile_latency.py [--repeat N]
+
+Compiles every .cpp program in benchmarks/corpus with CTracer's toolchain
+(backend/toolchain.py), bypassing the compile cache, and reports the best time
+per configuration. The PCH is built once before timing starts.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(ROOT, 'benchmarks', 'corpus')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from toolchain import Toolchain  # noqa: E402
+
+
+def load_corpus():
+    programs = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith('.cpp'):
+            with open(os.path.join(CORPUS_DIR, name)) as f:
+                programs[name[:-4]] = f.read()
+    return programs
+
+
+def bench(toolchain, code, work_dir, repeat):
+    source_file = os.path.join(work_dir, 'program.cpp')
+    exe_file = os.path.join(work_dir, 'program.out')
+    with open(source_file, 'w') as f:
+        f.write(code)
+    cmd = [toolchain.compiler, *toolchain.compile_flags(code), source_file, '-o', exe_file]
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, capture_output=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        configs = {
+            'default': Toolchain('default', use_pch=False),
+            'fast': Toolchain('fast', use_pch=False),
+            'fast+pch': Toolchain('fast', use_pch=True, pch_dir=os.path.join(work_dir, 'pch')),
+        }
+        start = time.perf_counter()
+        for toolchain in configs.values():
+            toolchain.prepare()
+        print(f"Compiler: {configs['default'].version}")
+        print(f"Toolchain setup (PCH build): {time.perf_counter() - start:.2f}s\n")
+
+        print(f"{'program':<16}" + ''.join(f"{name:>12}" for name in configs) + f"{'speedup':>10}")
+        totals = dict.fromkeys(configs, 0.0)
+        for name, code in load_corpus().items():
+            times = {config: bench(toolchain, code, work_dir, args.repeat) for config, toolchain in configs.items()}
+            for config, elapsed in times.items():
+                totals[config] += elapsed
+            row = ''.join(f"{elapsed:>12.3f}" for elapsed in times.values())
+            print(f"{name:<16}{row}{times['default'] / times['fast+pch']:>9.2f}x")
+        row = ''.join(f"{elapsed:>12.3f}" for elapsed in totals.values())
+        print(f"{'total':<16}{row}{totals['default'] / totals['fast+pch']:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+def bubble_sort(arr):
+    n = len(arr)
+    for i in range(n - 1):
+        for j in range(n - i - 1):
+            if arr[j] > arr[j + 1]:
+                arr[j], arr[j + 1] = arr[j + 1], arr[j]
+    return arr
+
+data = [64, 34, 25, 12, 22, 11, 90, 5, 77, 41, 3, 58, 19, 86, 30, 7]
+bubble_sort(data)
+print(data)
@@ -0,0 +1,8 @@
+values = [(i * 7919) % 1000 for i in range(2000)]
+
+total = 0
+for v in values[:200]:
+    total += v
+
+values.sort()
+print(total, values[0], values[-1])
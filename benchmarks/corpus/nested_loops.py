@@ -0,0 +1,13 @@
+import math
+
+def table(n):
+    rows = []
+    for i in range(n):
+        row = []
+        for j in range(n):
+            row.append(math.gcd(i, j))
+        rows.append(row)
+    return rows
+
+grid = table(12)
+print(sum(map(sum, grid)))
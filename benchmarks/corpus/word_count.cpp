@@ -0,0 +1,20 @@
+#include <iostream>
+#include <string>
+#include <map>
+using namespace std;
+
+int main() {
+    string text = "the quick brown fox jumps over the lazy dog the end";
+    map<string, int> counts;
+    string word;
+    for (char c : text + " ") {
+        if (c == ' ') {
+            if (!word.empty()) counts[word]++;
+            word.clear();
+        } else {
+            word += c;
+        }
+    }
+    for (auto& entry : counts) cout << entry.first << ": " << entry.second << endl;
+    return 0;
+}
@@ -0,0 +1,292 @@
+"""
+Regression benchmarks for the tracers, the complexity analyzer, the AST graph and
+the HTTP endpoints, saved as JSON so runs can be compared over time.
+
+    python benchmarks/harness.py [--only SECTIONS] [--repeat N] [--output FILE]
+                                 [--concurrency C] [--requests R] [--compare OLD.json]
+
+Sections (all by default, comma separated for --only):
+  python      tracer.run_user_code on every corpus .py program, full and delta:
+              steps, steps/s, JSON bytes per step, peak traced memory (tracemalloc);
+              and replay mode: record_replay time and recording size, and the
+              time replay_steps takes to rebuild the last 200 steps
+  c           every corpus .cpp program: compile latency (no cache), then, with
+              gdb installed, the whole CTracer.run: steps, steps/s, bytes per step
+  complexity  ComplexityAnalyzer.analyze per program, cold and with a warm cache
+  ast         ASTVisualizer build + to_json per program and on a large generated file
+  endpoints   p50/p99 latency of the main endpoints under C concurrent clients
+              through FastAPI's TestClient (needs the backend's requirements)
+
+Sections whose tools are missing (g++/gdb, fastapi...) are recorded as skipped.
+Results go to benchmarks/results/<UTC time>.json unless --output is given;
+--compare prints the relative change of every timing against an earlier file.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(ROOT, 'benchmarks', 'corpus')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'frontend', 'public'))
+
+import tracer  # noqa: E402
+from complexity import ComplexityAnalyzer  # noqa: E402
+from ai_client import TTLCache  # noqa: E402
+
+SECTIONS = ('python', 'c', 'complexity', 'ast', 'endpoints')
+# Lower is better for these; everything else numeric is informational or higher-is-better
+TIMING_KEYS = ('ms', 'p50_ms', 'p99_ms', 'compile_ms', 'trace_ms', 'cold_ms', 'warm_ms', 'bytes_per_step', 'peak_kb',
+               'record_ms', 'replay_ms', 'recording_bytes')
+
+
+def load_corpus(extension):
+    programs = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith(extension):
+            with open(os.path.join(CORPUS_DIR, name)) as f:
+                programs[name[:-len(extension)]] = f.read()
+    return programs
+
+
+def best_seconds(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def count_steps(steps):
+    return sum(1 for step in steps if 'event' not in step)
+
+
+def bench_python(repeat):
+    results = {}
+    for name, code in load_corpus('.py').items():
+        for mode in ('full', 'delta'):
+            elapsed, output = best_seconds(lambda: tracer.run_user_code(code, mode=mode), repeat)
+            tracemalloc.start()
+            tracer.run_user_code(code, mode=mode)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            steps = count_steps(json.loads(output))
+            results[f'{name}/{mode}'] = {
+                'steps': steps,
+                'ms': elapsed * 1000,
+                'steps_per_s': steps / elapsed,
+                'bytes_per_step': len(output.encode('utf-8')) / max(steps, 1),
+                'peak_kb': peak / 1024,
+            }
+        record_s, recording = best_seconds(lambda: tracer.record_replay(code), repeat)
+        total = json.loads(recording)['steps']
+        replay_s, _ = best_seconds(lambda: tracer.replay_steps(code, recording, max(0, total - 200), 200), repeat)
+        results[f'{name}/replay'] = {
+            'steps': total,
+            'record_ms': record_s * 1000,
+            'recording_bytes': len(recording),
+            'replay_ms': replay_s * 1000,
+        }
+    return results
+
+
+def bench_c(repeat):
+    from toolchain import Toolchain
+    toolchain = Toolchain()
+    if shutil.which(toolchain.compiler) is None:
+        return {'skipped': f'{toolchain.compiler} not installed'}
+    toolchain.prepare()
+    has_gdb = shutil.which('gdb') is not None
+    if has_gdb:
+        from c_tracer import CTracer
+
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, code in load_corpus('.cpp').items():
+            source = os.path.join(work_dir, 'program.cpp')
+            with open(source, 'w') as f:
+                f.write(code)
+            cmd = [toolchain.compiler, *toolchain.compile_flags(code), source, '-o', os.path.join(work_dir, 'program.out')]
+            compile_s, _ = best_seconds(lambda: subprocess.run(cmd, check=True, capture_output=True), repeat)
+            results[name] = {'compile_ms': compile_s * 1000}
+            if not has_gdb:
+                results[name]['trace'] = 'skipped: gdb not installed'
+                continue
+            c_tracer = CTracer(toolchain=toolchain)
+            trace_s, steps = best_seconds(lambda: c_tracer.run(code), repeat)
+            count = count_steps(steps)
+            results[name].update({
+                'steps': count,
+                'trace_ms': trace_s * 1000,
+                'steps_per_s': count / trace_s,
+                'bytes_per_step': len(json.dumps(steps)) / max(count, 1),
+            })
+    return results
+
+
+def large_program(functions=200):
+    body = []
+    for i in range(functions):
+        body.append(f'def f{i}(items):\n    total = 0\n    for x in items:\n'
+                    f'        for y in items:\n            total += x * y + {i}\n    return f{(i + 1) % functions}(items[:len(items) // 2]) if items else total\n')
+    return '\n'.join(body)
+
+
+def bench_complexity(repeat):
+    programs = {**load_corpus('.py'), 'large_generated': large_program()}
+    results = {}
+    for name, code in programs.items():
+        cold, _ = best_seconds(lambda: ComplexityAnalyzer().analyze(code), repeat)
+        analyzer = ComplexityAnalyzer(cache=TTLCache())
+        analyzer.analyze(code)
+        warm, report = best_seconds(lambda: analyzer.analyze(code), repeat)
+        results[name] = {'cold_ms': cold * 1000, 'warm_ms': warm * 1000, 'time': report['time']}
+    return results
+
+
+def bench_ast(repeat):
+    import ast
+    try:
+        from ast_graph import ASTVisualizer
+    except ImportError as e: # graphviz, for to_dot()
+        return {'skipped': str(e)}
+    programs = {**load_corpus('.py'), 'large_generated': large_program()}
+    results = {}
+    for name, code in programs.items():
+        tree = ast.parse(code)
+        elapsed, graph = best_seconds(lambda: ASTVisualizer().build(tree).to_json(), repeat)
+        results[name] = {'ms': elapsed * 1000, 'nodes': len(graph['nodes']), 'total_nodes': graph['total_nodes']}
+    return results
+
+
+def bench_endpoints(concurrency, requests):
+    try:
+        from fastapi.testclient import TestClient
+        import main
+    except Exception as e: # fastapi, httpx, graphviz... not installed
+        return {'skipped': f'{type(e).__name__}: {e}'}
+
+    python_code = load_corpus('.py')['bubble_sort']
+    cpp_code = next(iter(load_corpus('.cpp').values()))
+    endpoints = {
+        'analyze-complexity': ('/analyze-complexity', {'code': python_code, 'language': 'python'}),
+        'ast-json': ('/get-ast-visualization', {'code': python_code, 'format': 'json'}),
+        'trace-python': ('/trace-python', {'code': python_code, 'mode': 'delta'}),
+        'trace-c': ('/trace-c', {'code': cpp_code}),
+    }
+    results = {}
+    with TestClient(main.app) as client:
+        for name, (path, body) in endpoints.items():
+            def call(_):
+                start = time.perf_counter()
+                status = client.post(path, json=body).status_code
+                return time.perf_counter() - start, status
+            with ThreadPoolExecutor(concurrency) as executor:
+                samples = list(executor.map(call, range(requests)))
+            latencies = sorted(elapsed for elapsed, _ in samples)
+            results[name] = {
+                'p50_ms': statistics.median(latencies) * 1000,
+                'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+                'errors': sum(1 for _, status in samples if status >= 400),
+                'requests': requests,
+                'concurrency': concurrency,
+            }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def flatten(results, prefix=''):
+    for key, value in results.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            yield from flatten(value, path + '.')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def compare(old_path, new):
+    with open(old_path) as f:
+        old = dict(flatten(json.load(f)['results']))
+    print(f"\n{'metric':<48}{'before':>12}{'after':>12}{'change':>9}")
+    for path, value in flatten(new['results']):
+        if path.rsplit('.', 1)[-1] in TIMING_KEYS and old.get(path):
+            change = (value - old[path]) / old[path]
+            flag = '  <-' if change > 0.1 else ''
+            print(f"{path:<48}{old[path]:>12.2f}{value:>12.2f}{change:>+9.0%}{flag}")
+
+
+def print_results(results):
+    for section, rows in results.items():
+        print(f'\n[{section}]')
+        if 'skipped' in rows:
+            print(f"  skipped: {rows['skipped']}")
+            continue
+        for name, metrics in rows.items():
+            shown = ', '.join(f'{k}={v:.1f}' if isinstance(v, float) else f'{k}={v}' for k, v in metrics.items())
+            print(f'  {name:<26}{shown}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', default=','.join(SECTIONS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--output')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    sections = [s.strip() for s in args.only.split(',') if s.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"unknown sections: {', '.join(sorted(unknown))}")
+
+    runners = {
+        'python': lambda: bench_python(args.repeat),
+        'c': lambda: bench_c(args.repeat),
+        'complexity': lambda: bench_complexity(args.repeat),
+        'ast': lambda: bench_ast(args.repeat),
+        'endpoints': lambda: bench_endpoints(args.concurrency, args.requests),
+    }
+    results = {section: runners[section]() for section in sections}
+    print_results(results)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    record = {
+        'timestamp': now.isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, now.strftime('%Y%m%dT%H%M%SZ') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(record, f, indent=2)
+    print(f'\nwrote {output}')
+
+    if args.compare:
+        compare(args.compare, record)
+
+
+if __name__ == '__main__':
+    main()
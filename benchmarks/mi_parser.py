@@ -0,0 +1,79 @@
+"""
+Benchmarks the GDB/MI parser (backend/mi_parser.py).
+
+    python benchmarks/mi_parser.py [--repeat N]
+
+Parses a typical per-step exchange (*stopped + -stack-list-variables) with
+MIParser and with the regex scraping CTracer used before, and reports
+microseconds per step (best of 5 runs). The round trip and fuzz checks are in
+backend/tests/test_mi_parser.py.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from mi_parser import MIParser  # noqa: E402
+
+
+STEP_OUTPUT = (
+    '^running\n*running,thread-id="all"\n(gdb)\n'
+    '*stopped,reason="end-stepping-range",frame={addr="0x0000555555555200",func="bubbleSort",'
+    'args=[{name="arr",value="..."}],file="/tmp/prog.cpp",fullname="/tmp/prog.cpp",line="12",arch="i386:x86-64"},'
+    'thread-id="1",stopped-threads="all",core="3"\n(gdb)\n'
+    '^done,variables=[{name="arr",arg="1",type="std::vector<int> &"},{name="n",type="int",value="7"},'
+    '{name="i",type="int",value="2"},{name="j",type="int",value="4"},'
+    '{name="label",type="std::string",value="\\"pass {2}, \\\\\\"sorted\\\\\\"\\""}]\n(gdb)\n'
+)
+
+
+def legacy_step(output):
+    # The regex scraping CTracer.run/parse_vars did before mi_parser.py
+    line = int(re.search(r'line="(\d+)"', output).group(1))
+    func = re.search(r'func="([^"]+)"', output).group(1)
+    variables = {}
+    content = re.search(r'variables=\[(.*?)\]', output).group(1)
+    for item in content.split('},{'):
+        name_match = re.search(r'name="([^"]+)"', item)
+        val_match = re.search(r'value="([^"]+)"', item)
+        if name_match and val_match:
+            variables[name_match.group(1)] = {"value": val_match.group(1).replace(r'\\n', '')}
+    return line, func, variables
+
+
+def parser_step(output):
+    parser = MIParser()
+    records = parser.feed(output)
+    stopped = next(r for r in records if r.kind == 'exec' and r.cls == 'stopped')
+    result = [r for r in records if r.kind == 'result'][-1]
+    frame = stopped.results['frame']
+    variables = {var['name']: {"value": var['value']} for var in result.results['variables'] if 'value' in var}
+    return int(frame['line']), frame['func'], variables
+
+
+def bench(fn, repeat):
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(STEP_OUTPUT)
+        runs.append((time.perf_counter() - start) / repeat * 1e6)
+    return min(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5000)
+    args = parser.parse_args()
+
+    print(f"per-step parse ({len(STEP_OUTPUT)} bytes of MI):")
+    print(f"  regex scraping  {bench(legacy_step, args.repeat):8.1f} us  -> {legacy_step(STEP_OUTPUT)[2]['label']}")
+    print(f"  MIParser        {bench(parser_step, args.repeat):8.1f} us  -> {parser_step(STEP_OUTPUT)[2]['label']}")
+
+
+if __name__ == '__main__':
+    main()
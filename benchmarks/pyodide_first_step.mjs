@@ -0,0 +1,36 @@
+// Time to first step for the in-browser path, measured in Node: load Pyodide,
+// load tracer.py, then run each corpus program with run_user_code_chunked until
+// its first batch (a single step) arrives. Same steps as pyodideWorker.js.
+//
+//     node benchmarks/pyodide_first_step.mjs PYODIDE_DIR
+//
+// PYODIDE_DIR is a Pyodide distribution (e.g. node_modules/pyodide after
+// `npm install pyodide`). Prints one JSON object per line for time_to_first_step.py.
+import { readFileSync, readdirSync } from 'node:fs';
+import { join, resolve } from 'node:path';
+import { pathToFileURL } from 'node:url';
+
+const ROOT = resolve(new URL('..', import.meta.url).pathname);
+const [pyodideDir] = process.argv.slice(2);
+
+let start = performance.now();
+const { loadPyodide } = await import(pathToFileURL(join(resolve(pyodideDir), 'pyodide.mjs')).href);
+const pyodide = await loadPyodide({ indexURL: resolve(pyodideDir) + '/' });
+const runtimeMs = performance.now() - start;
+
+start = performance.now();
+pyodide.FS.writeFile('tracer.py', readFileSync(join(ROOT, 'frontend/public/tracer.py'), 'utf8'), { encoding: 'utf8' });
+const tracer = pyodide.pyimport('tracer');
+const tracerMs = performance.now() - start;
+console.log(JSON.stringify({ stage: 'load', runtime_ms: runtimeMs, tracer_ms: tracerMs }));
+
+const corpus = join(ROOT, 'benchmarks/corpus');
+for (const name of readdirSync(corpus).filter(f => f.endsWith('.py')).sort()) {
+  const code = readFileSync(join(corpus, name), 'utf8');
+  let firstStepMs = null;
+  start = performance.now();
+  const onBatch = () => { firstStepMs ??= performance.now() - start; };
+  tracer.run_user_code_chunked.callKwargs(code, onBatch, { mode: 'delta' });
+  const totalMs = performance.now() - start;
+  console.log(JSON.stringify({ stage: 'trace', program: name.slice(0, -3), first_step_ms: firstStepMs, total_ms: totalMs }));
+}
@@ -0,0 +1,113 @@
+"""
+Time to first step for Python traces: the backend's /trace-python worker pool
+against Pyodide in the browser.
+
+    python benchmarks/time_to_first_step.py [--repeat N] [--url URL] [--pyodide DIR]
+
+Server path (backend/python_pool.py, in-process):
+  cold   starting the pool plus the first trace, i.e. a freshly started server
+  warm   best trace time on a warm worker (the whole trace comes back at once,
+         so the first step arrives with the last)
+With --url the same programs are also POSTed to a running backend, which adds
+HTTP and JSON decoding on top.
+
+Pyodide path (--pyodide DIR, needs Node and a local Pyodide distribution): the
+runtime and tracer.py load once per page, then the first streamed batch of each
+program. A first visit pays runtime + tracer + first step; the download itself
+is not included, so on a slow connection the real number is higher.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(ROOT, 'benchmarks', 'corpus')
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+from python_pool import PythonTracePool  # noqa: E402
+
+
+def load_corpus():
+    programs = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith('.py'):
+            with open(os.path.join(CORPUS_DIR, name)) as f:
+                programs[name[:-3]] = f.read()
+    return programs
+
+
+def best_ms(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def post_trace(url, code):
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/trace-python",
+        data=json.dumps({'code': code, 'mode': 'delta'}).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def server_path(programs, repeat, url):
+    first_program = next(iter(programs.values()))
+    start = time.perf_counter()
+    pool = PythonTracePool(size=1)
+    pool.start()
+    pool.run(first_program)
+    print(f"server cold start + first trace: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    print(f"\n{'program':<14}{'warm ms':>10}{'http ms':>10}")
+    try:
+        for name, code in programs.items():
+            warm = best_ms(lambda: pool.run(code), repeat)
+            http = f"{best_ms(lambda: post_trace(url, code), repeat):>10.1f}" if url else f"{'-':>10}"
+            print(f"{name:<14}{warm:>10.1f}{http}")
+    finally:
+        pool.close()
+
+
+def pyodide_path(pyodide_dir):
+    script = os.path.join(ROOT, 'benchmarks', 'pyodide_first_step.mjs')
+    result = subprocess.run(['node', script, pyodide_dir], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"\npyodide: failed\n{result.stderr.strip()}")
+        return
+    rows = [json.loads(line) for line in result.stdout.splitlines() if line.startswith('{')]
+    load = next(row for row in rows if row['stage'] == 'load')
+    print(f"\npyodide runtime load: {load['runtime_ms']:.1f} ms, tracer.py: {load['tracer_ms']:.1f} ms")
+    print(f"{'program':<14}{'first step ms':>15}{'total ms':>10}{'first visit ms':>16}")
+    for row in rows:
+        if row['stage'] == 'trace':
+            first_visit = load['runtime_ms'] + load['tracer_ms'] + row['first_step_ms']
+            print(f"{row['program']:<14}{row['first_step_ms']:>15.1f}{row['total_ms']:>10.1f}{first_visit:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--url', help='base URL of a running backend, e.g. http://localhost:10000')
+    parser.add_argument('--pyodide', help='directory of a local Pyodide distribution')
+    args = parser.parse_args()
+
+    programs = load_corpus()
+    server_path(programs, args.repeat, args.url)
+    if args.pyodide:
+        pyodide_path(args.pyodide)
+    else:
+        print("\npyodide: skipped (pass --pyodide DIR)")
+
+
+if __name__ == '__main__':
+    main()
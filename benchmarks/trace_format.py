@@ -0,0 +1,78 @@
+"""
+Compares JSON against the compact binary trace format on the benchmark corpus.
+
+    python benchmarks/trace_format.py [--repeat N] [--dump DIR]
+
+Reports raw and gzipped sizes plus Python decode time (json.loads vs decode_compact).
+--dump writes each trace in both formats to DIR so trace_format_decode.mjs can time
+the browser-side decoders under Node:
+
+    node benchmarks/trace_format_decode.mjs DIR
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(ROOT, 'benchmarks', 'corpus')
+sys.path.insert(0, os.path.join(ROOT, 'frontend', 'public'))
+
+import tracer  # noqa: E402
+
+
+def load_corpus():
+    programs = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith('.py'):
+            with open(os.path.join(CORPUS_DIR, name)) as f:
+                programs[name[:-3]] = f.read()
+    return programs
+
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--dump', help='directory to write <program>-<mode>.json/.bin files to')
+    args = parser.parse_args()
+    if args.dump:
+        os.makedirs(args.dump, exist_ok=True)
+
+    corpus = load_corpus()
+    width = max(len('program'), *map(len, corpus)) + 2 # Column for the longest program name
+    print(f"{'program':<{width}}{'mode':<7}{'json':>10}{'compact':>10}{'ratio':>7}"
+          f"{'json.gz':>10}{'cmp.gz':>9}{'loads ms':>10}{'decode ms':>11}")
+    for name, code in corpus.items():
+        for mode in ('full', 'delta'):
+            text = tracer.run_user_code(code, mode=mode)
+            steps = json.loads(text)
+            compact = tracer.encode_compact(steps)
+            raw = text.encode('utf-8')
+
+            loads = best_time(lambda: json.loads(text), args.repeat)
+            decode = best_time(lambda: tracer.decode_compact(compact), args.repeat)
+            print(f"{name:<{width}}{mode:<7}{len(raw):>10}{len(compact):>10}{len(raw) / len(compact):>7.1f}"
+                  f"{len(gzip.compress(raw)):>10}{len(gzip.compress(compact)):>9}"
+                  f"{loads * 1000:>10.2f}{decode * 1000:>11.2f}")
+
+            if args.dump:
+                with open(os.path.join(args.dump, f"{name}-{mode}.json"), 'wb') as f:
+                    f.write(raw)
+                with open(os.path.join(args.dump, f"{name}-{mode}.bin"), 'wb') as f:
+                    f.write(compact)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+// Times JSON.parse against decodeCompactTrace on files written by
+// `python benchmarks/trace_format.py --dump DIR`.
+//
+//     node benchmarks/trace_format_decode.mjs DIR [repeat]
+import { readFileSync, readdirSync } from 'node:fs';
+import { join } from 'node:path';
+import { decodeCompactTrace } from '../frontend/src/utils/compactTrace.js';
+
+const [dir, repeatArg = '20'] = process.argv.slice(2);
+const repeat = Number(repeatArg);
+
+const bestTime = (fn) => {
+  let best = Infinity;
+  for (let i = 0; i < repeat; i++) {
+    const start = performance.now();
+    fn();
+    best = Math.min(best, performance.now() - start);
+  }
+  return best;
+};
+
+console.log(`${'trace'.padEnd(22)}${'JSON.parse ms'.padStart(14)}${'compact ms'.padStart(12)}`);
+for (const name of readdirSync(dir).filter(f => f.endsWith('.json')).sort()) {
+  const base = name.slice(0, -'.json'.length);
+  const text = readFileSync(join(dir, name), 'utf8');
+  const compact = new Uint8Array(readFileSync(join(dir, `${base}.bin`)));
+
+  if (JSON.stringify(decodeCompactTrace(compact)) !== JSON.stringify(JSON.parse(text))) {
+    throw new Error(`${base}: compact trace does not match the JSON trace`);
+  }
+  const parseMs = bestTime(() => JSON.parse(text));
+  const decodeMs = bestTime(() => decodeCompactTrace(compact));
+  console.log(`${base.padEnd(22)}${parseMs.toFixed(2).padStart(14)}${decodeMs.toFixed(2).padStart(12)}`);
+}
@@ -0,0 +1,62 @@
+"""
+Compares the settrace and sys.monitoring tracer backends on the same programs.
+
+    python benchmarks/tracer_backends.py [--repeat N] [--mode full|delta]
+
+Reports recorded line events per second for each backend. The monitoring backend
+needs Python 3.12+; on older interpreters it is reported as unavailable.
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(ROOT, 'benchmarks', 'corpus')
+sys.path.insert(0, os.path.join(ROOT, 'frontend', 'public'))
+
+import tracer  # noqa: E402
+
+
+def load_corpus():
+    programs = {}
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if name.endswith('.py'):
+            with open(os.path.join(CORPUS_DIR, name)) as f:
+                programs[name[:-3]] = f.read()
+    return programs
+
+
+def bench(code, backend, mode, repeat):
+    best = None
+    events = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tracer.run_user_code(code, mode=mode, backend=backend)
+        elapsed = time.perf_counter() - start
+        events = sum(1 for step in tracer.execution_trace if 'event' not in step)
+        best = elapsed if best is None else min(best, elapsed)
+    return events, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--mode', default='full', choices=['full', 'delta'])
+    args = parser.parse_args()
+
+    backends = ['settrace']
+    if tracer.monitoring_available():
+        backends.append('monitoring')
+    else:
+        print(f"sys.monitoring not available on Python {sys.version.split()[0]}, benchmarking settrace only")
+
+    print(f"{'program':<16}{'backend':<12}{'events':>8}{'seconds':>10}{'events/s':>12}")
+    for name, code in load_corpus().items():
+        for backend in backends:
+            events, elapsed = bench(code, backend, args.mode, args.repeat)
+            print(f"{name:<16}{backend:<12}{events:>8}{elapsed:>10.4f}{events / elapsed:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
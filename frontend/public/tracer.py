@@ -1,82 +1,1225 @@
 import sys
+import os
+import re
+import dis
 import json
+import time
+import types
+import queue
+import struct
+import hashlib
+import builtins
+from contextlib import contextmanager
+from itertools import islice
+from operator import is_
 from io import StringIO
 import ast
 
 # --- 1. TRACING LOGIC (This was missing) ---
 execution_trace = []
 
+# In 'delta' mode only the first step (and every KEYFRAME_INTERVAL-th step after it)
+# is a full snapshot. Every other step only records what changed since the step before.
+KEYFRAME_INTERVAL = 50
+
+_object_ids = None
+_heap_encoder = None
+_delta_encoder = None
+_budget = None
+_sampler = None
+_on_batch = None
+_batch_size = None
+_batch_encoder = json.dumps
+_batches_sent = 0
+_module_code = None # The compiled user program; snapshots stop at its frame
+_expansion = None # (step, ref, offset, limit) while expand_object re-runs a program
+_replay = None # The Replay of a record_replay / replay_steps run
+
+# Limits and sampling options accepted by run_user_code. Limits end the trace with a
+# {"event": "truncated"} step; sampling options decide which line events are recorded.
+TRACE_DEFAULTS = {
+    'max_steps': 10000,                   # recorded snapshots
+    'max_trace_bytes': 50 * 1024 * 1024,  # JSON size of the recorded snapshots
+    'time_limit': 10.0,                   # wall-clock seconds for the whole run
+    'every_nth': 1,                       # record every Nth eligible line event
+    'max_loop_iterations': None,          # record only the first K iterations of each loop
+    'line_ranges': None,                  # e.g. [[3, 10], [20, 25]] (inclusive)
+    'functions': None,                    # e.g. ['merge_sort'] ('<module>' for top level)
+    'max_items': 100,                     # elements shown per list/tuple/dict (expand_object for the rest)
+    'max_depth': 8,                       # container nesting below a local before it is collapsed
+}
+
+class ObjectRegistry:
+    """
+    Hands out small, stable ids for heap objects. Raw id() values get reused once
+    an object is freed, so we hold on to every object we have numbered until
+    release() lets go of the ones that are no longer on the heap. A numbered object
+    therefore can't be freed while its id() is in the table, and ids are never
+    handed out twice: an object that turns up again after a release (or a new object
+    that got a released id()) gets a new number.
+    """
+    def __init__(self):
+        self._ids = {} # id(value) -> object id
+        self._objects = {} # object id -> value
+        self._next_id = 1 # Starts at 1 so a ref is never falsy in JS
+
+    def get(self, value):
+        key = id(value)
+        object_id = self._ids.get(key)
+        if object_id is None:
+            object_id = self._next_id
+            self._next_id += 1
+            self._ids[key] = object_id
+            self._objects[object_id] = value
+        return object_id
+
+    def object(self, object_id):
+        return self._objects[object_id]
+
+    def release(self, keep):
+        """Forgets (and stops keeping alive) every object whose id is not in `keep`."""
+        self._objects = {k: v for k, v in self._objects.items() if k in keep}
+        self._ids = {id(v): k for k, v in self._objects.items()}
+
+CONTAINER_TYPES = (list, tuple, dict)
+
+# Element types whose repr can only change by rebinding, never in place
+SCALAR_TYPES = (int, float, complex, str, bytes, bool, type(None))
+
+# Opcodes that can mutate an existing container (directly or by running arbitrary
+# code). A line without any of these cannot change what is already on the heap.
+MUTATING_OPNAMES = {
+    'STORE_SUBSCR', 'DELETE_SUBSCR', 'STORE_SLICE', 'DELETE_SLICE', 'STORE_ATTR', 'DELETE_ATTR',
+    'CALL', 'CALL_KW', 'CALL_FUNCTION', 'CALL_FUNCTION_KW', 'CALL_FUNCTION_EX', 'CALL_METHOD',
+    'PRECALL', 'CALL_INTRINSIC_1', 'CALL_INTRINSIC_2', 'IMPORT_NAME', 'IMPORT_STAR',
+    'FOR_ITER', 'UNPACK_SEQUENCE', 'UNPACK_EX', 'SEND', 'YIELD_VALUE',
+}
+
+class HeapEncoder:
+    """
+    Serializes lists/tuples/dicts into heap entries and remembers each entry, so a
+    container that did not change since the last snapshot reuses its previous
+    encoding instead of being re-walked element by element.
+
+    Entries are bounded: only the first `max_items` elements are encoded, and a
+    container more than `max_depth` levels below a local is collapsed to no elements
+    at all. Either way the entry gets "hidden": <elements left out>, e.g.
+        {"type": "list", "value": [{"value": "0"}, ...100 items], "hidden": 99900}
+    and expand_object fetches the rest when the user asks for it.
+
+    Change detection is two-tiered:
+    * observe() looks at the bytecode of the line that just ran. If it stayed in the
+      same frame and had no mutating opcodes, every cached entry is reused as-is (O(1)).
+    * Otherwise a cached entry is reused when the container still has the same length
+      and its shown elements are the very same objects (a C-level identity comparison,
+      no repr calls). Only exact list/tuple/dict types holding scalars or other
+      containers qualify.
+    """
+    def __init__(self, object_ids, max_items=None, max_depth=None, release_interval=None):
+        self.object_ids = object_ids
+        self.max_items = max_items
+        self.max_depth = max_depth
+        self.release_interval = release_interval
+        self.snapshots = 0
+        self.dirty = True
+        self.trust_cache = False
+        self._cache = {} # id -> (length, items, encoded, children, checkable)
+        self._depths = {} # id -> shallowest depth encoded at in the current snapshot
+        self._mutating_lines = {}
+        self._last_frame = None
+        self._last_line = None
+
+    def mutating_lines(self, code):
+        """Line numbers of `code` with a mutating opcode, or None if we cannot tell."""
+        if code in self._mutating_lines:
+            return self._mutating_lines[code]
+
+        lines = set()
+        for instruction in dis.get_instructions(code):
+            positions = getattr(instruction, 'positions', None)
+            is_mutating = (instruction.opname in MUTATING_OPNAMES
+                           or instruction.opname.startswith('INPLACE_')
+                           or (instruction.opname == 'BINARY_OP' and instruction.argrepr.endswith('=')))
+            if is_mutating:
+                if positions is None or positions.lineno is None:
+                    lines = None
+                    break
+                lines.add(positions.lineno)
+
+        self._mutating_lines[code] = lines
+        return lines
+
+    def observe(self, frame):
+        """Called on every line event, recorded or not."""
+        if self._last_frame is not frame:
+            self.dirty = True
+        else:
+            lines = self.mutating_lines(frame.f_code)
+            if lines is None or self._last_line in lines:
+                self.dirty = True
+        self._last_frame = frame
+        self._last_line = frame.f_lineno
+
+    def begin_snapshot(self):
+        self.trust_cache = not self.dirty
+        self.dirty = False
+        self._depths = {}
+
+    def end_snapshot(self, heap):
+        # Every release_interval snapshots (the keyframes, in delta mode) let go of
+        # the objects this one doesn't show, so the user's garbage can be freed
+        if self.release_interval and self.snapshots % self.release_interval == 0:
+            self.object_ids.release(heap)
+            self._cache = {k: v for k, v in self._cache.items() if k in heap}
+        # Forget entries for objects that are no longer reachable, amortized
+        elif len(self._cache) > 2 * len(heap) + 64:
+            self._cache = {k: v for k, v in self._cache.items() if k in heap}
+        self.snapshots += 1
+
+    def encode(self, value, heap, depth=1):
+        """
+        Recursively process values. If it's a complex object, add it to the
+        heap and return a reference ID. Otherwise, return its representation.
+        `depth` is how many containers deep `value` sits, 1 for a local variable.
+        """
+        if isinstance(value, CONTAINER_TYPES):
+            value_id = self.object_ids.get(value)
+            # Met again closer to a local than before: its collapsed children may now fit
+            if value_id not in heap or depth < self._depths[value_id]:
+                self._depths[value_id] = depth
+                if self.max_depth is not None and depth > self.max_depth:
+                    heap[value_id] = {"type": type(value).__name__, "value": {} if isinstance(value, dict) else [], "hidden": len(value)}
+                else:
+                    self._encode_container(value_id, value, heap, depth)
+            return {"ref": value_id}
+
+        # For primitives, just return their string representation
+        return {"value": repr(value)}
+
+    def _encode_container(self, value_id, value, heap, depth):
+        length = len(value)
+        cached = self._cache.get(value_id)
+        if cached is not None:
+            cached_length, items, encoded, children, checkable = cached
+            if checkable and (self.trust_cache or (length == cached_length and self._same_items(value, items))):
+                heap[value_id] = encoded
+                for child in children:
+                    self.encode(child, heap, depth + 1)
+                return
+
+        heap[value_id] = None # Placeholder so self-referencing containers terminate
+        shown = length if self.max_items is None else min(length, self.max_items)
+        if isinstance(value, dict):
+            keys = tuple(islice(value, shown))
+            values = tuple(islice(value.values(), shown))
+            items = (keys, values)
+            encoded = {"type": 'dict', "value": {repr(k): self.encode(v, heap, depth + 1) for k, v in zip(keys, values)}}
+            elements = keys + values
+        else:
+            items = elements = tuple(islice(value, shown))
+            encoded = {"type": type(value).__name__, "value": [self.encode(v, heap, depth + 1) for v in items]}
+        if shown < length:
+            encoded["hidden"] = length - shown
+
+        children = [v for v in elements if isinstance(v, CONTAINER_TYPES)]
+        checkable = type(value) in CONTAINER_TYPES and all(
+            type(v) in SCALAR_TYPES or isinstance(v, CONTAINER_TYPES) for v in elements
+        )
+        heap[value_id] = encoded
+        self._cache[value_id] = (length, items, encoded, children, checkable)
+
+    def encode_range(self, value, offset=0, limit=None):
+        """
+        Encodes elements [offset, offset + limit) of a container (to the end for
+        limit=None) for expand_object. Returns (entry, heap) where heap holds the
+        containers those elements point to, bounded as in a snapshot.
+        """
+        heap = {}
+        self._depths = {}
+        end = None if limit is None else offset + limit
+        if isinstance(value, dict):
+            pairs = list(islice(value.items(), offset, end))
+            entry = {"type": 'dict', "value": {repr(k): self.encode(v, heap, 2) for k, v in pairs}}
+        else:
+            pairs = list(islice(value, offset, end))
+            entry = {"type": type(value).__name__, "value": [self.encode(v, heap, 2) for v in pairs]}
+        if offset:
+            entry["offset"] = offset
+        if offset + len(pairs) < len(value): # Only the elements after this page are hidden
+            entry["hidden"] = len(value) - offset - len(pairs)
+        return entry, heap
+
+    @staticmethod
+    def _same_items(value, items):
+        # Lengths already match; `items` are the first elements, the ones that were shown
+        if isinstance(value, dict):
+            keys, values = items
+            return all(map(is_, value, keys)) and all(map(is_, value.values(), values))
+        return all(map(is_, value, items))
+
+def build_snapshot(frame):
+    """Builds the full stack + heap snapshot for the line `frame` is about to run."""
+    heap = {}
+    _heap_encoder.begin_snapshot()
+
+    # Stack Processing
+    call_stack = []
+    current_frame = frame
+    while current_frame:
+        # Only trace frames that are part of the user's code (executed from '<string>')
+        if current_frame.f_code.co_filename == '<string>':
+            func_name = current_frame.f_code.co_name or "<module>"
+
+            # Filter out internal variables and format the rest
+            formatted_locals = {
+                k: _heap_encoder.encode(v, heap) for k, v in current_frame.f_locals.items()
+                if not k.startswith('__')
+            }
+
+            call_stack.append({
+                "func_name": func_name,
+                "lineno": current_frame.f_lineno,
+                "locals": formatted_locals
+            })
+            # Anything further out (e.g. a `python -c` host process) isn't the user's code
+            if current_frame.f_code is _module_code:
+                break
+        current_frame = current_frame.f_back
+
+    call_stack.reverse()
+    _heap_encoder.end_snapshot(heap)
+
+    # Final Snapshot
+    return {
+        'line_number': frame.f_lineno,
+        'stack': call_stack,
+        'heap': heap
+    }
+
+class DeltaEncoder:
+    """
+    Turns a sequence of full snapshots into keyframes + deltas.
+
+    A keyframe is a full snapshot with "keyframe": true. A delta step looks like
+    {"line_number": n, "delta": {"stack": [...], "heap": {...}, "heap_removed": [...]}}
+    where each stack entry is null (frame unchanged), a full frame with "reset": true
+    (new or different function at that depth), or {"lineno", "locals", "removed"}
+    listing only the locals that changed. The frontend rebuilds any step by applying
+    deltas forward from the nearest keyframe (see utils/traceDecoder.js).
+    """
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.previous = None
+        self.since_keyframe = 0
+
+    def encode(self, snapshot):
+        previous = self.previous
+        self.previous = snapshot
+
+        if previous is None or self.since_keyframe >= self.keyframe_interval:
+            self.since_keyframe = 1
+            return dict(snapshot, keyframe=True)
+
+        self.since_keyframe += 1
+        return {
+            'line_number': snapshot['line_number'],
+            'delta': {
+                'stack': self._diff_stack(previous['stack'], snapshot['stack']),
+                # Unchanged heap entries are usually the very same (shared) dict, so check identity first
+                'heap': {k: v for k, v in snapshot['heap'].items()
+                         if previous['heap'].get(k) is not v and previous['heap'].get(k) != v},
+                'heap_removed': [k for k in previous['heap'] if k not in snapshot['heap']],
+            }
+        }
+
+    def _diff_stack(self, old_stack, new_stack):
+        frames = []
+        for index, frame in enumerate(new_stack):
+            old = old_stack[index] if index < len(old_stack) else None
+            if old is None or old['func_name'] != frame['func_name']:
+                frames.append(dict(frame, reset=True))
+                continue
+
+            changed = {k: v for k, v in frame['locals'].items() if old['locals'].get(k) != v}
+            removed = [k for k in old['locals'] if k not in frame['locals']]
+            if not changed and not removed and old['lineno'] == frame['lineno']:
+                frames.append(None)
+                continue
+
+            entry = {'lineno': frame['lineno'], 'locals': changed}
+            if removed:
+                entry['removed'] = removed
+            frames.append(entry)
+        return frames
+
+class TraceLimitReached(BaseException):
+    """
+    Raised from inside the tracer to stop the user's program. It derives from
+    BaseException so an `except Exception` in the user's code does not swallow it.
+    """
+    def __init__(self, reason, limit, line_number):
+        super().__init__(reason)
+        self.event = {
+            'event': 'truncated',
+            'reason': reason,
+            'limit': limit,
+            'line_number': line_number,
+        }
+
+class TracingDone(BaseException):
+    """Stops the user's program once expand_object or replay_steps has what it needs."""
+    def __init__(self, result=None):
+        super().__init__('done')
+        self.result = result
+
+class TraceBudget:
+    """
+    Enforces max_steps, max_trace_bytes and time_limit. They are checked whenever a
+    line runs, including every pass of a loop written on one line (see loop_jumps),
+    so pure Python can't run past them. A single long call into C code (e.g.
+    sum(range(10 ** 12))) is never interrupted, though; only killing the process
+    that runs it stops it.
+    """
+    def __init__(self, max_steps=None, max_trace_bytes=None, time_limit=None):
+        self.max_steps = max_steps
+        self.max_trace_bytes = max_trace_bytes
+        self.time_limit = time_limit
+        self.deadline = time.monotonic() + time_limit if time_limit else None
+        self.steps = 0
+        self.trace_bytes = 0
+
+    def check_time(self, frame):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TraceLimitReached('time_limit', self.time_limit, frame.f_lineno)
+
+    def check_steps(self, frame):
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            raise TraceLimitReached('max_steps', self.max_steps, frame.f_lineno)
+
+    def charge(self, snapshot, frame):
+        if self.max_trace_bytes is not None:
+            size = len(json.dumps(snapshot))
+            if self.trace_bytes + size > self.max_trace_bytes:
+                raise TraceLimitReached('max_trace_bytes', self.max_trace_bytes, frame.f_lineno)
+            self.trace_bytes += size
+        self.steps += 1
+
+class StepSampler:
+    """
+    Decides which line events get recorded: every Nth one, only inside the selected
+    line ranges / functions, and only during the first K iterations of each loop.
+    """
+    def __init__(self, code_string, every_nth=1, max_loop_iterations=None, line_ranges=None, functions=None):
+        self.every_nth = max(1, every_nth)
+        self.max_loop_iterations = max_loop_iterations
+        self.line_ranges = [tuple(r) for r in line_ranges] if line_ranges else None
+        self.functions = set(functions) if functions else None
+        self.eligible = 0
+
+        self.loops = []
+        self._enclosing = {}
+        self._counters = {} # frame -> {loop index: iterations started}
+        if max_loop_iterations is not None:
+            for node in ast.walk(ast.parse(code_string)):
+                if isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+                    self.loops.append((node.lineno, node.end_lineno))
+
+    def enclosing_loops(self, line):
+        loops = self._enclosing.get(line)
+        if loops is None:
+            loops = self._enclosing[line] = [
+                index for index, (start, end) in enumerate(self.loops) if start <= line <= end
+            ]
+        return loops
+
+    def _within_loop_budget(self, frame):
+        line = frame.f_lineno
+        enclosing = self.enclosing_loops(line)
+        counters = self._counters.setdefault(frame, {})
+
+        # Leaving a loop (or starting a new pass of its parent) resets its count
+        for index in [i for i in counters if i not in enclosing]:
+            del counters[index]
+
+        within = True
+        for index in enclosing:
+            if self.loops[index][0] == line:
+                # The header line runs once per iteration, plus once more to exit
+                counters[index] = counters.get(index, 0) + 1
+            if counters.get(index, 0) > self.max_loop_iterations:
+                within = False
+        return within
+
+    def frame_exited(self, frame):
+        self._counters.pop(frame, None)
+
+    def should_record(self, frame):
+        # Loop counters have to see every event, even ones the other filters drop
+        if self.loops and not self._within_loop_budget(frame):
+            return False
+
+        if self.functions is not None and (frame.f_code.co_name or '<module>') not in self.functions:
+            return False
+
+        if self.line_ranges is not None:
+            line = frame.f_lineno
+            if not any(start <= line <= end for start, end in self.line_ranges):
+                return False
+
+        self.eligible += 1
+        return (self.eligible - 1) % self.every_nth == 0
+
+def record_step(frame):
+    _heap_encoder.observe(frame)
+    _budget.check_time(frame)
+    if _sampler is not None and not _sampler.should_record(frame):
+        return
+
+    _budget.check_steps(frame)
+    if _replay is not None:
+        _replay.step(frame)
+        return
+    snapshot = build_snapshot(frame)
+    if _expansion is not None:
+        expand_at_step(snapshot)
+        return
+    if _delta_encoder is not None:
+        snapshot = _delta_encoder.encode(snapshot)
+    _budget.charge(snapshot, frame)
+    emit(snapshot)
+
+def expand_at_step(snapshot):
+    step, ref, offset, limit = _expansion
+    if _budget.steps < step:
+        _budget.steps += 1
+        return
+    if ref not in snapshot['heap']:
+        raise TracingDone(None)
+    entry, heap = _heap_encoder.encode_range(_object_ids.object(ref), offset, limit)
+    heap[ref] = entry
+    raise TracingDone({'step': step, 'ref': ref, 'heap': heap})
+
+def emit(step):
+    execution_trace.append(step)
+    # The first batch holds a single step so the page can draw something right away
+    if _on_batch is not None and len(execution_trace) >= (_batch_size if _batches_sent else 1):
+        flush_batch()
+
+def flush_batch():
+    """Hands the buffered steps to the streaming callback and starts a new buffer."""
+    global execution_trace, _batches_sent
+    if execution_trace:
+        batch = _batch_encoder(execution_trace)
+        execution_trace = []
+        _batches_sent += 1
+        _on_batch(batch)
+
+# --- Tracer backends ---
+# 'settrace' works everywhere (including Pyodide). 'monitoring' uses sys.monitoring
+# (PEP 669, Python 3.12+) and only subscribes to LINE events for the user's own code
+# objects, so calls into the stdlib or builtins cost nothing extra.
+#
+# A loop written on one line (`for i in xs: total += i`, comprehensions) gets no LINE
+# events under sys.monitoring, since the line number never changes; settrace reports
+# each backward jump as a line event, except a jump to itself (`while True: pass`).
+# Those jumps are watched separately and each pass counts as the line running again,
+# the same step settrace records for any other loop. Without that such a loop would
+# never reach the step and time limits.
+
+_loop_jumps = {}
+
+def loop_jumps(code):
+    """
+    (jumps, self_jumps): offsets of the backward jumps in `code` whose whole loop is
+    on one line, and the ones among them that jump to themselves.
+    """
+    jumps = _loop_jumps.get(code)
+    if jumps is None:
+        starts = {offset: line for offset, line in dis.findlinestarts(code) if line is not None}
+        lines = {}
+        line = None
+        for instruction in dis.get_instructions(code):
+            line = lines[instruction.offset] = starts.get(instruction.offset, line)
+        targets = {}
+        for instruction in dis.get_instructions(code):
+            target = instruction.argval
+            if (instruction.opcode in dis.hasjrel or instruction.opcode in dis.hasjabs) \
+                    and isinstance(target, int) and target <= instruction.offset:
+                body = [line for offset, line in lines.items() if target <= offset <= instruction.offset]
+                if body and all(line == body[0] for line in body):
+                    targets[instruction.offset] = target
+        jumps = _loop_jumps[code] = (
+            frozenset(targets),
+            frozenset(offset for offset, target in targets.items() if offset == target),
+        )
+    return jumps
+
 def trace_function(frame, event, arg):
+    # Returning None for frames outside the user's code turns off local tracing for them
+    if frame.f_code.co_filename != '<string>':
+        return None
+
     if event == 'line':
-        # Data Gathering
+        record_step(frame)
+    elif event == 'opcode':
+        if frame.f_lasti in loop_jumps(frame.f_code)[1]:
+            record_step(frame)
+    elif event == 'call':
+        # Opcode events cost one call per instruction, so only where they are needed
+        if loop_jumps(frame.f_code)[1]:
+            frame.f_trace_opcodes = True
+    elif event == 'return' and _sampler is not None:
+        _sampler.frame_exited(frame)
+
+    return trace_function
+
+MONITORING_TOOL_NAME = 'trace-view'
+
+def monitoring_available():
+    return hasattr(sys, 'monitoring')
+
+def iter_code_objects(code):
+    """Yields `code` and every function/class/comprehension body compiled inside it."""
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from iter_code_objects(const)
+
+def _on_monitored_line(code, line_number):
+    # The monitored frame is the one that called into this callback
+    record_step(sys._getframe(1))
+
+def _on_monitored_return(code, instruction_offset, retval):
+    if _sampler is not None:
+        _sampler.frame_exited(sys._getframe(1))
+
+def _on_monitored_jump(code, instruction_offset, destination_offset):
+    if instruction_offset not in loop_jumps(code)[0]:
+        return sys.monitoring.DISABLE # Not a one-line loop; never report this jump again
+    record_step(sys._getframe(1))
+
+def start_monitoring(compiled_code):
+    """
+    Subscribes to LINE events for the user's code objects. Returns False (and leaves
+    nothing registered) when the debugger tool id is already taken.
+    """
+    monitoring = sys.monitoring
+    tool_id = monitoring.DEBUGGER_ID
+    try:
+        monitoring.use_tool_id(tool_id, MONITORING_TOOL_NAME)
+    except ValueError:
+        return False
+
+    events = monitoring.events.LINE
+    monitoring.register_callback(tool_id, monitoring.events.LINE, _on_monitored_line)
+    if _sampler is not None and _sampler.loops:
+        events |= monitoring.events.PY_RETURN
+        monitoring.register_callback(tool_id, monitoring.events.PY_RETURN, _on_monitored_return)
+
+    jump_events = monitoring.events.JUMP | monitoring.events.BRANCH
+    monitoring.register_callback(tool_id, monitoring.events.JUMP, _on_monitored_jump)
+    monitoring.register_callback(tool_id, monitoring.events.BRANCH, _on_monitored_jump)
+    for code in iter_code_objects(compiled_code):
+        monitoring.set_local_events(tool_id, code, events | jump_events if loop_jumps(code)[0] else events)
+    return True
+
+def stop_monitoring(compiled_code):
+    monitoring = sys.monitoring
+    tool_id = monitoring.DEBUGGER_ID
+    for code in iter_code_objects(compiled_code):
+        monitoring.set_local_events(tool_id, code, monitoring.events.NO_EVENTS)
+    monitoring.register_callback(tool_id, monitoring.events.LINE, None)
+    monitoring.register_callback(tool_id, monitoring.events.PY_RETURN, None)
+    monitoring.register_callback(tool_id, monitoring.events.JUMP, None)
+    monitoring.register_callback(tool_id, monitoring.events.BRANCH, None)
+    monitoring.free_tool_id(tool_id)
+
+# --- Compact binary trace format ---
+# An optional alternative to JSON that stores every string once. Layout (integers are
+# unsigned LEB128 varints unless noted):
+#   b"TVC1"
+#   string table: count, then (UTF-8 byte length, bytes) for each string
+#   step count N, zero padding to a 4-byte boundary, then N little-endian int32 line
+#   numbers (COMPACT_NO_LINE when a step has no line_number)
+#   N step values, each encoded without its line_number key
+# A value is a tag byte followed by its payload (see the COMPACT_* tags below).
+# backend/trace_format.py loads this encoder from here rather than keeping its own;
+# frontend/src/utils/compactTrace.js reads the format, keep the two in sync.
+COMPACT_MAGIC = b'TVC1'
+COMPACT_NO_LINE = -2 ** 31
+(COMPACT_NULL, COMPACT_FALSE, COMPACT_TRUE, COMPACT_INT, COMPACT_FLOAT, COMPACT_STR,
+ COMPACT_ARRAY, COMPACT_OBJECT, COMPACT_VALUE, COMPACT_REF, COMPACT_FRAME) = range(11)
+FRAME_KEYS = ('func_name', 'lineno', 'locals')
+MAX_SAFE_INT = 2 ** 53 # Largest integer a JS number holds exactly
+
+def _write_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def encode_compact(steps):
+    """Encodes a list of trace steps into the compact binary format."""
+    strings = {}
+    body = bytearray()
+
+    def intern(text):
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        _write_varint(body, index)
+
+    def encode(value):
+        if value is None:
+            body.append(COMPACT_NULL)
+        elif value is True or value is False:
+            body.append(COMPACT_TRUE if value else COMPACT_FALSE)
+        elif isinstance(value, int) and -MAX_SAFE_INT < value < MAX_SAFE_INT:
+            body.append(COMPACT_INT)
+            _write_varint(body, value * 2 if value >= 0 else -value * 2 - 1) # zigzag
+        elif isinstance(value, (int, float)):
+            body.append(COMPACT_FLOAT)
+            body.extend(struct.pack('<d', value))
+        elif isinstance(value, str):
+            body.append(COMPACT_STR)
+            intern(value)
+        elif isinstance(value, (list, tuple)):
+            body.append(COMPACT_ARRAY)
+            _write_varint(body, len(value))
+            for item in value:
+                encode(item)
+        elif isinstance(value, dict):
+            # Shortcuts for the shapes that make up most of a trace
+            if len(value) == 1 and isinstance(value.get('value'), str):
+                body.append(COMPACT_VALUE)
+                intern(value['value'])
+            elif len(value) == 1 and isinstance(value.get('ref'), int) and value['ref'] >= 0:
+                body.append(COMPACT_REF)
+                _write_varint(body, value['ref'])
+            elif tuple(value) == FRAME_KEYS and isinstance(value['func_name'], str) and isinstance(value['lineno'], int) and value['lineno'] >= 0:
+                body.append(COMPACT_FRAME)
+                intern(value['func_name'])
+                _write_varint(body, value['lineno'])
+                encode(value['locals'])
+            else:
+                body.append(COMPACT_OBJECT)
+                _write_varint(body, len(value))
+                for key, item in value.items():
+                    intern(str(key)) # JSON turns keys (e.g. heap ids) into strings too
+                    encode(item)
+        else:
+            raise TypeError(f"Cannot encode {type(value).__name__} in a compact trace")
+
+    lines = []
+    for step in steps:
+        line = step.get('line_number')
+        lines.append(line if isinstance(line, int) else COMPACT_NO_LINE)
+        encode({k: v for k, v in step.items() if k != 'line_number'} if isinstance(line, int) else step)
+
+    out = bytearray(COMPACT_MAGIC)
+    _write_varint(out, len(strings))
+    for text in strings: # dicts keep insertion order, which is the index order
+        raw = text.encode('utf-8')
+        _write_varint(out, len(raw))
+        out.extend(raw)
+    _write_varint(out, len(steps))
+    out.extend(b'\0' * (-len(out) % 4))
+    out.extend(struct.pack(f'<{len(lines)}i', *lines))
+    out.extend(body)
+    return bytes(out)
+
+def decode_compact(data):
+    """Decodes the compact binary format back into a list of trace steps."""
+    if data[:4] != COMPACT_MAGIC:
+        raise ValueError("Not a compact trace")
+    pos = 4
+    count, pos = _read_varint(data, pos)
+    strings = []
+    for _ in range(count):
+        length, pos = _read_varint(data, pos)
+        strings.append(data[pos:pos + length].decode('utf-8'))
+        pos += length
+    step_count, pos = _read_varint(data, pos)
+    pos += -pos % 4
+    lines = struct.unpack_from(f'<{step_count}i', data, pos)
+    pos += 4 * step_count
+
+    def decode(pos):
+        tag = data[pos]
+        pos += 1
+        if tag == COMPACT_NULL:
+            return None, pos
+        if tag == COMPACT_FALSE:
+            return False, pos
+        if tag == COMPACT_TRUE:
+            return True, pos
+        if tag == COMPACT_INT:
+            n, pos = _read_varint(data, pos)
+            return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+        if tag == COMPACT_FLOAT:
+            return struct.unpack_from('<d', data, pos)[0], pos + 8
+        if tag == COMPACT_STR:
+            index, pos = _read_varint(data, pos)
+            return strings[index], pos
+        if tag == COMPACT_ARRAY:
+            length, pos = _read_varint(data, pos)
+            items = []
+            for _ in range(length):
+                item, pos = decode(pos)
+                items.append(item)
+            return items, pos
+        if tag == COMPACT_OBJECT:
+            length, pos = _read_varint(data, pos)
+            obj = {}
+            for _ in range(length):
+                index, pos = _read_varint(data, pos)
+                obj[strings[index]], pos = decode(pos)
+            return obj, pos
+        if tag == COMPACT_VALUE:
+            index, pos = _read_varint(data, pos)
+            return {'value': strings[index]}, pos
+        if tag == COMPACT_REF:
+            ref, pos = _read_varint(data, pos)
+            return {'ref': ref}, pos
+        if tag == COMPACT_FRAME:
+            index, pos = _read_varint(data, pos)
+            lineno, pos = _read_varint(data, pos)
+            local_vars, pos = decode(pos)
+            return {'func_name': strings[index], 'lineno': lineno, 'locals': local_vars}, pos
+        raise ValueError(f"Unknown compact tag {tag}")
+
+    steps = []
+    for line in lines:
+        step, pos = decode(pos)
+        if line != COMPACT_NO_LINE:
+            step = {'line_number': line, **step}
+        steps.append(step)
+    return steps
+
+# --- Record / replay ---
+# For traces too long to keep every snapshot: record_replay runs the program once and
+# keeps only a log of what it read from nondeterministic sources plus a small checkpoint
+# every CHECKPOINT_INTERVAL steps, and replay_steps rebuilds any window of steps from it.
+# CPython cannot resume a program from a saved frame stack, so a replay always runs the
+# program again from its first line: steps before the window are only counted (no
+# snapshots), and each checkpoint on the way is compared with the recording so a run
+# that went differently is reported instead of shown. A window is only returned once
+# the first checkpoint after it also matched, or, near the end, once the program
+# ended in the recorded state.
+CHECKPOINT_INTERVAL = 1000
+
+# Reprs that embed an address (functions, plain objects) differ on every run
+ADDRESS_PATTERN = re.compile(r' at 0x[0-9a-fA-F]+')
+# Set and dict order for strings follows the process's hash seed (PYTHONHASHSEED), so
+# a recording only replays in a process whose hash of this string is the recorded one
+HASH_PROBE = 'trace-view'
+
+class ReplayDiverged(BaseException):
+    """
+    The replayed program did not do what the recording says. A BaseException so the
+    user's `except Exception` around an input() call cannot swallow it.
+    """
+
+class InputLog:
+    """
+    Records what the user's program gets from nondeterministic sources (the clock,
+    os.urandom, input()) and hands the same values back, in order, on replay. The
+    random module is seeded instead of logged call by call. Entries are
+    [source, value] or [source, None, error type, message] for a call that raised,
+    with bytes stored as hex so the log stays JSON.
+    """
+    SOURCES = ((time, 'time'), (time, 'time_ns'), (os, 'urandom'), (builtins, 'input'))
+
+    def __init__(self, seed=None, entries=None):
+        self.replaying = entries is not None
+        self.seed = seed if seed is not None else int.from_bytes(os.urandom(8), 'little')
+        self.entries = entries if entries is not None else []
+        self.position = 0
+
+    @property
+    def count(self):
+        return self.position if self.replaying else len(self.entries)
+
+    @contextmanager
+    def installed(self):
+        import random
+        saved_state = random.getstate()
+        random.seed(self.seed)
+        originals = [(module, name, getattr(module, name)) for module, name in self.SOURCES]
+        for module, name, original in originals:
+            setattr(module, name, self._wrap(f'{module.__name__}.{name}', original))
+        try:
+            yield self
+        finally:
+            for module, name, original in originals:
+                setattr(module, name, original)
+            random.setstate(saved_state)
+
+    def _wrap(self, source, fn):
+        def recorded(*args, **kwargs):
+            if self.replaying:
+                return self._next(source)
+            try:
+                value = fn(*args, **kwargs)
+            except Exception as e:
+                self.entries.append([source, None, type(e).__name__, str(e)])
+                raise
+            self.entries.append([source, value.hex() if isinstance(value, bytes) else value])
+            return value
+        return recorded
+
+    def _next(self, source):
+        entry = self.entries[self.position] if self.position < len(self.entries) else None
+        if entry is None or entry[0] != source:
+            recorded = entry[0] if entry else 'nothing'
+            raise ReplayDiverged(f"The program called {source} where the recording has {recorded}")
+        self.position += 1
+        if len(entry) > 2:
+            error = getattr(builtins, entry[2], None)
+            if not (isinstance(error, type) and issubclass(error, Exception)):
+                error = RuntimeError
+            raise error(entry[3])
+        return bytes.fromhex(entry[1]) if source == 'os.urandom' else entry[1]
+
+class Replay:
+    """
+    Per-run state for record_step while recording (checkpoints=None) or replaying
+    steps [start, end) against a recording's checkpoints.
+
+    A checkpoint is {"step", "line_number", "inputs": log entries read so far,
+    "globals": digest of the module's variables}. The digest covers the same bounded
+    encoding a snapshot uses, with addresses taken out of reprs. The closing state
+    (see close) has the same shape, taken once the program has ended, and its digest
+    also covers the output / error events.
+
+    A replay stops at the first checkpoint at or after `end`, so the steps on both
+    sides of the window are checked, or at `stop` when the recorded run was cut short
+    and there is no closing state to check against.
+    """
+    def __init__(self, log, checkpoint_interval, options, checkpoints=None, start=0, end=0,
+                 closing=None, stop=None):
+        self.log = log
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        self.recorded = checkpoints
+        self.recorded_closing = closing
+        self.checkpoints = []
+        self.start = start
+        self.end = end
+        self.stop = stop
+        self.steps = 0
+        self.globals = {} # The program's module namespace, once it has run a step
+        # Its own registry, so checkpoints don't shift the ids the window's snapshots get
+        self.encoder = HeapEncoder(ObjectRegistry(), options.get('max_items'), options.get('max_depth'), 1)
+
+    def step(self, frame):
+        step = self.steps
+        self.globals = frame.f_globals # The user's functions share the module's globals
+        if step % self.checkpoint_interval == 0:
+            self.checkpoint(step, frame)
+            if self.recorded is not None and step >= self.end:
+                raise TracingDone()
+        if self.recorded is not None and self.stop is not None and step >= self.stop:
+            raise TracingDone()
+        if self.start <= step < self.end:
+            snapshot = build_snapshot(frame)
+            if _delta_encoder is not None:
+                snapshot = _delta_encoder.encode(snapshot)
+            emit(snapshot)
+        self.steps += 1
+        _budget.steps += 1
+
+    def digest(self, *extra):
         heap = {}
-        
-        def format_value(value):
-            """
-            Recursively process values. If it's a complex object, add it to the
-            heap and return a reference ID. Otherwise, return its representation.
-            """
-            value_id = id(value)
-            
-            # For lists, tuples, and dicts, add them to the heap
-            if isinstance(value, (list, tuple, dict)):
-                if value_id not in heap:
-                    if isinstance(value, (list, tuple)):
-                        heap[value_id] = {"type": type(value).__name__, "value": [format_value(v) for v in value]}
-                    elif isinstance(value, dict):
-                         heap[value_id] = {"type": 'dict', "value": {repr(k): format_value(v) for k,v in value.items()}}
-                return {"ref": value_id}
-            
-            # For primitives, just return their string representation
-            return {"value": repr(value)}
-
-        # Stack Processing
-        call_stack = []
-        current_frame = frame
-        while current_frame:
-            # Only trace frames that are part of the user's code (executed from '<string>')
-            if current_frame.f_code.co_filename == '<string>':
-                func_name = current_frame.f_code.co_name or "<module>"
-                
-                # Filter out internal variables and format the rest
-                formatted_locals = {
-                    k: format_value(v) for k, v in current_frame.f_locals.items() 
-                    if not k.startswith('__')
-                }
-                
-                call_stack.append({
-                    "func_name": func_name,
-                    "lineno": current_frame.f_lineno,
-                    "locals": formatted_locals
-                })
-            current_frame = current_frame.f_back
-        
-        call_stack.reverse()
+        self.encoder.dirty = True # observe() never runs for this encoder, so never trust its cache
+        self.encoder.begin_snapshot()
+        variables = {k: self.encoder.encode(v, heap) for k, v in list(self.globals.items())
+                     if not k.startswith('__')}
+        self.encoder.end_snapshot(heap)
+        state = ADDRESS_PATTERN.sub('', json.dumps([variables, heap, *extra]))
+        return hashlib.sha1(state.encode('utf-8')).hexdigest()[:16]
 
-        # Final Snapshot
-        snapshot = {
+    def checkpoint(self, step, frame):
+        checkpoint = {
+            'step': step,
             'line_number': frame.f_lineno,
-            'stack': call_stack,
-            'heap': heap
+            'inputs': self.log.count,
+            'globals': self.digest(),
         }
-        execution_trace.append(snapshot)
-    
-    return trace_function
+        if self.recorded is None:
+            self.checkpoints.append(checkpoint)
+            return
+        index = step // self.checkpoint_interval
+        if index >= len(self.recorded) or self.recorded[index] != checkpoint:
+            raise ReplayDiverged(f"The program did not run as recorded (checked at step {step})")
+
+    def close(self, events):
+        """
+        The closing state once the program has ended, given the events that ended it.
+        When replaying, raises ReplayDiverged unless it is the recorded one.
+        """
+        closing = {
+            'step': self.steps,
+            'line_number': None,
+            'inputs': self.log.count,
+            'globals': self.digest([event for event in events if 'event' in event]),
+        }
+        if self.recorded is not None and closing != self.recorded_closing:
+            raise ReplayDiverged(f"The program did not end as recorded (after step {self.steps})")
+        return closing
 
 # --- 2. EXECUTION HANDLER ---
-def run_user_code(code_string):
-    global execution_trace
+def run_user_code(code_string, mode='full', keyframe_interval=KEYFRAME_INTERVAL, backend='auto',
+                  output='json', **options):
+    """
+    Runs `code_string` under the tracer and returns the trace as a JSON string.
+    mode='full' stores a complete snapshot per line; mode='delta' stores keyframes
+    plus deltas (see DeltaEncoder) so the trace grows with what changes, not with
+    the size of the heap.
+    backend='auto' uses sys.monitoring when the interpreter has it and falls back
+    to sys.settrace otherwise; 'settrace' or 'monitoring' force one of them.
+    Any of the TRACE_DEFAULTS keys can be passed to set limits, sampling and heap
+    bounds; pass None to lift a limit.
+    output='compact' returns bytes in the compact binary format instead of JSON.
+    """
+    _execute(code_string, mode, keyframe_interval, backend, options)
+    return encode_compact(execution_trace) if output == 'compact' else json.dumps(execution_trace)
+
+def expand_object(code_string, step, ref, offset=0, limit=None, keyframe_interval=KEYFRAME_INTERVAL,
+                  backend='auto', **options):
+    """
+    Fetches what a bounded snapshot left out of heap object `ref` at trace step `step`
+    (the step's index in the trace). Returns a JSON string
+        {"step": step, "ref": ref, "heap": {ref: entry, ...}}
+    where the entry holds elements [offset, offset + limit) of the object (all of them
+    for limit=None, "hidden" counts the ones after that) and the rest of the heap is what those elements point to, bounded
+    as usual, ready to be merged into the step's heap.
+
+    Nothing is kept between calls: the program runs again up to that step, so pass
+    the same keyframe_interval (ids are renumbered at keyframes, see ObjectRegistry)
+    and sampling and max_items/max_depth options the trace was made with. Ids
+    and step numbers only line up when the program behaves the same on every run.
+    Raises ValueError when the program never reaches the step or `ref` is not on
+    that step's heap.
+    """
+    global _expansion
+    _expansion = (step, ref, max(0, offset), limit)
+    try:
+        # The step was recorded once already, so the size limits can't stop us short of it
+        _execute(code_string, 'full', keyframe_interval, backend,
+                 {**options, 'max_steps': None, 'max_trace_bytes': None})
+    except TracingDone as expanded:
+        if expanded.result is None:
+            raise ValueError(f"Object {ref} is not on the heap at step {step}")
+        return json.dumps(expanded.result)
+    finally:
+        _expansion = None
+
+    stopped = next((s for s in execution_trace if s.get('event') in ('error', 'truncated')), None)
+    reason = f" ({stopped.get('error_message') or stopped.get('reason')})" if stopped else ''
+    raise ValueError(f"The program ended before step {step}{reason}")
+
+# Steps per streamed batch (after the first one, which is always a single step)
+BATCH_SIZE = 200
+
+def run_user_code_chunked(code_string, on_batch, batch_size=BATCH_SIZE, mode='delta',
+                          keyframe_interval=KEYFRAME_INTERVAL, backend='auto', output='json', **options):
+    """
+    Streaming version of run_user_code: calls `on_batch(json_text)` with a JSON array
+    of steps as soon as each batch fills up, so only one batch is ever held in memory.
+    Concatenating the batches in order gives the same trace run_user_code returns.
+    With output='compact' each batch is a self-contained compact-format bytes object.
+    """
+    global _on_batch, _batch_size, _batch_encoder
+    _on_batch = on_batch
+    _batch_encoder = encode_compact if output == 'compact' else json.dumps
+    _batch_size = max(1, batch_size)
+    try:
+        _execute(code_string, mode, keyframe_interval, backend, options)
+        flush_batch()
+    finally:
+        _on_batch = None
+        _batch_size = None
+        _batch_encoder = json.dumps
+
+def iter_trace_batches(code_string, batch_size=BATCH_SIZE, **kwargs):
+    """
+    Generator over the JSON batches of run_user_code_chunked. The traced program runs
+    on a worker thread and blocks while a batch is waiting to be consumed, which keeps
+    peak memory at about one batch. Without threads (Pyodide) the batches are
+    collected first and then yielded.
+    """
+    if sys.platform == 'emscripten': # Pyodide cannot start threads
+        batches = []
+        run_user_code_chunked(code_string, batches.append, batch_size, **kwargs)
+        yield from batches
+        return
+
+    import threading
+    batches = queue.Queue(maxsize=1)
+    done = object()
+    failure = []
+
+    def worker():
+        try:
+            run_user_code_chunked(code_string, batches.put, batch_size, **kwargs)
+        except BaseException as e:
+            failure.append(e)
+        finally:
+            batches.put(done)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    while True:
+        batch = batches.get()
+        if batch is done:
+            break
+        yield batch
+    thread.join()
+    if failure:
+        raise failure[0]
+
+def _was_truncated():
+    return any(step.get('event') == 'truncated' for step in execution_trace)
+
+def record_replay(code_string, checkpoint_interval=CHECKPOINT_INTERVAL, backend='auto', **options):
+    """
+    Runs `code_string` once without keeping any snapshots and returns a recording,
+    as a JSON string, that replay_steps can rebuild any step from:
+        {"steps": total, "checkpoint_interval": k, "checkpoints": [...],
+         "closing": the state the program ended in (None if it was cut short),
+         "seed": random seed, "hash_check": hash(HASH_PROBE), "inputs": [...InputLog
+         entries], "options": {...},
+         "events": [the output / error / truncated steps that end the trace]}
+    Its size grows with the checkpoints and the logged inputs, not with the steps.
+    Options are as for run_user_code; max_steps is lifted unless given and
+    max_trace_bytes doesn't apply, since nothing is stored per step.
+    """
+    global _replay
+    options = {'max_steps': None, **options}
+    log = InputLog()
+    replay = _replay = Replay(log, checkpoint_interval, {**TRACE_DEFAULTS, **options})
+    try:
+        with log.installed():
+            _execute(code_string, 'full', KEYFRAME_INTERVAL, backend, {**options, 'max_trace_bytes': None})
+            closing = None if _was_truncated() else replay.close(execution_trace)
+    finally:
+        _replay = None
+    return json.dumps({
+        'steps': replay.steps,
+        'checkpoint_interval': replay.checkpoint_interval,
+        'checkpoints': replay.checkpoints,
+        'closing': closing,
+        'seed': log.seed,
+        'hash_check': hash(HASH_PROBE),
+        'inputs': log.entries,
+        'options': options,
+        'events': execution_trace,
+    })
+
+def replay_steps(code_string, recording, start, count=BATCH_SIZE, mode='delta',
+                 keyframe_interval=KEYFRAME_INTERVAL, backend='auto', output='json', **options):
+    """
+    Rebuilds steps [start, start + count) of a record_replay recording (a dict or its
+    JSON) and returns them the way run_user_code would; in delta mode the first one is
+    a keyframe. The recording's events follow when the window reaches the end. Heap
+    ids are numbered afresh for every window. `options` override the recorded ones
+    (e.g. a new time_limit); sampling must stay the same for the steps to line up.
+    The program runs on past the window to the next checkpoint, or to its end, to
+    check the steps after the window too.
+    Raises ValueError when the window is out of range, the recording was made with
+    another hash seed, or the program does not run as recorded (it reads other
+    inputs, or a checkpoint or the closing state differs).
+    """
+    global _replay
+    if isinstance(recording, (str, bytes)):
+        recording = json.loads(recording)
+    total = recording['steps']
+    start = max(0, start)
+    end = min(start + max(1, count), total)
+    if start >= end:
+        raise ValueError(f"Step {start} is past the end of the recording ({total} steps)")
+    if recording.get('hash_check') != hash(HASH_PROBE):
+        raise ValueError("The recording was made in a process with a different hash seed, so sets and "
+                         "dicts would not iterate the same way; run every worker with the same PYTHONHASHSEED")
+
+    options = {**recording['options'], **options, 'max_steps': None, 'max_trace_bytes': None}
+    log = InputLog(recording['seed'], recording['inputs'])
+    closing = recording.get('closing')
+    replay = _replay = Replay(log, recording['checkpoint_interval'], {**TRACE_DEFAULTS, **options},
+                              recording['checkpoints'], start, end, closing, total if closing is None else None)
+    try:
+        with log.installed():
+            _execute(code_string, mode, keyframe_interval, backend, options)
+            if closing is not None and not _was_truncated(): # Cut short: reported below
+                replay.close(execution_trace)
+    except TracingDone:
+        pass
+    except ReplayDiverged as e:
+        raise ValueError(str(e))
+    finally:
+        _replay = None
+
+    steps = [step for step in execution_trace if 'event' not in step]
+    if len(steps) < end - start:
+        raise ValueError(f"The program ended after {start + len(steps)} steps, the recording has {total}")
+    if end == total:
+        steps += recording['events']
+    return encode_compact(steps) if output == 'compact' else json.dumps(steps)
+
+def _execute(code_string, mode, keyframe_interval, backend, options):
+    global execution_trace, _object_ids, _heap_encoder, _delta_encoder, _budget, _sampler, _batches_sent, _module_code
+    unknown = set(options) - set(TRACE_DEFAULTS)
+    if unknown:
+        raise TypeError(f"run_user_code() got unexpected options: {', '.join(sorted(unknown))}")
+    options = {**TRACE_DEFAULTS, **options}
+
     execution_trace = []
-    
+    _batches_sent = 0
+    _object_ids = ObjectRegistry()
+    _heap_encoder = HeapEncoder(_object_ids, options['max_items'], options['max_depth'], max(1, keyframe_interval))
+    _delta_encoder = DeltaEncoder(keyframe_interval) if mode == 'delta' else None
+    _budget = TraceBudget(options['max_steps'], options['max_trace_bytes'], options['time_limit'])
+    _sampler = None
+    if (options['every_nth'] > 1 or options['max_loop_iterations'] is not None
+            or options['line_ranges'] or options['functions']):
+        try:
+            _sampler = StepSampler(
+                code_string, options['every_nth'], options['max_loop_iterations'],
+                options['line_ranges'], options['functions'],
+            )
+        except SyntaxError:
+            _sampler = None # compile() below reports it as a normal error step
+
+    if backend == 'monitoring' and not monitoring_available():
+        raise ValueError("sys.monitoring backend requires Python 3.12+")
+    use_monitoring = backend in ('auto', 'monitoring') and monitoring_available()
+
     old_stdout = sys.stdout
     redirected_output = sys.stdout = StringIO()
-    
-    sys.settrace(trace_function)
+
+    compiled_code = None
+    monitoring_started = False
     try:
         # We compile the code to ensure its filename is '<string>'
         # This is critical for the filter in trace_function to work!
-        compiled_code = compile(code_string, '<string>', 'exec')
+        compiled_code = _module_code = compile(code_string, '<string>', 'exec')
+        if use_monitoring:
+            monitoring_started = start_monitoring(compiled_code)
+        if not monitoring_started:
+            sys.settrace(trace_function)
         exec(compiled_code, {})
+    except TraceLimitReached as limit:
+        emit(limit.event)
     except Exception as e:
         snapshot = {
             'event': 'error', 
@@ -84,16 +1227,23 @@ def run_user_code(code_string):
             'error_type': type(e).__name__, 
             'error_message': str(e)
         }
-        execution_trace.append(snapshot)
+        emit(snapshot)
     finally:
         sys.settrace(None)
+        if monitoring_started:
+            stop_monitoring(compiled_code)
         sys.stdout = old_stdout
+        _delta_encoder = None
+        _heap_encoder = None
+        _object_ids = None
+        _budget = None
+        _sampler = None
+        _module_code = None
 
     output = redirected_output.getvalue()
     if output:
-        execution_trace.append({'event': 'output', 'data': output})
+        emit({'event': 'output', 'data': output})
 
-    return json.dumps(execution_trace)
 
 # --- 3. COMPLEXITY ANALYZER (Optional, used if you want client-side analysis) ---
 def analyze_complexity(code):
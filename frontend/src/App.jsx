@@ -1,9 +1,11 @@
-import React, { useState, useEffect, useRef } from 'react';
+import React, { useState, useEffect, useRef, useMemo } from 'react';
 import CodeEditor from './components/CodeEditor';
 import Visualization from './components/Visualization';
 import Controls from './components/Controls';
 import AstDisplay from './components/AstDisplay';
 import { runJsCode } from './utils/jsTracer';
+import { resolveStep } from './utils/traceDecoder';
+import { decodeCompactTrace, COMPACT_MEDIA_TYPE } from './utils/compactTrace';
 import ComplexityBar from './components/ComplexityBar';
 import './styles/index.css';
 
@@ -122,7 +124,8 @@ function ContextualFrameNode({ frame, position }) {
 function App() {
   const [language, setLanguage] = useState('python');
   const [code, setCode] = useState(initialPythonCode);
-  const [pyodide, setPyodide] = useState(null);
+  const pyodideWorkerRef = useRef(null);
+  const [isPyodideReady, setIsPyodideReady] = useState(false);
   const [trace, setTrace] = useState([]);
   const [currentStep, setCurrentStep] = useState(0);
   const [isEnvLoading, setIsEnvLoading] = useState(true); // Initial Pyodide load
@@ -144,6 +147,18 @@ function App() {
     setTheme(prev => prev === 'dark' ? 'light' : 'dark');
   };
 
+  // Heap entries fetched on demand for objects the trace cut short, per step index
+  const [expansions, setExpansions] = useState({});
+  const tracedCodeRef = useRef(null); // Expansions re-run the program the trace came from,
+  const traceSourceRef = useRef(null); // on the same engine ('pyodide' or 'server')
+
+  // Python traces are delta-encoded, so rebuild the full snapshot for the current step
+  const traceStep = useMemo(() => {
+    const step = resolveStep(trace, currentStep);
+    const expanded = expansions[currentStep];
+    return expanded && step?.heap ? { ...step, heap: { ...step.heap, ...expanded } } : step;
+  }, [trace, currentStep, expansions]);
+
   const editorRef = useRef(null);
   const [nodePosition, setNodePosition] = useState({ top: 0, left: 0, opacity: 0 });
 
@@ -162,34 +177,21 @@ function App() {
     setComplexity(null);
   }, [language]);
 
-  // Load Pyodide on startup
+  // Load Pyodide on startup (in a worker, so tracing never blocks the page)
+  const runIdRef = useRef(0);
+  const workerMessageRef = useRef(null);
   useEffect(() => {
-    async function loadPyodide() {
-      try {
-        console.log("Loading Pyodide...");
-        if (!window.pyodide) {
-          const pyodideInstance = await window.loadPyodide({
-            indexURL: "https://cdn.jsdelivr.net/pyodide/v0.25.1/full/"
-          });
-          console.log("Pyodide loaded successfully.");
-          const tracerCode = await (await fetch('/tracer.py')).text();
-          pyodideInstance.FS.writeFile("tracer.py", tracerCode, { encoding: "utf8" });
-          setPyodide(pyodideInstance);
-        }
-      } catch (e) {
-        console.error("Failed to load Pyodide:", e);
-        setError({ details: "Could not load Python environment." });
-      } finally {
-        setIsEnvLoading(false);
-      }
-    }
-    loadPyodide();
+    console.log("Loading Pyodide...");
+    const worker = new Worker(new URL('./workers/pyodideWorker.js', import.meta.url), { type: 'module' });
+    worker.onmessage = (event) => workerMessageRef.current(event.data);
+    pyodideWorkerRef.current = worker;
+    return () => worker.terminate();
   }, []);
 
   // Calculate pop-up position
   useEffect(() => {
-    if (editorRef.current && trace[currentStep]) {
-      const currentTrace = trace[currentStep];
+    if (editorRef.current && traceStep) {
+      const currentTrace = traceStep;
       const currentFrame = currentTrace.stack?.slice(-1)[0];
 
       const isValidFrame = currentFrame &&
@@ -208,10 +210,10 @@ function App() {
     } else {
       setNodePosition({ ...nodePosition, opacity: 0 });
     }
-  }, [currentStep, trace]);
+  }, [traceStep]);
 
-  // Manual Complexity Trigger
-  const triggerComplexityAnalysis = async () => {
+  // Manual Complexity Trigger. `empirical` measures the Python function on growing inputs on the server.
+  const triggerComplexityAnalysis = async (empirical = false) => {
     if (!code || code.trim() === '') {
       console.warn("Complexity Analysis skipped: Code is empty.");
       return;
@@ -227,7 +229,7 @@ function App() {
       const response = await fetch(`${apiUrl}/analyze-complexity`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ code, language })
+        body: JSON.stringify({ code, language, empirical })
       });
 
       console.log(`Analysis response status: ${response.status}`);
@@ -252,9 +254,12 @@ function App() {
   };
 
   const runCode = () => {
+    runIdRef.current += 1; // Ignore batches still arriving from an earlier Python run
     setError(null);
     setTrace([]);
     setCurrentStep(0);
+    setExpansions({});
+    tracedCodeRef.current = code;
 
     // --- JAVASCRIPT LOGIC ---
     if (language === 'javascript') {
@@ -276,12 +281,21 @@ function App() {
           const response = await fetch(`${apiUrl}/trace-c`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ code })
+            body: JSON.stringify({ code, format: 'compact' })
           });
 
+          if (response.status === 429) {
+            const body = await response.json().catch(() => ({}));
+            setError({ details: body.detail || "The server is busy", aiHint: "Too many C++ traces are running. Try again in a few seconds." });
+            setTrace([]);
+            return;
+          }
           if (!response.ok) throw new Error("Backend Error");
 
-          const data = await response.json();
+          // Older backends ignore `format` and still answer with JSON
+          const data = response.headers.get('Content-Type')?.startsWith(COMPACT_MEDIA_TYPE)
+            ? decodeCompactTrace(await response.arrayBuffer())
+            : await response.json();
 
           // Check for error in trace
           if (data.length > 0 && data[0].event === 'error') {
@@ -302,30 +316,137 @@ function App() {
     }
 
     // --- PYTHON LOGIC ---
-    if (!pyodide) return;
+    // Pyodide once it has loaded (no round trip), the backend's /trace-python until then.
+    // VITE_PYTHON_TRACE=server or =pyodide forces one of the two.
+    const pythonTrace = import.meta.env.VITE_PYTHON_TRACE || 'auto';
+    if (pythonTrace === 'server' || (pythonTrace === 'auto' && !isPyodideReady)) {
+      traceSourceRef.current = 'server';
+      runPythonOnServer(runIdRef.current);
+      return;
+    }
+    if (!isPyodideReady) return;
+    traceSourceRef.current = 'pyodide';
 
-    const pythonScript = `
-import tracer
-user_code = """${code.replace(/"/g, '\\"')}"""
-trace_json = tracer.run_user_code(user_code)
-`;
+    // Steps arrive in batches while the program runs; the first batch is a single step
+    setIsExecuting(true);
+    pyodideWorkerRef.current.postMessage({ id: runIdRef.current, code, options: { mode: 'delta' } });
+  };
+
+  const runPythonOnServer = async (runId) => {
     try {
-      pyodide.runPython(pythonScript);
-      const traceJson = pyodide.globals.get('trace_json');
-      const parsedTrace = JSON.parse(traceJson);
-      if (Array.isArray(parsedTrace)) {
-        setTrace(parsedTrace);
-        const errorStep = parsedTrace.find(step => step.event === 'error');
-        if (errorStep) {
-          handleError(errorStep);
-        }
-      } else {
-        console.error("Parsing failed: The result is not an array.");
-        setError({ details: "Failed to parse the execution trace from Python.", aiHint: "The tracer script might have produced an invalid output." });
+      setIsExecuting(true);
+      const apiUrl = import.meta.env.VITE_API_BASE_URL || 'http://localhost:10000';
+      const response = await fetch(`${apiUrl}/trace-python`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ code, mode: 'delta', format: 'compact' })
+      });
+      if (!response.ok) {
+        const body = await response.json().catch(() => ({}));
+        throw new Error(body.detail || `Server error: ${response.status}`);
+      }
+      const data = response.headers.get('Content-Type')?.startsWith(COMPACT_MEDIA_TYPE)
+        ? decodeCompactTrace(await response.arrayBuffer())
+        : await response.json();
+      if (runId !== runIdRef.current) return; // Stale run
+
+      setTrace(data);
+      const errorStep = data.find(step => step.event === 'error');
+      if (errorStep) {
+        handleError(errorStep);
       }
     } catch (e) {
-      console.error("An error occurred during Python execution:", e);
-      setError({ details: `Execution failed: ${e.message}`, aiHint: "A critical error prevented the code from running." });
+      console.error("Server-side Python trace failed:", e);
+      setError({
+        details: e.message,
+        aiHint: isPyodideReady ? "Check that the backend is running." : "The Python environment is still loading, try again in a moment."
+      });
+    } finally {
+      setIsExecuting(false);
+    }
+  };
+
+  // "Show more" on a heap object: fetch the next page of its elements (tracer.expand_object)
+  const EXPAND_PAGE = 500;
+  const expandObject = async (ref) => {
+    const entry = traceStep?.heap?.[ref];
+    if (!entry) return;
+    const shown = Array.isArray(entry.value) ? entry.value.length : Object.keys(entry.value).length;
+    const expand = { step: currentStep, ref, offset: (entry.offset || 0) + shown, limit: EXPAND_PAGE };
+
+    if (traceSourceRef.current === 'pyodide') {
+      pyodideWorkerRef.current.postMessage({ id: runIdRef.current, code: tracedCodeRef.current, expand });
+      return;
+    }
+    const runId = runIdRef.current;
+    try {
+      const apiUrl = import.meta.env.VITE_API_BASE_URL || 'http://localhost:10000';
+      const response = await fetch(`${apiUrl}/expand-python-object`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ code: tracedCodeRef.current, ...expand })
+      });
+      const body = await response.json();
+      if (!response.ok) throw new Error(body.detail || `Server error: ${response.status}`);
+      if (runId === runIdRef.current) mergeExpansion(body);
+    } catch (e) {
+      console.error("Could not expand heap object:", e);
+    }
+  };
+
+  const mergeExpansion = (result) => {
+    const baseHeap = resolveStep(trace, result.step)?.heap || {};
+    setExpansions(prev => {
+      const patch = { ...prev[result.step] };
+      Object.entries(result.heap).forEach(([id, entry]) => {
+        const current = patch[id] || baseHeap[id];
+        if (Number(id) === result.ref && current && entry.offset) {
+          // The next page of the object that was clicked: append it
+          const value = Array.isArray(current.value)
+            ? current.value.concat(entry.value)
+            : { ...current.value, ...entry.value };
+          patch[id] = { ...current, value, hidden: entry.hidden };
+        } else if (!current || (current.hidden || 0) > (entry.hidden || 0)) {
+          patch[id] = entry;
+        }
+      });
+      return { ...prev, [result.step]: patch };
+    });
+  };
+
+  // Always points at the latest render so the worker callback sees current state
+  workerMessageRef.current = (message) => {
+    if (message.type === 'ready') {
+      console.log("Pyodide loaded successfully.");
+      setIsPyodideReady(true);
+      setIsEnvLoading(false);
+      return;
+    }
+    if (message.type === 'load-error') {
+      console.error("Failed to load Pyodide:", message.message);
+      setError({ details: "Could not load Python environment." });
+      setIsEnvLoading(false);
+      return;
+    }
+    if (message.id !== runIdRef.current) return; // Stale run
+
+    if (message.type === 'expanded') {
+      mergeExpansion(JSON.parse(message.result));
+    } else if (message.type === 'expand-error') {
+      console.error("Could not expand heap object:", message.message);
+    } else if (message.type === 'batch') {
+      const steps = JSON.parse(message.batch);
+      setTrace(prev => prev.concat(steps));
+      const errorStep = steps.find(step => step.event === 'error');
+      if (errorStep) {
+        handleError(errorStep);
+      }
+    } else if (message.type === 'done') {
+      setIsExecuting(false);
+    } else if (message.type === 'error') {
+      console.error("An error occurred during Python execution:", message.message);
+      setError({ details: `Execution failed: ${message.message}`, aiHint: "A critical error prevented the code from running." });
+      setIsExecuting(false);
     }
   };
 
@@ -364,6 +485,8 @@ trace_json = tracer.run_user_code(user_code)
         <h1 style={{ display: 'flex', alignItems: 'center', gap: '10px', fontSize: '1.2rem', margin: 0, color: 'var(--text-accent)' }}>
           Trace-View✨
           {isExecuting && <span style={{ fontSize: '0.8rem', color: 'var(--success-color)' }}>Running... ⏳</span>}
+          {/* Python traces run on the server until Pyodide is ready */}
+          {isEnvLoading && language === 'python' && <span style={{ fontSize: '0.8rem', color: 'var(--text-secondary)' }}>Loading Python Environment... 🐹</span>}
         </h1>
 
         <div style={{ display: 'flex', alignItems: 'center', gap: '1rem' }}>
@@ -388,49 +511,46 @@ trace_json = tracer.run_user_code(user_code)
         </div>
       </header>
 
-      {isEnvLoading && <div style={{ display: 'flex', alignItems: 'center', justifyContent: 'center', height: '100%' }}>Loading Python Environment... 🐹</div>}
-
-      {!isEnvLoading && (
-        <main className="main-content" style={{ position: 'relative' }}>
-          <div className="editor-panel" style={{ display: 'flex', flexDirection: 'column' }}>
+      <main className="main-content" style={{ position: 'relative' }}>
+        <div className="editor-panel" style={{ display: 'flex', flexDirection: 'column' }}>
+
+          {/* Pass both functions to Controls */}
+          <Controls
+            onRunAndTrace={runCode}
+            onAnalyzeComplexity={() => triggerComplexityAnalysis()}
+            onMeasureComplexity={language === 'python' ? () => triggerComplexityAnalysis(true) : null}
+            trace={trace}
+            currentStep={currentStep}
+            setCurrentStep={setCurrentStep}
+            disabled={isExecuting}
+          />
 
-            {/* Pass both functions to Controls */}
-            <Controls
-              onRunAndTrace={runCode}
-              onAnalyzeComplexity={triggerComplexityAnalysis}
-              trace={trace}
-              currentStep={currentStep}
-              setCurrentStep={setCurrentStep}
-              disabled={isExecuting}
+          <div className="editor-wrapper" style={{ flexGrow: 1 }}>
+            <CodeEditor
+              code={code}
+              setCode={setCode}
+              currentLine={traceStep?.line_number}
+              onMount={handleEditorMount}
+              language={language}
             />
+          </div>
 
-            <div className="editor-wrapper" style={{ flexGrow: 1 }}>
-              <CodeEditor
-                code={code}
-                setCode={setCode}
-                currentLine={trace[currentStep]?.line_number}
-                onMount={handleEditorMount}
-                language={language}
-              />
-            </div>
-
-            {/* Pass Complexity State and Loading Status */}
-            <ComplexityBar complexity={complexity} loading={isAnalyzing} />
+          {/* Pass Complexity State and Loading Status */}
+          <ComplexityBar complexity={complexity} loading={isAnalyzing} />
 
-          </div>
+        </div>
 
-          <div className="visualization-panel">
-            <Visualization traceStep={trace[currentStep]} error={error} />
-            <div style={{ borderTop: '1px solid #374151', margin: '0.5rem 0' }}></div>
-            {language === 'python' && <AstDisplay code={code} />}
-          </div>
+        <div className="visualization-panel">
+          <Visualization traceStep={traceStep} error={error} onExpandObject={language === 'python' ? expandObject : null} />
+          <div style={{ borderTop: '1px solid #374151', margin: '0.5rem 0' }}></div>
+          {language === 'python' && <AstDisplay code={code} />}
+        </div>
 
-          <ContextualFrameNode
-            frame={trace[currentStep]?.stack?.slice(-1)[0]}
-            position={nodePosition}
-          />
-        </main>
-      )}
+        <ContextualFrameNode
+          frame={traceStep?.stack?.slice(-1)[0]}
+          position={nodePosition}
+        />
+      </main>
     </div>
   );
 }
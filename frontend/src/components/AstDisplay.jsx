@@ -1,26 +1,79 @@
 import { useState } from 'react';
+import ReactFlow, { Background, Controls } from 'reactflow';
+import 'reactflow/dist/style.css';
+import dagre from 'dagre';
+
+// The backend sends the AST as nodes + edges and the tree is laid out here, which
+// is much cheaper than rendering an SVG with graphviz on the server for big trees.
+// Large trees come back with some subtrees collapsed (dashed); clicking one loads
+// just that subtree.
+const NODE_WIDTH = 150;
+const NODE_HEIGHT = 44;
+const nodeStyle = {
+  width: NODE_WIDTH,
+  fontSize: '0.7rem',
+  whiteSpace: 'pre',
+  background: 'lightblue',
+  color: '#0f172a',
+  borderRadius: '6px',
+  padding: '4px',
+};
+
+const collapsedStyle = { ...nodeStyle, background: 'lightgray', border: '1px dashed #475569', cursor: 'pointer' };
+
+const layoutAst = ({ nodes, edges }) => {
+  const graph = new dagre.graphlib.Graph();
+  graph.setDefaultEdgeLabel(() => ({}));
+  graph.setGraph({ rankdir: 'TB', nodesep: 20, ranksep: 40 });
+  nodes.forEach((node) => graph.setNode(String(node.id), { width: NODE_WIDTH, height: NODE_HEIGHT }));
+  edges.forEach(([source, target]) => graph.setEdge(String(source), String(target)));
+  dagre.layout(graph);
+
+  return {
+    nodes: nodes.map((node) => {
+      const { x, y } = graph.node(String(node.id));
+      return {
+        id: String(node.id),
+        data: { label: node.collapsed ? `${node.label}\n(+${node.hidden} nodes)` : node.label, path: node.path },
+        position: { x: x - NODE_WIDTH / 2, y: y - NODE_HEIGHT / 2 },
+        style: node.collapsed ? collapsedStyle : nodeStyle,
+        draggable: false,
+      };
+    }),
+    edges: edges.map(([source, target]) => ({
+      id: `${source}-${target}`,
+      source: String(source),
+      target: String(target),
+      style: { stroke: 'gray' },
+    })),
+  };
+};
 
 function AstDisplay({ code }) {
-  const [astSvg, setAstSvg] = useState(null);
+  const [astGraph, setAstGraph] = useState(null);
+  const [astSvg, setAstSvg] = useState(null); // Backends without the JSON format
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState(null); // This will now be an object or null
+  const [roots, setRoots] = useState([]); // Paths of the expanded subtrees, innermost last
 
-  const fetchAst = async () => {
+  const fetchAst = async (rootPath = null) => {
     setIsLoading(true);
     setError(null);
-    setAstSvg(null);
 
     try {
       const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/get-ast-visualization`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ code: code }),
+        body: JSON.stringify({ code: code, format: 'json', root: rootPath }),
       });
       const data = await response.json();
+      setAstSvg(null);
 
       if (data.error) {
         // 1. Set error as an object for consistency
         setError({ message: data.error });
+      } else if (data.nodes) {
+        setAstGraph(layoutAst(data));
       } else {
         setAstSvg(data.svg_data);
       }
@@ -32,13 +85,30 @@ function AstDisplay({ code }) {
     }
   };
 
+  const expandNode = (_, node) => {
+    if (node.data.path === undefined || isLoading) return;
+    setRoots(prev => [...prev, node.data.path]);
+    fetchAst(node.data.path);
+  };
+
+  const goUp = () => {
+    const parents = roots.slice(0, -1);
+    setRoots(parents);
+    fetchAst(parents.length ? parents[parents.length - 1] : null);
+  };
+
   return (
     <div className="viz-section" style={{ padding: '0.5rem 1.5rem' }}>
       <div style={{ display: 'flex', alignItems: 'center', gap: '1rem', marginBottom: '0.5rem' }}>
         <h2 style={{ fontSize: '1rem', margin: 0 }}>Abstract Syntax Tree (AST)</h2>
-        <button onClick={fetchAst} disabled={isLoading} className="step-button" style={{ padding: '0.25rem 0.5rem', fontSize: '0.8rem' }}>
+        <button onClick={() => { setRoots([]); fetchAst(); }} disabled={isLoading} className="step-button" style={{ padding: '0.25rem 0.5rem', fontSize: '0.8rem' }}>
           {isLoading ? 'Generating...' : 'Generate AST Graph'}
         </button>
+        {roots.length > 0 && (
+          <button onClick={goUp} disabled={isLoading} className="step-button" style={{ padding: '0.25rem 0.5rem', fontSize: '0.8rem' }}>
+            ↑ Back
+          </button>
+        )}
       </div>
 
       {/* 3. Display the .message property from the error object */}
@@ -48,6 +118,31 @@ function AstDisplay({ code }) {
         </div>
       )}
 
+      {astGraph && (
+        <div
+          className="viz-box"
+          style={{
+            backgroundColor: 'var(--ast-bg)',
+            height: '250px',
+            padding: 0,
+            border: '1px solid var(--border-color-strong)'
+          }}
+        >
+          <ReactFlow
+            nodes={astGraph.nodes}
+            edges={astGraph.edges}
+            fitView
+            onlyRenderVisibleElements
+            nodesConnectable={false}
+            onNodeClick={expandNode}
+            minZoom={0.05}
+          >
+            <Background gap={16} size={1} />
+            <Controls showInteractive={false} />
+          </ReactFlow>
+        </div>
+      )}
+
       {astSvg && (
         <div
           className="viz-box"
@@ -65,4 +160,4 @@ function AstDisplay({ code }) {
   );
 }
 
-export default AstDisplay;
\ No newline at end of file
+export default AstDisplay;
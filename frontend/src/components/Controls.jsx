@@ -1,4 +1,4 @@
-function Controls({ onRunAndTrace, onAnalyzeComplexity, trace, currentStep, setCurrentStep }) {
+function Controls({ onRunAndTrace, onAnalyzeComplexity, onMeasureComplexity, trace, currentStep, setCurrentStep }) {
   const totalSteps = trace.length;
 
   const handleNext = () => {
@@ -33,6 +33,17 @@ function Controls({ onRunAndTrace, onAnalyzeComplexity, trace, currentStep, setC
         Analyze
       </button>
 
+      {/* BUTTON 3: Measure Complexity (runs the function on growing inputs, Python only) */}
+      {onMeasureComplexity && (
+        <button
+          onClick={onMeasureComplexity}
+          className="analyze-button"
+          title="Run the first function on growing inputs and fit its growth"
+        >
+          Measure
+        </button>
+      )}
+
       {/* Playback Controls and Slider */}
       <div style={{ display: 'flex', alignItems: 'center', gap: '8px', flexGrow: 1, minWidth: '250px' }}>
         <button onClick={handlePrev} disabled={currentStep === 0} className="step-button" title="Previous Step">
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import ReactFlow, { MiniMap, Controls, Background, Handle, Position, MarkerType } from 'reactflow';
 import 'reactflow/dist/style.css';
 import ReactMarkdown from 'react-markdown';
@@ -47,7 +47,7 @@ const HeapNode = ({ data }) => (
         <div className="heap-grid">
             {data.items.map((item, index) => (
                 <div key={index} className="heap-item">
-                    <div className="heap-item-index">{index}</div>
+                    <div className="heap-item-index">{item.label ?? index}</div>
                     <div>{item.value}</div>
                     {/* Render Pointers */}
                     {data.pointers && data.pointers.map((p, i) => (
@@ -60,6 +60,17 @@ const HeapNode = ({ data }) => (
                     ))}
                 </div>
             ))}
+            {data.hidden > 0 && (
+                <div
+                    className="heap-item heap-more"
+                    onClick={data.onExpand || undefined}
+                    style={{ cursor: data.onExpand ? 'pointer' : 'default', opacity: 0.7 }}
+                    title={data.onExpand ? 'Load more elements' : undefined}
+                >
+                    <div className="heap-item-index">…</div>
+                    <div>+{data.hidden}</div>
+                </div>
+            )}
         </div>
     </div>
 );
@@ -88,7 +99,7 @@ const getLayoutedElements = (nodes, edges, direction = 'LR') => {
 
 
 // --- Main Data Processing Function ---
-const generateFlowElements = (traceStep) => {
+const generateFlowElements = (traceStep, onExpandObject) => {
     if (!traceStep || !traceStep.stack) return { nodes: [], edges: [] };
     let nodes = [];
     let edges = [];
@@ -104,13 +115,22 @@ const generateFlowElements = (traceStep) => {
     }
 
     Object.entries(heap).forEach(([id, obj], index) => {
-        const isList = obj.type === 'list' || obj.type === 'tuple';
-        let items = isList ? obj.value.map(v => ({ value: v.value ?? '→' })) : [];
+        // Python lists/tuples/sets and C++ arrays/containers hold arrays; Python dicts,
+        // C++ maps and structs hold entries by key or field name
+        const isList = Array.isArray(obj.value);
+        // Long or deeply nested containers only carry their first elements (obj.hidden more)
+        let items = isList
+            ? obj.value.map((v, i) => ({ label: (obj.offset || 0) + i, value: v.value ?? '→' }))
+            : obj.value ? Object.entries(obj.value).map(([label, v]) => ({ label, value: v.value ?? '→' })) : [];
 
         nodes.push({
             id: `heap-${id}`,
             type: 'heap',
-            data: { type: obj.type, items: items, pointers: isList ? pointers : [] }
+            data: {
+                type: obj.type, items: items, pointers: isList ? pointers : [],
+                hidden: obj.hidden,
+                onExpand: onExpandObject ? () => onExpandObject(Number(id)) : null
+            }
         });
     });
 
@@ -150,12 +170,15 @@ const generateFlowElements = (traceStep) => {
 
 
 // --- Main Visualization Component ---
-function Visualization({ traceStep, error }) {
+function Visualization({ traceStep, error, onExpandObject }) {
     const [elements, setElements] = useState({ nodes: [], edges: [] });
+    // Read through a ref so a new callback on every render doesn't redo the layout
+    const expandRef = useRef(onExpandObject);
+    expandRef.current = onExpandObject;
 
     useEffect(() => {
         if (traceStep && traceStep.stack) {
-            setElements(generateFlowElements(traceStep));
+            setElements(generateFlowElements(traceStep, expandRef.current ? (ref) => expandRef.current(ref) : null));
         } else if (!error) {
             setElements({ nodes: [], edges: [] });
         }
@@ -186,6 +209,17 @@ function Visualization({ traceStep, error }) {
         );
     }
 
+    if (traceStep && traceStep.event === 'truncated') {
+        return (
+            <div className="viz-section">
+                <h2>Trace Stopped</h2>
+                <div className="viz-box" style={{ backgroundColor: '#1e293b', color: '#e2e8f0', border: '1px solid #334155' }}>
+                    Tracing stopped at line {traceStep.line_number} after hitting the {traceStep.reason.replace(/_/g, ' ')} limit ({traceStep.limit}).
+                </div>
+            </div>
+        );
+    }
+
     return (
         <div style={{ flexGrow: 1, width: '100%', minHeight: 0 }}>
             <ReactFlow
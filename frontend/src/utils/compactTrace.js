@@ -0,0 +1,95 @@
+// Decoder for the compact binary trace format written by tracer.py (encode_compact),
+// which backend/trace_format.py loads too. See tracer.py for the layout; keep the two in sync.
+
+export const COMPACT_MEDIA_TYPE = 'application/x-trace-view-compact';
+
+const MAGIC = 'TVC1';
+const NO_LINE = -(2 ** 31);
+const [NULL, FALSE, TRUE, INT, FLOAT, STR, ARRAY, OBJECT, VALUE, REF, FRAME] = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10];
+
+export function decodeCompactTrace(input) {
+  const bytes = input instanceof Uint8Array ? input : new Uint8Array(input);
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  let pos = 0;
+
+  if (String.fromCharCode(...bytes.subarray(0, 4)) !== MAGIC) {
+    throw new Error('Not a compact trace');
+  }
+  pos = 4;
+
+  // Multiplication instead of bit shifts keeps values above 2^31 exact
+  const readVarint = () => {
+    let result = 0;
+    let scale = 1;
+    for (;;) {
+      const byte = bytes[pos++];
+      result += (byte & 0x7f) * scale;
+      if (byte < 0x80) return result;
+      scale *= 128;
+    }
+  };
+
+  const utf8 = new TextDecoder();
+  const strings = new Array(readVarint());
+  for (let i = 0; i < strings.length; i++) {
+    const length = readVarint();
+    strings[i] = utf8.decode(bytes.subarray(pos, pos + length));
+    pos += length;
+  }
+
+  const stepCount = readVarint();
+  pos += (4 - (pos % 4)) % 4;
+  // A typed array view needs an aligned offset; copy the section when it isn't
+  const lines = (bytes.byteOffset + pos) % 4 === 0
+    ? new Int32Array(bytes.buffer, bytes.byteOffset + pos, stepCount)
+    : new Int32Array(bytes.slice(pos, pos + 4 * stepCount).buffer);
+  pos += 4 * stepCount;
+
+  const decode = () => {
+    const tag = bytes[pos++];
+    switch (tag) {
+      case NULL: return null;
+      case FALSE: return false;
+      case TRUE: return true;
+      case INT: {
+        const n = readVarint();
+        return n % 2 === 0 ? n / 2 : -(n + 1) / 2;
+      }
+      case FLOAT: {
+        const value = view.getFloat64(pos, true);
+        pos += 8;
+        return value;
+      }
+      case STR: return strings[readVarint()];
+      case ARRAY: {
+        const items = new Array(readVarint());
+        for (let i = 0; i < items.length; i++) items[i] = decode();
+        return items;
+      }
+      case OBJECT: {
+        const obj = {};
+        for (let length = readVarint(); length > 0; length--) {
+          const key = strings[readVarint()];
+          obj[key] = decode();
+        }
+        return obj;
+      }
+      case VALUE: return { value: strings[readVarint()] };
+      case REF: return { ref: readVarint() };
+      case FRAME: {
+        const func_name = strings[readVarint()];
+        const lineno = readVarint();
+        return { func_name, lineno, locals: decode() };
+      }
+      default:
+        throw new Error(`Unknown compact tag ${tag}`);
+    }
+  };
+
+  const steps = new Array(stepCount);
+  for (let i = 0; i < stepCount; i++) {
+    const step = decode();
+    steps[i] = lines[i] === NO_LINE ? step : { line_number: lines[i], ...step };
+  }
+  return steps;
+}
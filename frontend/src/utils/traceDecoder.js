@@ -0,0 +1,60 @@
+// Rebuilds full snapshots from a delta-encoded trace (tracer.py, mode='delta').
+// Full-mode traces pass straight through: any step without a `delta` is returned as-is.
+
+// Last step resolved per trace array, so stepping forward only applies one delta.
+const lastResolved = new WeakMap();
+
+const isState = (step) => step && !step.event && (step.stack || step.delta);
+
+function applyDelta(state, step) {
+  const { stack: frameDeltas, heap: changedHeap, heap_removed: removedHeap } = step.delta;
+
+  const stack = frameDeltas.map((frameDelta, index) => {
+    const previous = state.stack[index];
+    if (frameDelta === null) return previous;
+    if (frameDelta.reset) {
+      const { reset, ...frame } = frameDelta; // eslint-disable-line no-unused-vars
+      return frame;
+    }
+
+    const locals = { ...previous.locals, ...frameDelta.locals };
+    (frameDelta.removed || []).forEach(name => { delete locals[name]; });
+    return { func_name: previous.func_name, lineno: frameDelta.lineno, locals };
+  });
+
+  const heap = { ...state.heap, ...changedHeap };
+  (removedHeap || []).forEach(id => { delete heap[id]; });
+
+  return { line_number: step.line_number, stack, heap };
+}
+
+export function resolveStep(trace, index) {
+  const step = trace[index];
+  if (!step || !step.delta) return step;
+
+  // Walk back to the nearest keyframe, or stop early at the previously resolved
+  // step so that stepping forward only applies a single delta.
+  const cached = lastResolved.get(trace);
+  let start = index;
+  let state = null;
+  while (start > 0 && (!isState(trace[start]) || trace[start].delta)) {
+    if (cached && cached.index === start - 1) {
+      state = cached.state;
+      break;
+    }
+    start--;
+  }
+  if (!state) {
+    state = trace[start];
+    start++;
+  }
+
+  for (let i = start; i <= index; i++) {
+    if (isState(trace[i])) {
+      state = trace[i].delta ? applyDelta(state, trace[i]) : trace[i];
+    }
+  }
+
+  lastResolved.set(trace, { index, state });
+  return state;
+}
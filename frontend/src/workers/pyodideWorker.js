@@ -0,0 +1,45 @@
+// Runs Pyodide + tracer.py off the main thread so trace batches can be drawn while
+// the user's program is still executing.
+//
+// Messages in:  { id, code, options }
+//               { id, code, options, expand: { step, ref, offset, limit } }
+// Messages out: { type: 'ready' } | { type: 'load-error', message }
+//               { id, type: 'batch', batch } (JSON array of steps)
+//               { id, type: 'done' } | { id, type: 'error', message }
+//               { id, type: 'expanded', result } (JSON, see tracer.expand_object)
+//               { id, type: 'expand-error', message }
+
+const PYODIDE_URL = 'https://cdn.jsdelivr.net/pyodide/v0.25.1/full/';
+
+const pyodideReady = (async () => {
+  const { loadPyodide } = await import(/* @vite-ignore */ `${PYODIDE_URL}pyodide.mjs`);
+  const pyodide = await loadPyodide({ indexURL: PYODIDE_URL });
+  const tracerCode = await (await fetch('/tracer.py')).text();
+  pyodide.FS.writeFile('tracer.py', tracerCode, { encoding: 'utf8' });
+  return pyodide;
+})();
+
+pyodideReady
+  .then(() => self.postMessage({ type: 'ready' }))
+  .catch((e) => self.postMessage({ type: 'load-error', message: e.message }));
+
+self.onmessage = async (event) => {
+  const { id, code, options = {}, expand } = event.data;
+  let tracer;
+  try {
+    tracer = (await pyodideReady).pyimport('tracer');
+    if (expand) {
+      const result = tracer.expand_object.callKwargs(code, { ...options, ...expand });
+      self.postMessage({ id, type: 'expanded', result });
+    } else {
+      const onBatch = (batch) => self.postMessage({ id, type: 'batch', batch });
+      tracer.run_user_code_chunked.callKwargs(code, onBatch, options);
+      self.postMessage({ id, type: 'done' });
+    }
+  } catch (e) {
+    self.postMessage({ id, type: expand ? 'expand-error' : 'error', message: e.message });
+  } finally {
+    // The proxy holds a reference to the module; a failed run must release it too
+    tracer?.destroy();
+  }
+};